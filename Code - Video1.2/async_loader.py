@@ -0,0 +1,125 @@
+import asyncio
+
+import client_factory
+import instrumentation
+from bulk_loader import (LoadStats, backoff_delay, chunk_write_requests, is_throttling_error, oversized_error,
+                         split_oversized)
+from key_skew import interleave_table
+from rate_limiter import write_limiter
+from seed_sources import resolve_sources, stream_sources
+
+try:
+    from aiobotocore.config import AioConfig
+    from aiobotocore.session import get_session
+except ImportError:
+    get_session = None
+
+
+class AsyncBulkLoader(object):
+    # Same batching, retry and pacing rules as BulkLoader, but every batch
+    # is a task on one event loop sharing the client's connection pool.
+
+    def __init__(self, dynamodb_conn, max_in_flight=128, max_retries=10,
+                 base_delay=0.05, max_delay=10.0, rate_limiters=None):
+        self.dynamodb_conn = dynamodb_conn
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.rate_limiters = rate_limiters or {}
+        self.stats = LoadStats()
+        self.slots = asyncio.Semaphore(max_in_flight)
+        self.tasks = set()
+
+    async def load(self, table_name, items):
+        await self.submit(table_name, ({'PutRequest': {'Item': item}} for item in items))
+
+    async def submit(self, table_name, write_requests):
+        for batch in chunk_write_requests(write_requests):
+            await self.slots.acquire()
+            task = asyncio.ensure_future(self.write_batch(table_name, batch))
+            self.tasks.add(task)
+            task.add_done_callback(lambda done, batch=batch: self.batch_done(table_name, batch, done))
+
+    def batch_done(self, table_name, batch, task):
+        self.tasks.discard(task)
+        self.slots.release()
+        error = task.exception() if not task.cancelled() else 'cancelled'
+        if error is not None:
+            self.stats.record_failure(table_name, len(batch), error)
+
+    async def write_batch(self, table_name, batch):
+        limiter = self.rate_limiters.get(table_name)
+        attempt = 0
+        error = None
+        try:
+            kept, rejected, largest = split_oversized(batch)
+            pending = {table_name: kept} if kept else {}
+        except Exception as e:
+            pending, rejected, error = {table_name: batch}, [], e
+        while pending and error is None:
+            try:
+                if limiter:
+                    wait = limiter.reserve(limiter.write_cost(pending[table_name]))
+                    if wait:
+                        await asyncio.sleep(wait)
+                response = await self.dynamodb_conn.batch_write_item(RequestItems=pending)
+                pending = response.get('UnprocessedItems') or {}
+                if not pending:
+                    if limiter:
+                        limiter.on_success()
+                    break
+            except Exception as e:
+                if not is_throttling_error(e):
+                    error = e
+                    break
+            if limiter:
+                limiter.on_throttle()
+            attempt += 1
+            if attempt > self.max_retries:
+                error = 'gave up after %d retries' % self.max_retries
+                break
+            self.stats.record_retry()
+            await asyncio.sleep(backoff_delay(attempt, self.base_delay, self.max_delay))
+        remaining = len(pending.get(table_name, [])) if error is not None else 0
+        self.stats.record_batch(table_name, len(batch) - remaining - len(rejected))
+        if error is not None:
+            self.stats.record_failure(table_name, remaining, error)
+        if rejected:
+            self.stats.record_failure(table_name, len(rejected), oversized_error(rejected, largest))
+
+    async def close(self):
+        if self.tasks:
+            await asyncio.wait(list(self.tasks))
+        if self.stats.failures:
+            raise Exception('Bulk load incomplete:\n' + self.stats.summary())
+        return self.stats
+
+
+async def async_upload(region, sources=None, max_in_flight=128, write_utilization=1.0, endpoint_url=None):
+    if get_session is None:
+        raise Exception('The async engine needs aiobotocore (pip install aiobotocore)')
+    config = AioConfig(**client_factory.client_config_options(max_pool_connections=max_in_flight))
+    async with get_session().create_client('dynamodb', region_name=region, endpoint_url=endpoint_url,
+                                           config=config) as client:
+        dynamodb_conn = instrumentation.instrument_async(client)
+        rate_limiters = {}
+        if write_utilization > 0:
+            for table_name in set(table_name for table_name, _ in resolve_sources(sources)):
+                description = (await dynamodb_conn.describe_table(TableName=table_name))['Table']
+                limiter = write_limiter(description, write_utilization)
+                if limiter:
+                    rate_limiters[table_name] = limiter
+
+        loader = AsyncBulkLoader(dynamodb_conn, max_in_flight=max_in_flight, rate_limiters=rate_limiters)
+        try:
+            for table_name, items in stream_sources(sources):
+                await loader.load(table_name, interleave_table(table_name, items))
+        except Exception:
+            if loader.tasks:
+                await asyncio.wait(list(loader.tasks))
+            raise
+        return await loader.close()
+
+
+def upload(region, sources=None, max_in_flight=128, write_utilization=1.0, endpoint_url=None):
+    return asyncio.run(async_upload(region, sources, max_in_flight, write_utilization, endpoint_url))
@@ -0,0 +1,234 @@
+import argparse
+import datetime
+import json
+import math
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from bulk_loader import BulkLoader, error_code
+from seed_sources import read_items, resolve_sources
+from table_export import export_tables
+from table_schema import TABLES, apply_schema
+
+# Benchmarks create, upload and export against a local DynamoDB (DynamoDB
+# Local or a moto server, given by -endpoint-url) at several dataset sizes
+# and thread counts. Every (size, threads) case runs in a fresh process so
+# its peak RSS is its own; results go to a JSON file that -compare checks
+# against an earlier run.
+
+# Client methods that are not DynamoDB calls and must not be timed
+UNTIMED = ('get_waiter', 'get_paginator', 'can_paginate', 'close')
+
+
+class TimedClient(object):
+    # Records the latency of every call made through the wrapped client
+
+    def __init__(self, dynamodb_conn):
+        self.dynamodb_conn = dynamodb_conn
+        self.lock = threading.Lock()
+        self.latencies = []
+
+    def __getattr__(self, name):
+        method = getattr(self.dynamodb_conn, name)
+        if name in UNTIMED or not callable(method):
+            return method
+
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                with self.lock:
+                    self.latencies.append(elapsed)
+        return timed
+
+    def take_latencies(self):
+        with self.lock:
+            latencies, self.latencies = self.latencies, []
+        return latencies
+
+
+def percentile(values, fraction):
+    # Nearest-rank percentile of an unsorted list
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(int(math.ceil(fraction * len(ordered))) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def latency_summary(latencies):
+    return dict((name, round(percentile(latencies, fraction) * 1000.0, 3))
+                for name, fraction in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99), ('max', 1.0)))
+
+
+def peak_rss_kb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def dataset_source(size, seed):
+    # A synthetic dataset of roughly `size` items spread over the four tables
+    return 'synthetic:seed=%d,products=%d,forums=%d,threads=%d,replies=4' % (
+        seed, max(size // 4, 1), max(min(size // 100, 50), 1), max(size // 8, 1))
+
+
+def drop_tables(dynamodb_conn, wait_timeout=300):
+    for spec in TABLES:
+        try:
+            dynamodb_conn.delete_table(TableName=spec.name)
+        except Exception as e:
+            if error_code(e) != 'ResourceNotFoundException':
+                raise
+    deadline = time.time() + wait_timeout
+    for spec in TABLES:
+        while True:
+            try:
+                dynamodb_conn.describe_table(TableName=spec.name)
+            except Exception as e:
+                if error_code(e) == 'ResourceNotFoundException':
+                    break
+                raise
+            if time.time() > deadline:
+                raise Exception('Timed out waiting for %s to be deleted' % spec.name)
+            time.sleep(0.2)
+
+
+def result(operation, size, threads, items, elapsed, latencies, retries=0):
+    elapsed = max(elapsed, 1e-9)
+    return {
+        'operation': operation,
+        'size': size,
+        'threads': threads,
+        'items': items,
+        'seconds': round(elapsed, 4),
+        'items_per_second': round(items / elapsed, 1),
+        'calls': len(latencies),
+        'latency_ms': latency_summary(latencies),
+        'retries': retries,
+        'peak_rss_kb': peak_rss_kb(),
+    }
+
+
+def run_case(region, endpoint_url, size, threads, seed=1):
+    import client_factory
+
+    client_factory.configure(max_pool_connections=max(10, threads * 4))
+    dynamodb_conn = TimedClient(client_factory.get_client(region, endpoint_url))
+    results = []
+
+    drop_tables(dynamodb_conn)
+    dynamodb_conn.take_latencies()
+    started = time.perf_counter()
+    apply_schema(dynamodb_conn, TABLES)
+    results.append(result('create', size, threads, len(TABLES), time.perf_counter() - started,
+                          dynamodb_conn.take_latencies()))
+
+    # Unpaced: the local stand-in's 5 WCU would otherwise be the benchmark
+    started = time.perf_counter()
+    loader = BulkLoader(dynamodb_conn, max_workers=threads)
+    for table_name, path in resolve_sources([dataset_source(size, seed)]):
+        loader.load(table_name, read_items(path))
+    stats = loader.close()
+    results.append(result('upload', size, threads, stats.total_items(), time.perf_counter() - started,
+                          dynamodb_conn.take_latencies(), stats.retries))
+
+    output_dir = tempfile.mkdtemp(prefix='bench-export-')
+    try:
+        started = time.perf_counter()
+        counts = export_tables(dynamodb_conn, [spec.name for spec in TABLES], output_dir, total_segments=threads)
+        results.append(result('export', size, threads, sum(count for _, count in counts),
+                              time.perf_counter() - started, dynamodb_conn.take_latencies()))
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+    return results
+
+
+def run_benchmarks(region, endpoint_url, sizes, thread_counts, seed=1):
+    results = []
+    for size in sizes:
+        for threads in thread_counts:
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                case = executor.submit(run_case, region, endpoint_url, size, threads, seed).result()
+            for entry in case:
+                print('%-7s size=%-8d threads=%-3d %10.1f items/sec  p99 %8.2f ms  %d retries' % (
+                    entry['operation'], size, threads, entry['items_per_second'],
+                    entry['latency_ms']['p99'], entry['retries']))
+            results.extend(case)
+    return {
+        'started': datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'endpoint_url': endpoint_url,
+        'python': sys.version.split()[0],
+        'results': results,
+    }
+
+
+def case_key(entry):
+    return entry['operation'], entry['size'], entry['threads']
+
+
+def compare(baseline, current, tolerance=0.1):
+    # Returns (key, problem) for every case that got slower by more than
+    # `tolerance` in throughput or p99 latency
+    previous = dict((case_key(entry), entry) for entry in baseline['results'])
+    regressions = []
+    for entry in current['results']:
+        old = previous.get(case_key(entry))
+        if old is None:
+            continue
+        if entry['items_per_second'] < old['items_per_second'] * (1 - tolerance):
+            regressions.append((case_key(entry), 'throughput %.1f -> %.1f items/sec'
+                                % (old['items_per_second'], entry['items_per_second'])))
+        if entry['latency_ms']['p99'] > old['latency_ms']['p99'] * (1 + tolerance):
+            regressions.append((case_key(entry), 'p99 %.2f -> %.2f ms'
+                                % (old['latency_ms']['p99'], entry['latency_ms']['p99'])))
+    return regressions
+
+
+def main(args):
+    if args.compare:
+        with open(args.compare[0]) as f:
+            baseline = json.load(f)
+        with open(args.compare[1]) as f:
+            current = json.load(f)
+        regressions = compare(baseline, current, args.tolerance)
+        for (operation, size, threads), problem in regressions:
+            print('REGRESSION %s size=%d threads=%d: %s' % (operation, size, threads, problem))
+        if not regressions:
+            print('No regressions beyond %.0f%%' % (args.tolerance * 100))
+        return 1 if regressions else 0
+
+    report = run_benchmarks(args.region, args.endpoint_url, args.sizes, args.threads, args.seed)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print('Results written to %s' % args.output)
+    return 0
+
+
+def int_list(text):
+    return [int(value) for value in text.split(',')]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark create, upload and export against a local DynamoDB')
+    parser.add_argument('-endpoint-url', default='http://localhost:8000',
+                        help='DynamoDB Local or moto server to run against')
+    parser.add_argument('-region', default='us-east-1')
+    parser.add_argument('-sizes', type=int_list, default=[1000, 10000],
+                        help='Comma separated dataset sizes in items')
+    parser.add_argument('-threads', type=int_list, default=[1, 8, 32],
+                        help='Comma separated loader thread / scan segment counts')
+    parser.add_argument('-seed', type=int, default=1)
+    parser.add_argument('-output', default='bench-results.json')
+    parser.add_argument('-compare', nargs=2, metavar=('BASELINE', 'CURRENT'),
+                        help='Compare two results files instead of running')
+    parser.add_argument('-tolerance', type=float, default=0.1,
+                        help='Allowed slowdown before -compare reports a regression')
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,137 @@
+import argparse
+import sys
+import time
+import tracemalloc
+
+from item_model import Product
+
+# Microbenchmark: DynamoDB-JSON literals (the old seed data style) and a
+# generic type-inspecting marshaller against Product records with their
+# compiled serializer. Peak memory covers building the rows and producing
+# every item from them; items/sec covers going from plain values to an item
+# (record construction included). It fails unless records beat literals on
+# both.
+
+
+def product_values(i):
+    return (100 + i, 'Book %d Title' % i, '%03d-%010d' % (i % 1000, i), ['Author1', 'Author2'],
+            20 + i % 50, '8.5 x 11.0 x 0.5', 500 + i % 300, i % 2 == 0, 'Book')
+
+
+def literal_item(values):
+    product_id, title, isbn, authors, price, dimensions, page_count, in_publication, category = values
+    return {
+        "Id": {"N": str(product_id)},
+        "Title": {"S": title},
+        "ISBN": {"S": isbn},
+        "Authors": {"L": [{"S": author} for author in authors]},
+        "Price": {"N": str(price)},
+        "Dimensions": {"S": dimensions},
+        "PageCount": {"N": str(page_count)},
+        "InPublication": {"BOOL": in_publication},
+        "ProductCategory": {"S": category},
+    }
+
+
+def marshal(value):
+    if isinstance(value, bool):
+        return {'BOOL': value}
+    if isinstance(value, (int, float)):
+        return {'N': str(value)}
+    if isinstance(value, str):
+        return {'S': value}
+    if isinstance(value, (list, tuple)):
+        return {'L': [marshal(element) for element in value]}
+    if isinstance(value, dict):
+        return {'M': dict((name, marshal(element)) for name, element in value.items())}
+    raise TypeError(type(value))
+
+
+FIELDS = ('Id', 'Title', 'ISBN', 'Authors', 'Price', 'Dimensions', 'PageCount', 'InPublication',
+          'ProductCategory')
+
+
+def generic_item(values):
+    return dict((name, marshal(value)) for name, value in zip(FIELDS, values))
+
+
+def rows_as_literals(count):
+    return [literal_item(product_values(i)) for i in range(count)]
+
+
+def rows_as_dicts(count):
+    return [dict(zip(FIELDS, product_values(i))) for i in range(count)]
+
+
+def rows_as_records(count):
+    return [Product(*product_values(i)) for i in range(count)]
+
+
+def serialize_all(rows, serialize):
+    # Items are handed to the loader one at a time and dropped after
+    for row in rows:
+        serialize(row)
+    return rows
+
+
+# Every approach builds all rows (the seed data held in memory) and
+# produces every DynamoDB-JSON item from them; literals are items already
+BUILDERS = {
+    'literal dicts': rows_as_literals,
+    'generic marshal': lambda count: serialize_all(rows_as_dicts(count), lambda row: marshal(row)['M']),
+    'slots records': lambda count: serialize_all(rows_as_records(count), Product.to_item),
+}
+
+# Turning one row of plain values into its DynamoDB-JSON item
+CONVERTERS = {
+    'literal dicts': literal_item,
+    'generic marshal': generic_item,
+    'slots records': lambda values: Product(*values).to_item(),
+}
+
+
+def peak_memory(build, count):
+    tracemalloc.start()
+    rows = build(count)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del rows
+    return peak
+
+
+def items_per_second(convert, values, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for row in values:
+            convert(row)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return len(values) / best
+
+
+def main(args):
+    count = args.items
+    values = [product_values(i) for i in range(count)]
+    results = [(name, peak_memory(BUILDERS[name], count), items_per_second(CONVERTERS[name], values, args.repeat))
+               for name in ('literal dicts', 'generic marshal', 'slots records')]
+    print('%-16s %14s %14s' % ('approach', 'peak bytes', 'items/sec'))
+    for name, memory, rate in results:
+        print('%-16s %14d %14.0f' % (name, memory, rate))
+
+    literal, _, records = results
+    failed = False
+    if records[1] >= literal[1]:
+        print('Records used more memory than literals (%d vs %d bytes)' % (records[1], literal[1]))
+        failed = True
+    if records[2] <= literal[2]:
+        print('Records were slower than literals (%.0f vs %.0f items/sec)' % (records[2], literal[2]))
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark item construction and marshalling')
+    parser.add_argument('-items', type=int, default=100000)
+    parser.add_argument('-repeat', type=int, default=3)
+    sys.exit(main(parser.parse_args()))
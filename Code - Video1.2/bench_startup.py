@@ -0,0 +1,78 @@
+import argparse
+import os
+import subprocess
+import sys
+
+# Startup budget for the CLI: imports initialize_dynamodb and builds its
+# parser under python -X importtime, and fails when that takes longer than
+# the budget or loads a module only some operations need.
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+STARTUP_CODE = 'import initialize_dynamodb; initialize_dynamodb.create_parser()'
+
+DEFAULT_BUDGET_MS = 75.0
+
+# Loaded by the operations that use them, never at startup
+DEFERRED_MODULES = ('boto3', 'botocore', 'aiobotocore', 'requests', 'asyncio', 'concurrent.futures',
+                    'multiprocessing', 'urllib.request', 'http.client')
+
+
+def import_times(code=STARTUP_CODE, python=sys.executable):
+    # module -> (self, cumulative) import time in microseconds
+    output = subprocess.run([python, '-X', 'importtime', '-c', code], cwd=SCRIPT_DIR, stderr=subprocess.PIPE,
+                            stdout=subprocess.DEVNULL, check=True, universal_newlines=True).stderr
+    times = {}
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def best_import_times(runs=5, code=STARTUP_CODE):
+    # Fastest of several runs per module, to keep scheduling noise out
+    best = {}
+    for _ in range(runs):
+        for name, (self_us, cumulative_us) in import_times(code).items():
+            if name in best:
+                self_us, cumulative_us = min(self_us, best[name][0]), min(cumulative_us, best[name][1])
+            best[name] = (self_us, cumulative_us)
+    return best
+
+
+def check(times, budget_ms=DEFAULT_BUDGET_MS, module='initialize_dynamodb'):
+    problems = []
+    cumulative_ms = times[module][1] / 1000.0
+    if cumulative_ms > budget_ms:
+        problems.append('importing %s took %.1f ms, over the %.1f ms budget' % (module, cumulative_ms, budget_ms))
+    for name in DEFERRED_MODULES:
+        if name in times:
+            problems.append('%s is imported at startup' % name)
+    return problems
+
+
+def main(args):
+    times = best_import_times(args.runs)
+    print('%-40s %10s %12s' % ('module', 'self ms', 'cumulative ms'))
+    for name, (self_us, cumulative_us) in sorted(times.items(), key=lambda entry: -entry[1][0])[:args.top]:
+        print('%-40s %10.1f %12.1f' % (name, self_us / 1000.0, cumulative_us / 1000.0))
+    problems = check(times, args.budget)
+    for problem in problems:
+        print('REGRESSION %s' % problem)
+    if not problems:
+        print('Startup imports took %.1f ms, within the %.1f ms budget'
+              % (times['initialize_dynamodb'][1] / 1000.0, args.budget))
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Check the CLI\'s startup import time against a budget')
+    parser.add_argument('-budget', type=float, default=DEFAULT_BUDGET_MS,
+                        help='Milliseconds importing initialize_dynamodb may take')
+    parser.add_argument('-runs', type=int, default=5,
+                        help='Runs to take the fastest import times from')
+    parser.add_argument('-top', type=int, default=10,
+                        help='Slowest modules to list')
+    sys.exit(main(parser.parse_args()))
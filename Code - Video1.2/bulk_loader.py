@@ -0,0 +1,230 @@
+import base64
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from item_size import item_size
+
+# Hard limits of a single BatchWriteItem call
+MAX_BATCH_ITEMS = 25
+MAX_BATCH_BYTES = 16 * 1024 * 1024
+# Largest item DynamoDB accepts, attribute names included
+MAX_ITEM_BYTES = 400 * 1024
+
+THROTTLING_ERROR_CODES = ('ProvisionedThroughputExceededException',
+                          'ThrottlingException',
+                          'RequestLimitExceeded')
+
+
+def encode_binary(value):
+    if isinstance(value, (bytes, bytearray)):
+        return base64.b64encode(value).decode('ascii')
+    raise TypeError('%r is not JSON serializable' % (value,))
+
+
+def request_size(write_request):
+    return len(json.dumps(write_request, separators=(',', ':'), default=encode_binary))
+
+
+def chunk_write_requests(write_requests, max_items=MAX_BATCH_ITEMS, max_bytes=MAX_BATCH_BYTES):
+    batch = []
+    batch_bytes = 0
+    for write_request in write_requests:
+        size = request_size(write_request)
+        if batch and (len(batch) == max_items or batch_bytes + size > max_bytes):
+            yield batch
+            batch = []
+            batch_bytes = 0
+        batch.append(write_request)
+        batch_bytes += size
+    if batch:
+        yield batch
+
+
+def split_oversized(batch):
+    # One item over the size limit makes DynamoDB reject its whole batch, so
+    # such items are failed on their own before anything is sent
+    kept = []
+    rejected = []
+    largest = 0
+    for write_request in batch:
+        size = item_size(write_request['PutRequest']['Item']) if 'PutRequest' in write_request else 0
+        if size > MAX_ITEM_BYTES:
+            rejected.append(write_request)
+            largest = max(largest, size)
+        else:
+            kept.append(write_request)
+    return kept, rejected, largest
+
+
+def oversized_error(rejected, largest):
+    return '%d item(s) over the 400 KB item size limit (largest %d bytes)' % (len(rejected), largest)
+
+
+def backoff_delay(attempt, base_delay, max_delay):
+    # Exponential backoff with full jitter
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+
+def error_code(error):
+    response = getattr(error, 'response', None) or {}
+    return response.get('Error', {}).get('Code')
+
+
+def is_throttling_error(error):
+    return error_code(error) in THROTTLING_ERROR_CODES
+
+
+class LoadStats(object):
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.items = {}
+        self.batches = 0
+        self.retries = 0
+        self.failures = []
+
+    def record_batch(self, table_name, item_count):
+        with self.lock:
+            self.items[table_name] = self.items.get(table_name, 0) + item_count
+            self.batches += 1
+
+    def record_retry(self, count=1):
+        with self.lock:
+            self.retries += count
+
+    def record_failure(self, table_name, item_count, error):
+        with self.lock:
+            self.failures.append((table_name, item_count, error))
+
+    def total_items(self):
+        return sum(self.items.values())
+
+    def summary(self):
+        elapsed = max(time.time() - self.started, 1e-9)
+        lines = ['Loaded %d items in %d batches in %.2fs (%.1f items/sec, %d retries)'
+                 % (self.total_items(), self.batches, elapsed,
+                    self.total_items() / elapsed, self.retries)]
+        for table_name in sorted(self.items):
+            lines.append('  %s: %d items' % (table_name, self.items[table_name]))
+        for table_name, item_count, error in self.failures:
+            lines.append('  %s: %d items FAILED (%s)' % (table_name, item_count, error))
+        return '\n'.join(lines)
+
+
+class BulkLoader(object):
+    # Writes any number of items through BatchWriteItem on a bounded thread
+    # pool shared by every table, retrying UnprocessedItems until they land.
+
+    def __init__(self, dynamodb_conn, max_workers=8, max_retries=10,
+                 base_delay=0.05, max_delay=10.0, rate_limiters=None, checkpoint=None):
+        self.dynamodb_conn = dynamodb_conn
+        self.rate_limiters = rate_limiters or {}
+        self.checkpoint = checkpoint
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.stats = LoadStats()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        # Keep the number of queued batches bounded so huge inputs stream
+        # through the pool instead of being materialized up front
+        self.slots = threading.BoundedSemaphore(max_workers * 2)
+
+    def load(self, table_name, items, source=None):
+        self.submit(table_name, ({'PutRequest': {'Item': item}} for item in items), source)
+
+    def load_request_items(self, request_items):
+        for table_name, write_requests in request_items.items():
+            self.submit(table_name, write_requests)
+
+    def submit(self, table_name, write_requests, source=None, replay=False):
+        # With a checkpoint, batches are tracked per source (the table by
+        # default); replayed batches are pending requests from an earlier run
+        for batch in chunk_write_requests(write_requests):
+            self.slots.acquire()
+            ticket = None
+            try:
+                if self.checkpoint:
+                    ticket = self.checkpoint.start(source or table_name, batch, replay)
+                future = self.executor.submit(self.write_batch, table_name, batch)
+            except Exception:
+                self.slots.release()
+                raise
+            future.add_done_callback(lambda done, batch=batch, ticket=ticket:
+                                     self.batch_done(table_name, batch, ticket, done))
+
+    def batch_done(self, table_name, batch, ticket, future):
+        self.slots.release()
+        # write_batch records its own failures; anything it raised is a bug
+        # that must still count against the load
+        error = future.exception()
+        if error is not None:
+            self.stats.record_failure(table_name, len(batch), error)
+        if ticket is not None:
+            self.checkpoint.finish(ticket, batch if error is not None else future.result())
+
+    def write_batch(self, table_name, batch):
+        limiter = self.rate_limiters.get(table_name)
+        attempt = 0
+        error = None
+        try:
+            kept, rejected, largest = split_oversized(batch)
+            pending = {table_name: kept} if kept else {}
+        except Exception as e:
+            pending, rejected, error = {table_name: batch}, [], e
+        while pending and error is None:
+            try:
+                if limiter:
+                    limiter.acquire(limiter.write_cost(pending[table_name]))
+                response = self.dynamodb_conn.batch_write_item(RequestItems=pending)
+                pending = response.get('UnprocessedItems') or {}
+                if not pending:
+                    if limiter:
+                        limiter.on_success()
+                    break
+            except Exception as e:
+                if not is_throttling_error(e):
+                    error = e
+                    break
+            if limiter:
+                limiter.on_throttle()
+            attempt += 1
+            if attempt > self.max_retries:
+                error = 'gave up after %d retries' % self.max_retries
+                break
+            self.stats.record_retry()
+            time.sleep(backoff_delay(attempt, self.base_delay, self.max_delay))
+        failed = pending.get(table_name, []) if error is not None else []
+        self.stats.record_batch(table_name, len(batch) - len(failed) - len(rejected))
+        if error is not None:
+            self.stats.record_failure(table_name, len(failed), error)
+        if rejected:
+            self.stats.record_failure(table_name, len(rejected), oversized_error(rejected, largest))
+        return failed + rejected
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        if self.checkpoint:
+            # A clean run leaves nothing to resume
+            if self.stats.failures:
+                self.checkpoint.save()
+            else:
+                self.checkpoint.remove()
+        if self.stats.failures:
+            raise Exception('Bulk load incomplete:\n' + self.stats.summary())
+        return self.stats
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.executor.shutdown(wait=True)
+            if self.checkpoint:
+                self.checkpoint.save()
+            return False
+        self.close()
+        return False
@@ -0,0 +1,157 @@
+import datetime
+import time
+
+from bulk_loader import error_code
+from table_schema import TABLES_BY_NAME, describe_table, is_on_demand, throughput, wait_for_table
+
+# Bulk-load capacity profiles. For the duration of a load a table is either
+# switched to on-demand (PAY_PER_REQUEST) or has its write capacity raised,
+# and afterwards it is brought back to the capacity its spec configures.
+#
+# Going back from on-demand to provisioned is allowed at any time, but a
+# provisioned table may only lower its capacity 4 times per UTC day plus
+# once more for every hour without a decrease. DescribeTable reports both
+# counters, so capacity is only raised when lowering it again afterwards is
+# certain to be allowed.
+
+BULK_MODES = ('none', 'on-demand', 'provisioned')
+
+FREE_DECREASES_PER_DAY = 4
+DECREASE_INTERVAL = datetime.timedelta(hours=1)
+
+
+def as_datetime(value):
+    # botocore returns aware datetimes, other clients epoch seconds
+    if value is None or isinstance(value, datetime.datetime):
+        return value
+    return datetime.datetime.fromtimestamp(value, datetime.timezone.utc)
+
+
+def utc_now():
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+def next_decrease_allowed(description, now=None):
+    # None when the table can lower its capacity right now, otherwise the
+    # earliest time it can
+    now = now or utc_now()
+    provisioned = description.get('ProvisionedThroughput', {})
+    if provisioned.get('NumberOfDecreasesToday', 0) < FREE_DECREASES_PER_DAY:
+        return None
+    last_decrease = as_datetime(provisioned.get('LastDecreaseDateTime'))
+    if last_decrease is None or now - last_decrease >= DECREASE_INTERVAL:
+        return None
+    return last_decrease + DECREASE_INTERVAL
+
+
+def steady_state_request(spec, description):
+    # UpdateTable request that returns a table to its spec's capacity, or
+    # None if it is already there
+    wanted = throughput(spec.read_capacity, spec.write_capacity)
+    if is_on_demand(description):
+        request = {'TableName': spec.name, 'BillingMode': 'PROVISIONED', 'ProvisionedThroughput': wanted}
+        if spec.global_indexes:
+            request['GlobalSecondaryIndexUpdates'] = [
+                {'Update': {'IndexName': index.name,
+                            'ProvisionedThroughput': throughput(index.read_capacity, index.write_capacity)}}
+                for index in spec.global_indexes]
+        return request
+    current = description.get('ProvisionedThroughput', {})
+    if any(current.get(name) != value for name, value in wanted.items()):
+        return {'TableName': spec.name, 'ProvisionedThroughput': wanted}
+    return None
+
+
+def bulk_request(description, mode, write_capacity, now=None):
+    # UpdateTable request that prepares a table for a bulk load, or None
+    if mode == 'none' or is_on_demand(description):
+        return None
+    if mode == 'on-demand':
+        return {'TableName': description['TableName'], 'BillingMode': 'PAY_PER_REQUEST'}
+    current = description.get('ProvisionedThroughput', {})
+    if current.get('WriteCapacityUnits', 0) >= write_capacity:
+        return None
+    if next_decrease_allowed(description, now) is not None:
+        return None
+    return {'TableName': description['TableName'],
+            'ProvisionedThroughput': {'ReadCapacityUnits': current['ReadCapacityUnits'],
+                                      'WriteCapacityUnits': write_capacity}}
+
+
+class BulkLoadProfile(object):
+    # Context manager around a load: prepares every table on entry and
+    # returns it to its spec's steady-state capacity on exit, even when the
+    # load fails
+
+    def __init__(self, dynamodb_conn, table_names, mode='on-demand', write_capacity=1000, wait_timeout=300,
+                 log=print):
+        if mode not in BULK_MODES:
+            raise Exception('Unknown bulk mode "%s", expected one of %s' % (mode, ', '.join(BULK_MODES)))
+        self.dynamodb_conn = dynamodb_conn
+        self.table_names = sorted(table_names)
+        self.mode = mode
+        self.write_capacity = write_capacity
+        self.wait_timeout = wait_timeout
+        self.log = log
+        # Tables that were on demand before a provisioned-mode load stay so;
+        # an on-demand load assumes it (or create-and-upload) put them there
+        self.keep_on_demand = set()
+
+    def update(self, request):
+        self.dynamodb_conn.update_table(**request)
+        wait_for_table(self.dynamodb_conn, request['TableName'], time.time() + self.wait_timeout)
+
+    def enter(self):
+        for table_name in self.table_names:
+            description = describe_table(self.dynamodb_conn, table_name)
+            if description is None:
+                continue
+            if self.mode != 'on-demand' and is_on_demand(description):
+                self.keep_on_demand.add(table_name)
+            request = bulk_request(description, self.mode, self.write_capacity)
+            if request is None:
+                allowed = next_decrease_allowed(description)
+                if self.mode == 'provisioned' and allowed is not None:
+                    self.log('%s: capacity not raised, it could not be lowered again before %s'
+                             % (table_name, allowed.isoformat()))
+                continue
+            try:
+                self.update(request)
+            except Exception as e:
+                # Switches to on-demand are limited too; load at the current
+                # capacity rather than not at all
+                if error_code(e) != 'LimitExceededException':
+                    raise
+                self.log('%s: left unchanged for the load (%s)' % (table_name, e))
+                continue
+            self.log('%s: %s for the bulk load' % (
+                table_name, 'switched to on-demand' if self.mode == 'on-demand'
+                else 'write capacity raised to %d' % self.write_capacity))
+
+    def exit(self):
+        for table_name in self.table_names:
+            if table_name in self.keep_on_demand:
+                continue
+            spec = TABLES_BY_NAME.get(table_name)
+            description = describe_table(self.dynamodb_conn, table_name)
+            request = steady_state_request(spec, description) if spec and description else None
+            if request is None:
+                continue
+            lowering = not is_on_demand(description) and any(
+                request['ProvisionedThroughput'][name] < description['ProvisionedThroughput'].get(name, 0)
+                for name in request['ProvisionedThroughput'])
+            allowed = next_decrease_allowed(description) if lowering else None
+            if allowed is not None:
+                self.log('%s: capacity cannot be lowered before %s, run "create" again after that'
+                         % (table_name, allowed.isoformat()))
+                continue
+            self.update(request)
+            self.log('%s: back to %d/%d provisioned capacity' % (table_name, spec.read_capacity, spec.write_capacity))
+
+    def __enter__(self):
+        self.enter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.exit()
+        return False
@@ -0,0 +1,116 @@
+import json
+import os
+import threading
+import time
+
+from bulk_loader import encode_binary
+from seed_sources import decode_binary
+
+# A checkpoint records, per input source, how many input items are known
+# to be done (written, or kept in "pending" because they could not be
+# written) and the write requests still pending. Batches in flight when a
+# checkpoint is saved are past the offset and will simply be written again.
+
+
+class Checkpoint(object):
+
+    def __init__(self, path, interval=10.0, state=None):
+        self.path = path
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.save_lock = threading.Lock()
+        self.saved = time.time()
+        self.offsets = {}
+        self.next_offsets = {}
+        self.pending = {}
+        self.in_flight = {}
+        self.next_ticket = 0
+        for source, entry in ((state or {}).get('sources') or {}).items():
+            self.offsets[source] = self.next_offsets[source] = entry['offset']
+            self.pending[source] = [decode_request(request) for request in entry['pending']]
+
+    @classmethod
+    def load(cls, path, interval=10.0):
+        try:
+            with open(path) as f:
+                state = json.load(f)
+        except (IOError, OSError):
+            state = None
+        return cls(path, interval, state)
+
+    def offset(self, source):
+        return self.offsets.get(source, 0)
+
+    def rewind(self, source, start):
+        # Restarts counting a source at an earlier input offset, before any
+        # of its batches are submitted
+        with self.lock:
+            self.offsets[source] = self.next_offsets[source] = start
+        return start
+
+    def take_pending(self, source):
+        # Pending requests are replayed first; they stay in the checkpoint
+        # until their replay batch finishes
+        with self.lock:
+            return self.pending.pop(source, [])
+
+    def start(self, source, batch, replay=False):
+        with self.lock:
+            ticket = self.next_ticket
+            self.next_ticket += 1
+            if replay:
+                self.in_flight[ticket] = (source, None, batch)
+            else:
+                start = self.next_offsets.get(source, 0)
+                self.next_offsets[source] = start + len(batch)
+                self.in_flight[ticket] = (source, start, None)
+            return ticket
+
+    def finish(self, ticket, failed):
+        with self.lock:
+            source, _, _ = self.in_flight.pop(ticket)
+            if failed:
+                self.pending.setdefault(source, []).extend(failed)
+            self.advance(source)
+            due = time.time() - self.saved >= self.interval
+        if due:
+            self.save()
+
+    def advance(self, source):
+        # Everything before the oldest input batch still in flight is done
+        starts = [start for ticket_source, start, _ in self.in_flight.values()
+                  if ticket_source == source and start is not None]
+        self.offsets[source] = min(starts) if starts else self.next_offsets.get(source, 0)
+
+    def state(self):
+        with self.lock:
+            sources = {}
+            for source in set(self.offsets) | set(self.pending) | set(s for s, _, _ in self.in_flight.values()):
+                pending = list(self.pending.get(source, []))
+                for ticket_source, _, replayed in self.in_flight.values():
+                    if ticket_source == source and replayed:
+                        pending.extend(replayed)
+                sources[source] = {'offset': self.offsets.get(source, 0), 'pending': pending}
+            return {'version': 1, 'sources': sources}
+
+    def save(self):
+        with self.save_lock:
+            state = self.state()
+            temporary_path = '%s.%d' % (self.path, os.getpid())
+            with open(temporary_path, 'w') as f:
+                json.dump(state, f, separators=(',', ':'), default=encode_binary)
+            os.rename(temporary_path, self.path)
+            self.saved = time.time()
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def decode_request(request):
+    for request_type in ('PutRequest', 'DeleteRequest'):
+        if request_type in request:
+            body = request[request_type]
+            field = 'Item' if request_type == 'PutRequest' else 'Key'
+            return {request_type: {field: dict((name, decode_binary(value)) for name, value in body[field].items())}}
+    return request
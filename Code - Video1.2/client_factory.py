@@ -0,0 +1,67 @@
+import os
+import threading
+
+# Endpoints served by memory_dynamodb, imported only when used
+MEMORY_SCHEME = 'memory://'
+# Region reported for them when none is given; the stand-in has no regions
+MEMORY_REGION = 'us-east-1'
+
+# Settings applied to every client built from now on
+client_settings = {
+    'max_pool_connections': 10,
+    'tcp_keepalive': False,
+    'retry_mode': 'standard',
+    'max_attempts': 3,
+}
+
+clients = {}
+clients_lock = threading.Lock()
+
+
+def configure(**settings):
+    unknown = set(settings) - set(client_settings)
+    if unknown:
+        raise Exception('Unknown client settings: %s' % ', '.join(sorted(unknown)))
+    with clients_lock:
+        client_settings.update((name, value) for name, value in settings.items() if value is not None)
+        # Clients built with the old settings are not reused
+        clients.clear()
+
+
+def client_config_options(**overrides):
+    # Shared by the boto3 clients here and the async engine's AioConfig
+    options = {
+        'max_pool_connections': client_settings['max_pool_connections'],
+        'tcp_keepalive': client_settings['tcp_keepalive'],
+        'retries': {'mode': client_settings['retry_mode'],
+                    'max_attempts': client_settings['max_attempts']},
+    }
+    options.update(overrides)
+    return options
+
+
+def client_config():
+    from botocore.config import Config
+    return Config(**client_config_options())
+
+
+def is_memory_endpoint(endpoint_url):
+    return bool(endpoint_url) and endpoint_url.startswith(MEMORY_SCHEME)
+
+
+def get_client(region, endpoint_url=None):
+    # One client per region and endpoint in each process; boto3 clients are
+    # thread safe but must not be shared with forked children. memory://
+    # endpoints get the in-process stand-in and need no boto3 at all
+    if is_memory_endpoint(endpoint_url):
+        import memory_dynamodb
+        return memory_dynamodb.connect(endpoint_url)
+    key = (os.getpid(), region, endpoint_url)
+    with clients_lock:
+        client = clients.get(key)
+        if client is None:
+            import boto3
+            client = boto3.session.Session().client('dynamodb', region_name=region,
+                                                    endpoint_url=endpoint_url, config=client_config())
+            clients[key] = client
+        return client
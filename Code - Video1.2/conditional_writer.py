@@ -0,0 +1,232 @@
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from bulk_loader import LoadStats, backoff_delay, error_code, is_throttling_error
+from seed_sources import read_items, resolve_sources
+from table_schema import TABLES_BY_NAME, key_attributes
+
+# Idempotent uploads. Every item is written with a condition so a reload
+# never clobbers a newer edit: it must not exist yet, or, with a version
+# attribute, carry a higher version than the stored one. Items that fail
+# the condition are reported as conflicts (or as unchanged when the stored
+# item is identical) instead of failing the run.
+#
+# In transactional mode each Forum row and its Thread rows are written
+# together in TransactWriteItems calls of up to 100 actions, so the forum
+# counters never disagree with the threads that were written. Only the
+# Forum rows are held in memory; Thread rows are streamed and each forum's
+# group is written as soon as it fills a transaction.
+
+WRITE_MODES = ('overwrite', 'conditional', 'transactional')
+
+MAX_TRANSACTION_ITEMS = 100
+
+# Cancellation reasons worth retrying the transaction for
+RETRYABLE_CANCELLATIONS = ('ThrottlingError', 'ProvisionedThroughputExceeded', 'RequestLimitExceeded',
+                           'TransactionConflict')
+
+# Conflicts listed in the summary
+MAX_REPORTED = 20
+
+
+def conditional_put(table_name, item, version_attribute=None):
+    request = {
+        'TableName': table_name,
+        'Item': item,
+        'ConditionExpression': 'attribute_not_exists(#hash)',
+        'ExpressionAttributeNames': {'#hash': TABLES_BY_NAME[table_name].hash_key.name},
+        'ReturnValuesOnConditionCheckFailure': 'ALL_OLD',
+    }
+    if version_attribute and version_attribute in item:
+        request['ConditionExpression'] += ' OR #version < :version'
+        request['ExpressionAttributeNames']['#version'] = version_attribute
+        request['ExpressionAttributeValues'] = {':version': item[version_attribute]}
+    return request
+
+
+def forum_transactions(forums, threads):
+    # Groups every Forum row with the Thread rows of that forum, in chunks
+    # of at most MAX_TRANSACTION_ITEMS actions. A forum's first chunk starts
+    # with its Forum row; at most one partial chunk per forum is pending
+    groups = OrderedDict()
+    for forum in forums:
+        groups.setdefault(forum['Name']['S'], []).insert(0, ('Forum', forum))
+    for thread in threads:
+        actions = groups.setdefault(thread['ForumName']['S'], [])
+        actions.append(('Thread', thread))
+        if len(actions) == MAX_TRANSACTION_ITEMS:
+            yield actions[:]
+            del actions[:]
+    for actions in groups.values():
+        if actions:
+            yield actions
+
+
+class ConditionalWriter(object):
+    # Conditional PutItem and TransactWriteItems calls on a bounded thread
+    # pool, retrying throttles with the same backoff as BulkLoader
+
+    def __init__(self, dynamodb_conn, max_workers=8, max_retries=10, base_delay=0.05, max_delay=10.0,
+                 version_attribute=None, rate_limiters=None):
+        self.dynamodb_conn = dynamodb_conn
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.version_attribute = version_attribute
+        self.rate_limiters = rate_limiters or {}
+        self.stats = LoadStats()
+        self.lock = threading.Lock()
+        self.conflicts = []
+        self.unchanged = 0
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.slots = threading.BoundedSemaphore(max_workers * 2)
+
+    def submit(self, table_name, item_count, function, *args):
+        self.slots.acquire()
+        try:
+            future = self.executor.submit(function, *args)
+        except Exception:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda done: self.task_done(table_name, item_count, done))
+
+    def task_done(self, table_name, item_count, future):
+        self.slots.release()
+        # The writers record their own failures; anything they raised is a bug
+        error = future.exception()
+        if error is not None:
+            self.stats.record_failure(table_name, item_count, error)
+
+    def put_items(self, table_name, items):
+        for item in items:
+            self.submit(table_name, 1, self.put_item, table_name, item)
+
+    def transact(self, transactions):
+        for actions in transactions:
+            self.submit('/'.join(sorted(set(table_name for table_name, _ in actions))), len(actions),
+                        self.write_transaction, actions)
+
+    def pace(self, actions, cost_factor=1):
+        for table_name, item in actions:
+            limiter = self.rate_limiters.get(table_name)
+            if limiter:
+                limiter.acquire(limiter.write_cost([{'PutRequest': {'Item': item}}]) * cost_factor)
+
+    def record_conflict(self, table_name, item, stored):
+        with self.lock:
+            if stored == item:
+                self.unchanged += 1
+            else:
+                key_names = key_attributes(TABLES_BY_NAME[table_name])
+                self.conflicts.append((table_name, dict((name, item[name]) for name in key_names)))
+
+    def put_item(self, table_name, item):
+        attempt = 0
+        while True:
+            try:
+                self.pace([(table_name, item)])
+                self.dynamodb_conn.put_item(**conditional_put(table_name, item, self.version_attribute))
+                self.stats.record_batch(table_name, 1)
+                return
+            except Exception as e:
+                if error_code(e) == 'ConditionalCheckFailedException':
+                    self.record_conflict(table_name, item, (getattr(e, 'response', None) or {}).get('Item'))
+                    return
+                if not is_throttling_error(e):
+                    self.stats.record_failure(table_name, 1, e)
+                    return
+            attempt += 1
+            if attempt > self.max_retries:
+                self.stats.record_failure(table_name, 1, 'gave up after %d retries' % self.max_retries)
+                return
+            self.stats.record_retry()
+            time.sleep(backoff_delay(attempt, self.base_delay, self.max_delay))
+
+    def write_transaction(self, actions):
+        # A cancelled transaction names the actions whose condition failed;
+        # they are reported and the rest is written without them
+        attempt = 0
+        while actions:
+            try:
+                # Transactional writes cost twice the capacity of plain ones
+                self.pace(actions, 2)
+                self.dynamodb_conn.transact_write_items(TransactItems=[
+                    {'Put': conditional_put(table_name, item, self.version_attribute)}
+                    for table_name, item in actions])
+                for table_name, item in actions:
+                    self.stats.record_batch(table_name, 1)
+                return
+            except Exception as e:
+                if error_code(e) == 'TransactionCanceledException':
+                    reasons = (getattr(e, 'response', None) or {}).get('CancellationReasons') or []
+                    remaining = []
+                    for action, reason in zip(actions, reasons + [{}] * (len(actions) - len(reasons))):
+                        if reason.get('Code') == 'ConditionalCheckFailed':
+                            self.record_conflict(action[0], action[1], reason.get('Item'))
+                        else:
+                            remaining.append(action)
+                    conflicted = len(actions) - len(remaining)
+                    actions = remaining
+                    if not any(reason.get('Code') in RETRYABLE_CANCELLATIONS for reason in reasons):
+                        if conflicted:
+                            continue
+                        self.record_transaction_failure(actions, e)
+                        return
+                elif not is_throttling_error(e):
+                    self.record_transaction_failure(actions, e)
+                    return
+            attempt += 1
+            if attempt > self.max_retries:
+                self.record_transaction_failure(actions, 'gave up after %d retries' % self.max_retries)
+                return
+            self.stats.record_retry()
+            time.sleep(backoff_delay(attempt, self.base_delay, self.max_delay))
+
+    def record_transaction_failure(self, actions, error):
+        for table_name in sorted(set(table_name for table_name, _ in actions)):
+            self.stats.record_failure(table_name, sum(1 for name, _ in actions if name == table_name), error)
+
+    def summary(self):
+        lines = [self.stats.summary(), '  %d unchanged, %d conflicts' % (self.unchanged, len(self.conflicts))]
+        for table_name, key in self.conflicts[:MAX_REPORTED]:
+            lines.append('    conflict: %s %s' % (table_name, key))
+        if len(self.conflicts) > MAX_REPORTED:
+            lines.append('    ... and %d more conflicts' % (len(self.conflicts) - MAX_REPORTED))
+        return '\n'.join(lines)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        if self.stats.failures:
+            raise Exception('Conditional load incomplete:\n' + self.summary())
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.executor.shutdown(wait=True)
+            return False
+        self.close()
+        return False
+
+
+def upload(dynamodb_conn, sources=None, mode='conditional', threads=8, version_attribute=None,
+           rate_limiters=None):
+    resolved_sources = resolve_sources(sources)
+    with ConditionalWriter(dynamodb_conn, max_workers=threads, version_attribute=version_attribute,
+                           rate_limiters=rate_limiters) as writer:
+        grouped = {'Forum': [], 'Thread': []}
+        for table_name, path in resolved_sources:
+            if mode == 'transactional' and table_name in grouped:
+                grouped[table_name].append(path)
+            else:
+                writer.put_items(table_name, read_items(path))
+        if grouped['Forum'] or grouped['Thread']:
+            forums = [forum for path in grouped['Forum'] for forum in read_items(path)]
+            threads = itertools.chain.from_iterable(read_items(path) for path in grouped['Thread'])
+            writer.transact(forum_transactions(forums, threads))
+    return writer
@@ -1,703 +1,334 @@
 import argparse
-import boto3
-import json
-import requests
+import itertools
+import os
+
+# Only argparse is imported up front: -help and argument errors must not
+# pay for boto3, asyncio or thread pools, so every operation imports what
+# it needs when it runs (see bench_startup.py for the budget).
+
+# Kept in step with capacity_profile.BULK_MODES and
+# conditional_writer.WRITE_MODES, which are too heavy to import here
+BULK_MODES = ('none', 'on-demand', 'provisioned')
+WRITE_MODES = ('overwrite', 'conditional', 'transactional')
+
+# Operations that talk to DynamoDB; the others only read the sources and
+# need neither a region nor a client
+CLIENT_OPERATIONS = ('create', 'upload', 'create-and-upload', 'verify', 'export', 'truncate')
 
 
 def create_parser():
     parser = argparse.ArgumentParser(description='Create/Insert data into DynamoDB')
     parser.add_argument('-operation', required=True)
     parser.add_argument('-region', required=False)
+    parser.add_argument('-endpoint-url', required=False,
+                        help='DynamoDB endpoint, e.g. http://localhost:8000 for DynamoDB Local, or '
+                             'memory:// for the in-process stand-in')
+    parser.add_argument('-threads', type=int, default=8,
+                        help='Number of concurrent BatchWriteItem calls during upload')
+    parser.add_argument('-source', action='append',
+                        help='NDJSON/CSV seed file (optionally .gz), "Table=path", directory '
+                             'of <Table>.<ext> files or synthetic:seed=N,products=N,... '
+                             '(see seed_generator); defaults to the bundled seed_data')
+    parser.add_argument('-wait-timeout', type=int, default=300,
+                        help='Seconds to wait for created tables to become ACTIVE')
+    parser.add_argument('-write-utilization', type=float, default=1.0,
+                        help='Fraction of provisioned WCU the upload may use (0 disables pacing)')
+    parser.add_argument('-engine', choices=['sync', 'async'], default='sync',
+                        help='Upload with a thread pool (sync) or on one asyncio event loop (async)')
+    parser.add_argument('-max-in-flight', type=int, default=128,
+                        help='Concurrent BatchWriteItem calls with -engine async')
+    parser.add_argument('-bulk-mode', choices=BULK_MODES, default='none',
+                        help='Switch the tables to on-demand or raise their write capacity for the upload, '
+                             'then return them to their configured capacity')
+    parser.add_argument('-bulk-write-capacity', type=int, default=1000,
+                        help='Write capacity used with -bulk-mode provisioned')
+    parser.add_argument('-write-mode', choices=WRITE_MODES, default='overwrite',
+                        help='overwrite with BatchWriteItem, or only write items that are new (or newer, see '
+                             '-version-attribute); transactional also writes each forum with its threads atomically')
+    parser.add_argument('-version-attribute',
+                        help='Numeric attribute that lets conditional writes replace older versions of an item')
+    parser.add_argument('-workers', type=int, default=1,
+                        help='Processes to shard the upload across by hash key')
+    parser.add_argument('-checkpoint', default='upload-checkpoint.json',
+                        help='File the upload records its progress in ("" disables checkpointing)')
+    parser.add_argument('-checkpoint-interval', type=float, default=10.0,
+                        help='Seconds between checkpoint writes')
+    parser.add_argument('-resume', action='store_true',
+                        help='Continue the upload recorded in -checkpoint')
+    parser.add_argument('-output', default='export',
+                        help='Directory export and generate write <Table>.ndjson.gz files to')
+    parser.add_argument('-segments', type=int, default=8,
+                        help='Parallel Scan segments per table for export, verify and truncate')
+    parser.add_argument('-table', action='append',
+                        help='Limit export, verify and truncate to these tables (defaults to all four)')
+    parser.add_argument('-key-from',
+                        help='With truncate, only delete items whose hash key is at least this')
+    parser.add_argument('-key-to',
+                        help='With truncate, only delete items whose hash key is at most this')
+    parser.add_argument('-max-pool-connections', type=int,
+                        help='HTTP connections per client (defaults to enough for -threads)')
+    parser.add_argument('-tcp-keepalive', action='store_true',
+                        help='Enable TCP keep-alive on DynamoDB connections')
+    parser.add_argument('-retry-mode', choices=['legacy', 'standard', 'adaptive'], default='standard',
+                        help='botocore retry mode')
+    parser.add_argument('-max-attempts', type=int, default=3,
+                        help='botocore attempts per call before the loader\'s own retry takes over')
+    parser.add_argument('-progress-interval', type=float, default=10.0,
+                        help='Seconds between progress lines on stderr (0 disables them)')
+    parser.add_argument('-metrics-file',
+                        help='Write per-operation DynamoDB metrics here when done (.prom for '
+                             'Prometheus text, JSON otherwise)')
     return parser
 
 
-def connect_to_dynamo(region):
-    return boto3.client('dynamodb', region_name=region)
-
-
-
-def create_dynamo_db_tables(region):
-    dynamodb_conn = connect_to_dynamo(region)
-
-    # Create ProductCatalog DynamoDB Table
-    response = dynamodb_conn.create_table(AttributeDefinitions=[
-                                          {
-                                            'AttributeName': 'Id',
-                                            'AttributeType': 'N'
-                                          },
-                                          ],
-                                          TableName='ProductCatalog',
-                                          KeySchema=[
-                                              {
-                                                  'AttributeName': 'Id',
-                                                  'KeyType': 'HASH'
-                                              },
-                                          ],
-                                          ProvisionedThroughput = {
-                                                  'ReadCapacityUnits': 5,
-                                                  'WriteCapacityUnits': 5
-                                                })
-
-    # Create Forum DynamoDB Table
-    response = dynamodb_conn.create_table(AttributeDefinitions=[
-                                            {
-                                                'AttributeName': 'Name',
-                                                'AttributeType': 'S'
-                                            },
-                                            ],
-                                          TableName='Forum',
-                                          KeySchema=[
-                                            {
-                                                'AttributeName': 'Name',
-                                                'KeyType': 'HASH'
-                                            },
-                                            ],
-                                          ProvisionedThroughput={
-                                            'ReadCapacityUnits': 5,
-                                            'WriteCapacityUnits': 5
-                                            })
-
-
-    # Create Thread DynamoDB Table
-    response = dynamodb_conn.create_table(AttributeDefinitions=[
-                                            {
-                                            'AttributeName': 'ForumName',
-                                            'AttributeType': 'S'
-                                            },
-                                            {
-                                            'AttributeName': 'Subject',
-                                            'AttributeType': 'S'
-                                            }
-                                            ],
-                                         TableName='Thread',
-                                         KeySchema=[
-                                            {
-                                            'AttributeName': 'ForumName',
-                                            'KeyType': 'HASH'
-                                            },
-                                            {
-                                            'AttributeName' : 'Subject',
-                                            'KeyType': 'RANGE'
-                                            }
-                                            ],
-                                        ProvisionedThroughput={
-                                        'ReadCapacityUnits': 5,
-                                        'WriteCapacityUnits': 5
-                                            })
-
-    # Create Reply DynamoDB Table
-    response = dynamodb_conn.create_table(AttributeDefinitions=[
-                                          {
-                                            'AttributeName': 'Id',
-                                            'AttributeType': 'S'
-                                          },
-                                          {
-                                            'AttributeName': 'ReplyDateTime',
-                                            'AttributeType': 'S'
-                                          },
-                                          {
-                                            'AttributeName': 'PostedBy',
-                                            'AttributeType': 'S'
-                                          }
-                                          ],
-                                          TableName='Reply',
-                                          KeySchema=[
-                                          {
-                                            'AttributeName': 'Id',
-                                            'KeyType': 'HASH',
-                                          },
-                                          {
-                                            'AttributeName': 'ReplyDateTime',
-                                            'KeyType': 'RANGE'
-                                          }
-                                          ],
-                                          LocalSecondaryIndexes=[
-                                          {
-                                            'IndexName': 'PostedBy-Index',
-                                            'KeySchema': [
-                                                {
-                                                    'AttributeName': 'Id',
-                                                    'KeyType': 'HASH'
-                                                },
-                                                {
-                                                    'AttributeName': 'PostedBy',
-                                                    'KeyType': 'RANGE'
-                                                }
-                                                ],
-                                            'Projection': {
-                                                'ProjectionType': 'KEYS_ONLY'
-                                                }
-                                          },
-                                          ],
-                                          ProvisionedThroughput={
-                                            'ReadCapacityUnits': 5,
-                                            'WriteCapacityUnits': 5
-                                          })
-
-
-def upload_data_to_dynamo_db_tables(region):
-    dynamodb_conn = connect_to_dynamo(region)
-
-    # Add data to ProductCatalog DynamoDB Table
-    dynamodb_conn.batch_write_item(RequestItems={
-                                    "ProductCatalog": [
-                                        {
-                                            "PutRequest": {
-                                                "Item": {
-                                                    "Id": {
-                                                        "N": "101"
-                                                    },
-                                                    "Title": {
-                                                        "S": "Book 101 Title"
-                                                    },
-                                                    "ISBN": {
-                                                        "S": "111-1111111111"
-                                                    },
-                                                    "Authors": {
-                                                        "L": [
-                                                            {
-                                                                "S": "Author1"
-                                                            }
-                                                        ]
-                                                    },
-                                                    "Price": {
-                                                        "N": "2"
-                                                    },
-                                                    "Dimensions": {
-                                                        "S": "8.5 x 11.0 x 0.5"
-                                                    },
-                                                    "PageCount": {
-                                                        "N": "500"
-                                                    },
-                                                    "InPublication": {
-                                                        "BOOL": True
-                                                    },
-                                                    "ProductCategory": {
-                                                        "S": "Book"
-                                                    }
-                                                }
-                                            }
-                                        },
-                                        {
-                                            "PutRequest": {
-                                                "Item": {
-                                                    "Id": {
-                                                        "N": "102"
-                                                    },
-                                                    "Title": {
-                                                        "S": "Book 102 Title"
-                                                    },
-                                                    "ISBN": {
-                                                        "S": "222-2222222222"
-                                                    },
-                                                    "Authors": {
-                                                        "L": [
-                                                            {
-                                                                "S": "Author1"
-                                                            },
-                                                            {
-                                                                "S": "Author2"
-                                                            }
-                                                        ]
-                                                    },
-                                                    "Price": {
-                                                        "N": "20"
-                                                    },
-                                                    "Dimensions": {
-                                                        "S": "8.5 x 11.0 x 0.8"
-                                                    },
-                                                    "PageCount": {
-                                                        "N": "600"
-                                                    },
-                                                    "InPublication": {
-                                                        "BOOL": True
-                                                    },
-                                                    "ProductCategory": {
-                                                        "S": "Book"
-                                                    }
-                                                }
-                                            }
-                                        },
-                                        {
-                                            "PutRequest": {
-                                                "Item": {
-                                                    "Id": {
-                                                        "N": "103"
-                                                    },
-                                                    "Title": {
-                                                        "S": "Book 103 Title"
-                                                    },
-                                                    "ISBN": {
-                                                        "S": "333-3333333333"
-                                                    },
-                                                    "Authors": {
-                                                        "L": [
-                                                            {
-                                                                "S": "Author1"
-                                                            },
-                                                            {
-                                                                "S": "Author2"
-                                                            }
-                                                        ]
-                                                    },
-                                                    "Price": {
-                                                        "N": "2000"
-                                                    },
-                                                    "Dimensions": {
-                                                        "S": "8.5 x 11.0 x 1.5"
-                                                    },
-                                                    "PageCount": {
-                                                        "N": "600"
-                                                    },
-                                                    "InPublication": {
-                                                        "BOOL": False
-                                                    },
-                                                    "ProductCategory": {
-                                                        "S": "Book"
-                                                    }
-                                                }
-                                            }
-                                        },
-                                        {
-                                            "PutRequest": {
-                                                "Item": {
-                                                    "Id": {
-                                                        "N": "201"
-                                                    },
-                                                    "Title": {
-                                                        "S": "18-Bike-201"
-                                                    },
-                                                    "Description": {
-                                                        "S": "201 Description"
-                                                    },
-                                                    "BicycleType": {
-                                                        "S": "Road"
-                                                    },
-                                                    "Brand": {
-                                                        "S": "Mountain A"
-                                                    },
-                                                    "Price": {
-                                                        "N": "100"
-                                                    },
-                                                    "Color": {
-                                                        "L": [
-                                                            {
-                                                                "S": "Red"
-                                                            },
-                                                            {
-                                                                "S": "Black"
-                                                            }
-                                                        ]
-                                                    },
-                                                    "ProductCategory": {
-                                                        "S": "Bicycle"
-                                                    }
-                                                }
-                                            }
-                                        },
-                                        {
-                                            "PutRequest": {
-                                                "Item": {
-                                                    "Id": {
-                                                        "N": "202"
-                                                    },
-                                                    "Title": {
-                                                        "S": "21-Bike-202"
-                                                    },
-                                                    "Description": {
-                                                        "S": "202 Description"
-                                                    },
-                                                    "BicycleType": {
-                                                        "S": "Road"
-                                                    },
-                                                    "Brand": {
-                                                        "S": "Brand-Company A"
-                                                    },
-                                                    "Price": {
-                                                        "N": "200"
-                                                    },
-                                                    "Color": {
-                                                        "L": [
-                                                            {
-                                                                "S": "Green"
-                                                            },
-                                                            {
-                                                                "S": "Black"
-                                                            }
-                                                        ]
-                                                    },
-                                                    "ProductCategory": {
-                                                        "S": "Bicycle"
-                                                    }
-                                                }
-                                            }
-                                        },
-                                        {
-                                            "PutRequest": {
-                                                "Item": {
-                                                    "Id": {
-                                                        "N": "203"
-                                                    },
-                                                    "Title": {
-                                                        "S": "19-Bike-203"
-                                                    },
-                                                    "Description": {
-                                                        "S": "203 Description"
-                                                    },
-                                                    "BicycleType": {
-                                                        "S": "Road"
-                                                    },
-                                                    "Brand": {
-                                                        "S": "Brand-Company B"
-                                                    },
-                                                    "Price": {
-                                                        "N": "300"
-                                                    },
-                                                    "Color": {
-                                                        "L": [
-                                                            {
-                                                                "S": "Red"
-                                                            },
-                                                            {
-                                                                "S": "Green"
-                                                            },
-                                                            {
-                                                                "S": "Black"
-                                                            }
-                                                        ]
-                                                    },
-                                                    "ProductCategory": {
-                                                        "S": "Bicycle"
-                                                    }
-                                                }
-                                            }
-                                        },
-                                        {
-                                            "PutRequest": {
-                                                "Item": {
-                                                    "Id": {
-                                                        "N": "204"
-                                                    },
-                                                    "Title": {
-                                                        "S": "18-Bike-204"
-                                                    },
-                                                    "Description": {
-                                                        "S": "204 Description"
-                                                    },
-                                                    "BicycleType": {
-                                                        "S": "Mountain"
-                                                    },
-                                                    "Brand": {
-                                                        "S": "Brand-Company B"
-                                                    },
-                                                    "Price": {
-                                                        "N": "400"
-                                                    },
-                                                    "Color": {
-                                                        "L": [
-                                                            {
-                                                                "S": "Red"
-                                                            }
-                                                        ]
-                                                    },
-                                                    "ProductCategory": {
-                                                        "S": "Bicycle"
-                                                    }
-                                                }
-                                            }
-                                        },
-                                        {
-                                            "PutRequest": {
-                                                "Item": {
-                                                    "Id": {
-                                                        "N": "205"
-                                                    },
-                                                    "Title": {
-                                                        "S": "18-Bike-204"
-                                                    },
-                                                    "Description": {
-                                                        "S": "205 Description"
-                                                    },
-                                                    "BicycleType": {
-                                                        "S": "Hybrid"
-                                                    },
-                                                    "Brand": {
-                                                        "S": "Brand-Company C"
-                                                    },
-                                                    "Price": {
-                                                        "N": "500"
-                                                    },
-                                                    "Color": {
-                                                        "L": [
-                                                            {
-                                                                "S": "Red"
-                                                            },
-                                                            {
-                                                                "S": "Black"
-                                                            }
-                                                        ]
-                                                    },
-                                                    "ProductCategory": {
-                                                        "S": "Bicycle"
-                                                    }
-                                                }
-                                            }
-                                        }
-                                    ]
-                                })
-
-    # Add data to Forum DynamoDB Table
-    dynamodb_conn.batch_write_item(RequestItems={
-                                    "Forum": [
-                                        {
-                                            "PutRequest": {
-                                                "Item": {
-                                                    "Name": {"S":"Amazon DynamoDB"},
-                                                    "Category": {"S":"Amazon Web Services"},
-                                                    "Threads": {"N":"2"},
-                                                    "Messages": {"N":"4"},
-                                                    "Views": {"N":"1000"}
-                                                }
-                                            }
-                                        },
-                                        {
-                                            "PutRequest": {
-                                                "Item": {
-                                                    "Name": {"S":"Amazon S3"},
-                                                    "Category": {"S":"Amazon Web Services"}
-                                                }
-                                            }
-                                        }
-                                    ]
-                                })
-
-    # Add data to Thread DynamoDB Table
-    dynamodb_conn.batch_write_item(RequestItems={
-                                    "Thread": [
-                                        {
-                                            "PutRequest": {
-                                                "Item": {
-                                                    "ForumName": {
-                                                        "S": "Amazon DynamoDB"
-                                                    },
-                                                    "Subject": {
-                                                        "S": "DynamoDB Thread 1"
-                                                    },
-                                                    "Message": {
-                                                        "S": "DynamoDB thread 1 message"
-                                                    },
-                                                    "LastPostedBy": {
-                                                        "S": "User A"
-                                                    },
-                                                    "LastPostedDateTime": {
-                                                        "S": "2015-09-22T19:58:22.514Z"
-                                                    },
-                                                    "Views": {
-                                                        "N": "0"
-                                                    },
-                                                    "Replies": {
-                                                        "N": "0"
-                                                    },
-                                                    "Answered": {
-                                                        "N": "0"
-                                                    },
-                                                    "Tags": {
-                                                        "L": [
-                                                            {
-                                                                "S": "index"
-                                                            },
-                                                            {
-                                                                "S": "primarykey"
-                                                            },
-                                                            {
-                                                                "S": "table"
-                                                            }
-                                                        ]
-                                                    }
-                                                }
-                                            }
-                                        },
-                                        {
-                                            "PutRequest": {
-                                                "Item": {
-                                                    "ForumName": {
-                                                        "S": "Amazon DynamoDB"
-                                                    },
-                                                    "Subject": {
-                                                        "S": "DynamoDB Thread 2"
-                                                    },
-                                                    "Message": {
-                                                        "S": "DynamoDB thread 2 message"
-                                                    },
-                                                    "LastPostedBy": {
-                                                        "S": "User A"
-                                                    },
-                                                    "LastPostedDateTime": {
-                                                        "S": "2015-09-15T19:58:22.514Z"
-                                                    },
-                                                    "Views": {
-                                                        "N": "0"
-                                                    },
-                                                    "Replies": {
-                                                        "N": "0"
-                                                    },
-                                                    "Answered": {
-                                                        "N": "0"
-                                                    },
-                                                    "Tags": {
-                                                        "L": [
-                                                            {
-                                                                "S": "items"
-                                                            },
-                                                            {
-                                                                "S": "attributes"
-                                                            },
-                                                            {
-                                                                "S": "throughput"
-                                                            }
-                                                        ]
-                                                    }
-                                                }
-                                            }
-                                        },
-                                        {
-                                            "PutRequest": {
-                                                "Item": {
-                                                    "ForumName": {
-                                                        "S": "Amazon S3"
-                                                    },
-                                                    "Subject": {
-                                                        "S": "S3 Thread 1"
-                                                    },
-                                                    "Message": {
-                                                        "S": "S3 thread 1 message"
-                                                    },
-                                                    "LastPostedBy": {
-                                                        "S": "User A"
-                                                    },
-                                                    "LastPostedDateTime": {
-                                                        "S": "2015-09-29T19:58:22.514Z"
-                                                    },
-                                                    "Views": {
-                                                        "N": "0"
-                                                    },
-                                                    "Replies": {
-                                                        "N": "0"
-                                                    },
-                                                    "Answered": {
-                                                        "N": "0"
-                                                    },
-                                                    "Tags": {
-                                                        "L": [
-                                                            {
-                                                                "S": "largeobjects"
-                                                            },
-                                                            {
-                                                                "S": "multipart upload"
-                                                            }
-                                                        ]
-                                                    }
-                                                }
-                                            }
-                                        }
-                                    ]
-                                })
-
-    # Add data to Reply DynamoDB Table
-    dynamodb_conn.batch_write_item(RequestItems={
-                                    "Reply": [
-                                        {
-                                            "PutRequest": {
-                                                "Item": {
-                                                    "Id": {
-                                                        "S": "Amazon DynamoDB#DynamoDB Thread 1"
-                                                    },
-                                                    "ReplyDateTime": {
-                                                        "S": "2015-09-15T19:58:22.947Z"
-                                                    },
-                                                    "Message": {
-                                                        "S": "DynamoDB Thread 1 Reply 1 text"
-                                                    },
-                                                    "PostedBy": {
-                                                        "S": "User A"
-                                                    }
-                                                }
-                                            }
-                                        },
-                                        {
-                                            "PutRequest": {
-                                                "Item": {
-                                                    "Id": {
-                                                        "S": "Amazon DynamoDB#DynamoDB Thread 1"
-                                                    },
-                                                    "ReplyDateTime": {
-                                                        "S": "2015-09-22T19:58:22.947Z"
-                                                    },
-                                                    "Message": {
-                                                        "S": "DynamoDB Thread 1 Reply 2 text"
-                                                    },
-                                                    "PostedBy": {
-                                                        "S": "User B"
-                                                    }
-                                                }
-                                            }
-                                        },
-                                        {
-                                            "PutRequest": {
-                                                "Item": {
-                                                    "Id": {
-                                                        "S": "Amazon DynamoDB#DynamoDB Thread 2"
-                                                    },
-                                                    "ReplyDateTime": {
-                                                        "S": "2015-09-29T19:58:22.947Z"
-                                                    },
-                                                    "Message": {
-                                                        "S": "DynamoDB Thread 2 Reply 1 text"
-                                                    },
-                                                    "PostedBy": {
-                                                        "S": "User A"
-                                                    }
-                                                }
-                                            }
-                                        },
-                                        {
-                                            "PutRequest": {
-                                                "Item": {
-                                                    "Id": {
-                                                        "S": "Amazon DynamoDB#DynamoDB Thread 2"
-                                                    },
-                                                    "ReplyDateTime": {
-                                                        "S": "2015-10-05T19:58:22.947Z"
-                                                    },
-                                                    "Message": {
-                                                        "S": "DynamoDB Thread 2 Reply 2 text"
-                                                    },
-                                                    "PostedBy": {
-                                                        "S": "User A"
-                                                    }
-                                                }
-                                            }
-                                        }
-                                    ]
-                                })
+def connect_to_dynamo(region, endpoint_url=None):
+    import client_factory
+    import instrumentation
+    return instrumentation.instrument(client_factory.get_client(region, endpoint_url))
+
+
+def create_dynamo_db_tables(region, wait_timeout=300, endpoint_url=None, on_demand=False):
+    from table_schema import TABLES, apply_schema
+    dynamodb_conn = connect_to_dynamo(region, endpoint_url)
+
+    # Create missing tables and update changed ones, all in parallel
+    for table_name, action in apply_schema(dynamodb_conn, TABLES, wait_timeout=wait_timeout, on_demand=on_demand):
+        print('%s: %s' % (table_name, action))
+
+
+def upload_data_to_dynamo_db_tables(region, threads=8, sources=None, write_utilization=1.0,
+                                    engine='sync', max_in_flight=128, workers=1, endpoint_url=None,
+                                    checkpoint_path=None, checkpoint_interval=10.0, resume=False,
+                                    bulk_mode='none', bulk_write_capacity=1000, wait_timeout=300,
+                                    write_mode='overwrite', version_attribute=None):
+    from client_factory import is_memory_endpoint
+    if workers > 1 and engine == 'async':
+        raise Exception('-workers cannot be combined with -engine async')
+    if resume and (workers > 1 or engine == 'async'):
+        raise Exception('-resume is only supported by the default single-process sync engine')
+    if is_memory_endpoint(endpoint_url) and (workers > 1 or engine == 'async'):
+        raise Exception('The memory:// stand-in lives in this process, use the default single-process sync engine')
+    if write_mode != 'overwrite' and (workers > 1 or engine == 'async' or resume):
+        raise Exception('-write-mode %s runs on the sync engine and is safe to rerun instead of resuming'
+                        % write_mode)
+    load_options = dict(threads=threads, sources=sources, write_utilization=write_utilization, engine=engine,
+                        max_in_flight=max_in_flight, workers=workers, endpoint_url=endpoint_url,
+                        checkpoint_path=checkpoint_path, checkpoint_interval=checkpoint_interval, resume=resume,
+                        write_mode=write_mode, version_attribute=version_attribute)
+    if bulk_mode == 'none':
+        load_sources(region, **load_options)
+        return
+
+    from capacity_profile import BulkLoadProfile
+    from seed_sources import resolve_sources
+
+    # The tables go back to their configured capacity even if the load fails
+    table_names = set(table_name for table_name, _ in resolve_sources(sources))
+    with BulkLoadProfile(connect_to_dynamo(region, endpoint_url), table_names, bulk_mode, bulk_write_capacity,
+                         wait_timeout):
+        load_sources(region, **load_options)
+
+
+def load_sources(region, threads, sources, write_utilization, engine, max_in_flight, workers, endpoint_url,
+                 checkpoint_path, checkpoint_interval, resume, write_mode, version_attribute):
+    if workers > 1:
+        import sharded_loader
+        print(sharded_loader.upload(region, sources, workers=workers, threads=threads,
+                                    write_utilization=write_utilization, endpoint_url=endpoint_url))
+        return
+
+    if engine == 'async':
+        import async_loader
+        stats = async_loader.upload(region, sources, max_in_flight=max_in_flight,
+                                    write_utilization=write_utilization, endpoint_url=endpoint_url)
+        print(stats.summary())
+        return
+
+    from key_skew import TableSkew, interleave_table, window_start
+    from rate_limiter import provisioned_write_limiters
+    from seed_sources import read_items, resolve_sources
+    from table_schema import TABLES_BY_NAME
+    dynamodb_conn = connect_to_dynamo(region, endpoint_url)
+
+    # Pace each table's writes to its provisioned write capacity
+    resolved_sources = resolve_sources(sources)
+    table_names = set(table_name for table_name, _ in resolved_sources)
+    rate_limiters = provisioned_write_limiters(dynamodb_conn, table_names, write_utilization)
+
+    if write_mode != 'overwrite':
+        import conditional_writer
+        writer = conditional_writer.upload(dynamodb_conn, sources, write_mode, threads, version_attribute,
+                                           rate_limiters)
+        print(writer.summary())
+        return
+
+    from bulk_loader import BulkLoader
+    from checkpoint import Checkpoint
+    checkpoint = None
+    if checkpoint_path:
+        if resume:
+            checkpoint = Checkpoint.load(checkpoint_path, checkpoint_interval)
+        else:
+            checkpoint = Checkpoint(checkpoint_path, checkpoint_interval)
+
+    # Stream items from the seed files into the loader, table by table,
+    # skipping what an earlier run already finished. Items are interleaved
+    # by hash key, so the checkpoint offset counts interleaved items and is
+    # only exact at window boundaries
+    skews = {}
+    with BulkLoader(dynamodb_conn, max_workers=threads, rate_limiters=rate_limiters,
+                    checkpoint=checkpoint) as loader:
+        for table_name, path in resolved_sources:
+            source = '%s=%s' % (table_name, path)
+            items = read_items(path)
+            if checkpoint and resume:
+                loader.submit(table_name, checkpoint.take_pending(source), source, replay=True)
+                start = checkpoint.rewind(source, window_start(checkpoint.offset(source)))
+                items = itertools.islice(items, start, None)
+            if table_name in TABLES_BY_NAME:
+                skew = skews.get(table_name) or skews.setdefault(table_name, TableSkew(table_name))
+                items = skew.observe(items)
+            loader.load(table_name, interleave_table(table_name, items), source)
+    print(loader.stats.summary())
+    for table_name in sorted(skews):
+        limiter = rate_limiters.get(table_name)
+        print(skews[table_name].summary(limiter.target_rate if limiter else None))
+
+
+def export_dynamo_db_tables(region, output_dir, table_names=None, segments=8, endpoint_url=None):
+    import time
+    from table_export import export_summary, export_tables
+    from table_schema import TABLES
+    dynamodb_conn = connect_to_dynamo(region, endpoint_url)
+
+    # Scan every table in parallel segments straight into compressed NDJSON
+    table_names = table_names or [spec.name for spec in TABLES]
+    started = time.time()
+    counts = export_tables(dynamodb_conn, table_names, output_dir, total_segments=segments)
+    print(export_summary(counts, time.time() - started))
+
+
+def verify_dynamo_db_tables(region, sources=None, table_names=None, segments=8, endpoint_url=None):
+    from table_verify import verify_tables
+    dynamodb_conn = connect_to_dynamo(region, endpoint_url)
+
+    # One parallel scan per table, compared against the sources by bucket
+    diffs = verify_tables(dynamodb_conn, sources, table_names, total_segments=segments)
+    for diff in diffs:
+        print(diff.summary())
+    different = [diff.table_name for diff in diffs if not diff.matches()]
+    if different:
+        raise Exception('Tables differ from the sources: %s' % ', '.join(different))
+
+
+def truncate_dynamo_db_tables(region, table_names=None, segments=8, threads=8, write_utilization=1.0,
+                              key_from=None, key_to=None, endpoint_url=None):
+    from rate_limiter import provisioned_write_limiters
+    from table_schema import TABLES
+    from table_truncate import truncate_tables
+    dynamodb_conn = connect_to_dynamo(region, endpoint_url)
+
+    # Deletes every item (in the key range) but keeps the tables and indexes
+    table_names = table_names or [spec.name for spec in TABLES]
+    rate_limiters = provisioned_write_limiters(dynamodb_conn, table_names, write_utilization)
+    print(truncate_tables(dynamodb_conn, table_names, total_segments=segments, threads=threads,
+                          rate_limiters=rate_limiters, key_from=key_from, key_to=key_to))
+
+
+def generate_seed_files(sources, output_dir):
+    # Writes each source (usually a synthetic dataset) to <Table>.ndjson.gz
+    from seed_sources import read_items, resolve_sources
+    from table_export import write_items
+    if not os.path.isdir(output_dir):
+        os.makedirs(output_dir)
+    for table_name, path in resolve_sources(sources):
+        count = write_items(os.path.join(output_dir, table_name + '.ndjson.gz'), read_items(path))
+        print('%s: %d items' % (table_name, count))
+
+
+def analyze_sources(sources, bulk_mode='none', bulk_write_capacity=1000, write_utilization=1.0):
+    # Hash key skew of the sources, without touching DynamoDB
+    from key_skew import analyze, write_rates
+    skews = analyze(sources)
+    rates = write_rates([skew.table_name for skew in skews], bulk_mode, bulk_write_capacity, write_utilization)
+    for skew in skews:
+        print(skew.summary(rates[skew.table_name]))
 
 
+def plan_upload(sources, write_utilization=1.0):
+    # Sizes the sources without touching DynamoDB; fails on oversized items
+    from load_plan import format_plan, plan_load
+    plans = plan_load(sources)
+    print(format_plan(plans, write_utilization))
+    oversized = sum(plan.oversized for plan in plans)
+    if oversized:
+        raise Exception('%d items are over the 400 KB item size limit' % oversized)
 
 
 def main(args):
+            import client_factory
+            import instrumentation
+            from region_resolver import resolve_region
             operation = args.operation
-            region = args.region
-            if not region:
-                # Default to the region the EC2 instance has been deployed
-                region = str(
-                json.loads(requests.get('http://169.254.169.254/latest/dynamic/instance-identity/document/').text).get(
-                    'region'))
-            if operation == 'create':
-                create_dynamo_db_tables(region)
-            elif operation == 'upload':
-                upload_data_to_dynamo_db_tables(region)
-            else:
-                raise Exception('Unknown operation.Please choose "create" and "upload"')
+            region = None
+            if operation in CLIENT_OPERATIONS:
+                client_factory.configure(
+                    max_pool_connections=args.max_pool_connections or max(10, args.threads, args.segments * 4),
+                    tcp_keepalive=args.tcp_keepalive,
+                    retry_mode=args.retry_mode,
+                    max_attempts=args.max_attempts)
+                if client_factory.is_memory_endpoint(args.endpoint_url):
+                    region = args.region or client_factory.MEMORY_REGION
+                else:
+                    # Default to the environment, the AWS profile or the region
+                    # the EC2 instance has been deployed in
+                    region = resolve_region(args.region)
+            upload_options = dict(threads=args.threads, sources=args.source,
+                                  write_utilization=args.write_utilization, engine=args.engine,
+                                  max_in_flight=args.max_in_flight, workers=args.workers,
+                                  endpoint_url=args.endpoint_url, checkpoint_path=args.checkpoint,
+                                  checkpoint_interval=args.checkpoint_interval, resume=args.resume,
+                                  bulk_mode=args.bulk_mode, bulk_write_capacity=args.bulk_write_capacity,
+                                  wait_timeout=args.wait_timeout, write_mode=args.write_mode,
+                                  version_attribute=args.version_attribute)
+            reporter = None
+            if args.progress_interval > 0:
+                reporter = instrumentation.ProgressReporter(instrumentation.metrics, args.progress_interval).start()
+            try:
+                if operation == 'create':
+                    create_dynamo_db_tables(region, wait_timeout=args.wait_timeout, endpoint_url=args.endpoint_url)
+                elif operation == 'upload':
+                    upload_data_to_dynamo_db_tables(region, **upload_options)
+                elif operation == 'create-and-upload':
+                    # New tables can start out on demand instead of being switched
+                    create_dynamo_db_tables(region, wait_timeout=args.wait_timeout, endpoint_url=args.endpoint_url,
+                                            on_demand=args.bulk_mode == 'on-demand')
+                    upload_data_to_dynamo_db_tables(region, **upload_options)
+                elif operation == 'plan':
+                    plan_upload(args.source, args.write_utilization)
+                elif operation == 'analyze':
+                    analyze_sources(args.source, args.bulk_mode, args.bulk_write_capacity, args.write_utilization)
+                elif operation == 'generate':
+                    generate_seed_files(args.source, args.output)
+                elif operation == 'verify':
+                    verify_dynamo_db_tables(region, args.source, table_names=args.table, segments=args.segments,
+                                            endpoint_url=args.endpoint_url)
+                elif operation == 'truncate':
+                    truncate_dynamo_db_tables(region, table_names=args.table, segments=args.segments,
+                                              threads=args.threads, write_utilization=args.write_utilization,
+                                              key_from=args.key_from, key_to=args.key_to,
+                                              endpoint_url=args.endpoint_url)
+                elif operation == 'export':
+                    export_dynamo_db_tables(region, args.output, table_names=args.table, segments=args.segments,
+                                            endpoint_url=args.endpoint_url)
+                else:
+                    raise Exception('Unknown operation.Please choose "create", "upload", "create-and-upload", '
+                                    '"plan", "analyze", "generate", "verify", "export" or "truncate"')
+            finally:
+                if reporter:
+                    reporter.stop()
+                if args.metrics_file:
+                    instrumentation.write_metrics(instrumentation.metrics, args.metrics_file)
 
 
 if __name__ == '__main__':
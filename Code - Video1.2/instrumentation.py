@@ -0,0 +1,288 @@
+import copy
+import json
+import sys
+import threading
+import time
+
+from bulk_loader import encode_binary, is_throttling_error
+
+# Per-operation metrics for every call made through connect_to_dynamo:
+# latency histograms, consumed capacity (ReturnConsumedCapacity=TOTAL is
+# added to every call that supports it), throttles, unprocessed items and
+# request payload sizes. They can be printed as a periodic progress line and
+# dumped as Prometheus text or JSON. Sharded workers keep their own Metrics
+# and send a snapshot back with their results, where it is merged in.
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONSUMED_CAPACITY_OPERATIONS = ('batch_get_item', 'batch_write_item', 'delete_item', 'get_item', 'put_item',
+                                'query', 'scan', 'transact_get_items', 'transact_write_items', 'update_item')
+
+# Client methods that are not DynamoDB calls
+UNINSTRUMENTED = ('get_waiter', 'get_paginator', 'can_paginate', 'close')
+
+
+class OperationMetrics(object):
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.throttles = 0
+        self.unprocessed = 0
+        self.request_bytes = 0
+        self.latency_sum = 0.0
+        self.latency_buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.capacity = {}
+
+    def observe(self, elapsed):
+        self.latency_sum += elapsed
+        for position, bound in enumerate(LATENCY_BUCKETS):
+            if elapsed <= bound:
+                self.latency_buckets[position] += 1
+                return
+        self.latency_buckets[-1] += 1
+
+    def merge(self, other):
+        self.calls += other.calls
+        self.errors += other.errors
+        self.throttles += other.throttles
+        self.unprocessed += other.unprocessed
+        self.request_bytes += other.request_bytes
+        self.latency_sum += other.latency_sum
+        self.latency_buckets = [count + other_count for count, other_count
+                                in zip(self.latency_buckets, other.latency_buckets)]
+        for table_name, units in other.capacity.items():
+            self.capacity[table_name] = self.capacity.get(table_name, 0.0) + units
+
+    def as_dict(self):
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'throttles': self.throttles,
+            'unprocessed': self.unprocessed,
+            'request_bytes': self.request_bytes,
+            'latency_seconds_sum': round(self.latency_sum, 6),
+            'latency_buckets': dict(zip([str(bound) for bound in LATENCY_BUCKETS] + ['+Inf'],
+                                        self.latency_buckets)),
+            'consumed_capacity': dict(self.capacity),
+        }
+
+
+class Metrics(object):
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.operations = {}
+
+    def record(self, operation, elapsed, request_bytes, response=None, error=None):
+        with self.lock:
+            metrics = self.operations.get(operation)
+            if metrics is None:
+                metrics = self.operations[operation] = OperationMetrics()
+            metrics.calls += 1
+            metrics.request_bytes += request_bytes
+            metrics.observe(elapsed)
+            if error is not None:
+                metrics.errors += 1
+                if is_throttling_error(error):
+                    metrics.throttles += 1
+                return
+            consumed = response.get('ConsumedCapacity') or []
+            for entry in consumed if isinstance(consumed, list) else [consumed]:
+                table_name = entry.get('TableName', '')
+                units = entry.get('CapacityUnits', 0.0)
+                metrics.capacity[table_name] = metrics.capacity.get(table_name, 0.0) + units
+            for unprocessed in (response.get('UnprocessedItems'), response.get('UnprocessedKeys')):
+                for requests in (unprocessed or {}).values():
+                    # UnprocessedKeys holds {'Keys': [...]} per table
+                    if isinstance(requests, dict):
+                        requests = requests.get('Keys', [])
+                    metrics.unprocessed += len(requests)
+
+    def snapshot(self):
+        # {operation: OperationMetrics} copies, picklable for a result queue
+        with self.lock:
+            return copy.deepcopy(self.operations)
+
+    def merge(self, operations):
+        with self.lock:
+            for operation, other in operations.items():
+                metrics = self.operations.get(operation)
+                if metrics is None:
+                    metrics = self.operations[operation] = OperationMetrics()
+                metrics.merge(other)
+
+    def totals(self):
+        with self.lock:
+            operations = list(self.operations.values())
+        return {
+            'calls': sum(metrics.calls for metrics in operations),
+            'errors': sum(metrics.errors for metrics in operations),
+            'throttles': sum(metrics.throttles for metrics in operations),
+            'unprocessed': sum(metrics.unprocessed for metrics in operations),
+            'capacity': sum(sum(metrics.capacity.values()) for metrics in operations),
+            'request_bytes': sum(metrics.request_bytes for metrics in operations),
+        }
+
+    def progress_line(self):
+        totals = self.totals()
+        elapsed = max(time.time() - self.started, 1e-9)
+        return ('[%7.1fs] %d calls (%.1f/s), %.1f capacity units (%.1f/s), %d throttles, '
+                '%d unprocessed, %d errors, %.1f MB sent'
+                % (elapsed, totals['calls'], totals['calls'] / elapsed, totals['capacity'],
+                   totals['capacity'] / elapsed, totals['throttles'], totals['unprocessed'],
+                   totals['errors'], totals['request_bytes'] / 1048576.0))
+
+    def as_dict(self):
+        with self.lock:
+            return {
+                'elapsed_seconds': round(time.time() - self.started, 3),
+                'operations': dict((operation, metrics.as_dict())
+                                   for operation, metrics in sorted(self.operations.items())),
+            }
+
+    def prometheus(self):
+        with self.lock:
+            operations = sorted(self.operations.items())
+            lines = ['# TYPE dynamodb_call_duration_seconds histogram']
+            for operation, metrics in operations:
+                cumulative = 0
+                for bound, count in zip([str(bound) for bound in LATENCY_BUCKETS] + ['+Inf'],
+                                        metrics.latency_buckets):
+                    cumulative += count
+                    lines.append('dynamodb_call_duration_seconds_bucket{operation="%s",le="%s"} %d'
+                                 % (operation, bound, cumulative))
+                lines.append('dynamodb_call_duration_seconds_sum{operation="%s"} %.6f'
+                             % (operation, metrics.latency_sum))
+                lines.append('dynamodb_call_duration_seconds_count{operation="%s"} %d'
+                             % (operation, metrics.calls))
+            for name, attribute in (('calls', 'calls'), ('errors', 'errors'), ('throttles', 'throttles'),
+                                    ('unprocessed_items', 'unprocessed'), ('request_bytes', 'request_bytes')):
+                lines.append('# TYPE dynamodb_%s_total counter' % name)
+                for operation, metrics in operations:
+                    lines.append('dynamodb_%s_total{operation="%s"} %d'
+                                 % (name, operation, getattr(metrics, attribute)))
+            lines.append('# TYPE dynamodb_consumed_capacity_units_total counter')
+            for operation, metrics in operations:
+                for table_name, units in sorted(metrics.capacity.items()):
+                    lines.append('dynamodb_consumed_capacity_units_total{operation="%s",table="%s"} %s'
+                                 % (operation, table_name, units))
+        return '\n'.join(lines) + '\n'
+
+
+def is_instrumented(name, method):
+    return name not in UNINSTRUMENTED and not name.startswith('_') and callable(method)
+
+
+def prepare_request(name, kwargs):
+    # Asks for consumed capacity and returns the request payload size
+    if name in CONSUMED_CAPACITY_OPERATIONS:
+        kwargs.setdefault('ReturnConsumedCapacity', 'TOTAL')
+    return len(json.dumps(kwargs, separators=(',', ':'), default=encode_binary))
+
+
+class InstrumentedClient(object):
+    # Wraps a DynamoDB client; every call is timed and recorded in `metrics`
+
+    def __init__(self, dynamodb_conn, metrics):
+        self.dynamodb_conn = dynamodb_conn
+        self.metrics = metrics
+
+    def __getattr__(self, name):
+        method = getattr(self.dynamodb_conn, name)
+        if not is_instrumented(name, method):
+            return method
+        metrics = self.metrics
+
+        def instrumented(**kwargs):
+            request_bytes = prepare_request(name, kwargs)
+            started = time.perf_counter()
+            try:
+                response = method(**kwargs)
+            except Exception as e:
+                metrics.record(name, time.perf_counter() - started, request_bytes, error=e)
+                raise
+            metrics.record(name, time.perf_counter() - started, request_bytes, response)
+            return response
+        return instrumented
+
+
+class AsyncInstrumentedClient(InstrumentedClient):
+    # The same for an aiobotocore client, whose calls are coroutines
+
+    def __getattr__(self, name):
+        method = getattr(self.dynamodb_conn, name)
+        if not is_instrumented(name, method):
+            return method
+        metrics = self.metrics
+
+        async def instrumented(**kwargs):
+            request_bytes = prepare_request(name, kwargs)
+            started = time.perf_counter()
+            try:
+                response = await method(**kwargs)
+            except Exception as e:
+                metrics.record(name, time.perf_counter() - started, request_bytes, error=e)
+                raise
+            metrics.record(name, time.perf_counter() - started, request_bytes, response)
+            return response
+        return instrumented
+
+
+class ProgressReporter(object):
+    # Prints metrics.progress_line() every `interval` seconds until stopped
+
+    def __init__(self, metrics, interval=10.0, stream=None):
+        self.metrics = metrics
+        self.interval = interval
+        self.stream = stream or sys.stderr
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.report()
+
+    def report(self):
+        self.stream.write(self.metrics.progress_line() + '\n')
+        self.stream.flush()
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+        self.report()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+        return False
+
+
+def write_metrics(metrics, path):
+    # Prometheus text format for *.prom files, JSON otherwise
+    with open(path, 'w') as f:
+        if path.endswith('.prom'):
+            f.write(metrics.prometheus())
+        else:
+            json.dump(metrics.as_dict(), f, indent=2)
+
+
+# Shared by every client connect_to_dynamo hands out
+metrics = Metrics()
+
+
+def instrument(dynamodb_conn):
+    return InstrumentedClient(dynamodb_conn, metrics)
+
+
+def instrument_async(dynamodb_conn):
+    return AsyncInstrumentedClient(dynamodb_conn, metrics)
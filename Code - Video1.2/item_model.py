@@ -0,0 +1,126 @@
+# Compact records for the four tables. Each record type gets a serializer
+# generated once from its field list, so turning a record into a
+# DynamoDB-JSON item is straight-line code with no type checks per value.
+
+WIRE_FORMATS = {
+    'S': "{'S': %s}",
+    'N': "{'N': str(%s)}",
+    'BOOL': "{'BOOL': bool(%s)}",
+    'L:S': "{'L': [{'S': element} for element in %s]}",
+    'L:N': "{'L': [{'N': str(element)} for element in %s]}",
+    'SS': "{'SS': list(%s)}",
+    'NS': "{'NS': [str(element) for element in %s]}",
+}
+
+PYTHON_FORMATS = {
+    'S': "%s['S']",
+    'N': "number(%s['N'])",
+    'BOOL': "%s['BOOL']",
+    'L:S': "[element['S'] for element in %s['L']]",
+    'L:N': "[number(element['N']) for element in %s['L']]",
+    'SS': "list(%s['SS'])",
+    'NS': "[number(element) for element in %s['NS']]",
+}
+
+
+def number(text):
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+def compile_function(name, lines):
+    namespace = {'number': number}
+    exec('\n'.join(lines), namespace)
+    return namespace[name]
+
+
+def compile_serializer(fields):
+    lines = ['def to_item(record):', '    item = {}']
+    for field_name, field_type in fields:
+        lines += ['    value = record.%s' % field_name,
+                  '    if value is not None:',
+                  '        item[%r] = %s' % (field_name, WIRE_FORMATS[field_type] % 'value')]
+    lines.append('    return item')
+    return compile_function('to_item', lines)
+
+
+def compile_deserializer(class_name, fields):
+    lines = ['def from_item(cls, item):', '    record = cls.__new__(cls)', '    get = item.get']
+    for field_name, field_type in fields:
+        lines += ['    value = get(%r)' % field_name,
+                  '    record.%s = None if value is None else %s'
+                  % (field_name, PYTHON_FORMATS[field_type] % 'value')]
+    lines.append('    return record')
+    return classmethod(compile_function('from_item', lines))
+
+
+def compile_initializer(names):
+    # Plain assignments; Python itself rejects unknown or surplus arguments
+    lines = ['def __init__(self, %s):' % ', '.join('%s=None' % field_name for field_name in names)]
+    lines += ['    self.%s = %s' % (field_name, field_name) for field_name in names]
+    return compile_function('__init__', lines)
+
+
+def record_type(class_name, table_name, fields):
+    names = tuple(field_name for field_name, _ in fields)
+
+    def __repr__(self):
+        return '%s(%s)' % (class_name, ', '.join('%s=%r' % (field_name, getattr(self, field_name))
+                                                 for field_name in names
+                                                 if getattr(self, field_name) is not None))
+
+    def __eq__(self, other):
+        return type(self) is type(other) and all(getattr(self, field_name) == getattr(other, field_name)
+                                                 for field_name in names)
+
+    return type(class_name, (object,), {
+        '__slots__': names,
+        '__init__': compile_initializer(names),
+        '__repr__': __repr__,
+        '__eq__': __eq__,
+        '__hash__': None,
+        'table_name': table_name,
+        'fields': tuple(fields),
+        'to_item': compile_serializer(fields),
+        'from_item': compile_deserializer(class_name, fields),
+    })
+
+
+Product = record_type('Product', 'ProductCatalog', [
+    ('Id', 'N'), ('Title', 'S'), ('ISBN', 'S'), ('Authors', 'L:S'), ('Price', 'N'),
+    ('Dimensions', 'S'), ('PageCount', 'N'), ('InPublication', 'BOOL'), ('ProductCategory', 'S'),
+    ('Description', 'S'), ('BicycleType', 'S'), ('Brand', 'S'), ('Color', 'L:S'),
+])
+
+Forum = record_type('Forum', 'Forum', [
+    ('Name', 'S'), ('Category', 'S'), ('Threads', 'N'), ('Messages', 'N'), ('Views', 'N'),
+])
+
+Thread = record_type('Thread', 'Thread', [
+    ('ForumName', 'S'), ('Subject', 'S'), ('Message', 'S'), ('LastPostedBy', 'S'),
+    ('LastPostedDateTime', 'S'), ('Views', 'N'), ('Replies', 'N'), ('Answered', 'N'), ('Tags', 'L:S'),
+])
+
+Reply = record_type('Reply', 'Reply', [
+    ('Id', 'S'), ('ReplyDateTime', 'S'), ('Message', 'S'), ('PostedBy', 'S'),
+])
+
+RECORD_TYPES = dict((record_class.table_name, record_class) for record_class in (Product, Forum, Thread, Reply))
+
+
+def load_records(loader, records):
+    # Feeds records of one type into a BulkLoader, serializing lazily
+    records = iter(records)
+    first = next(records, None)
+    if first is None:
+        return
+    to_item = type(first).to_item
+
+    def items():
+        yield to_item(first)
+        for record in records:
+            yield to_item(record)
+
+    loader.load(type(first).table_name, items())
@@ -0,0 +1,75 @@
+import math
+
+# Sizes follow the DynamoDB item size rules: attribute names count as
+# UTF-8 bytes, numbers roughly one byte per two significant digits plus
+# one, and every list or map adds three bytes plus one per element.
+
+
+def number_size(number):
+    # NDJSON exports sometimes carry numbers as JSON numbers, not strings
+    digits = str(number).lstrip('-').replace('.', '').lstrip('0')
+    if 'e' in digits.lower():
+        digits = digits.lower().split('e')[0]
+    return int(math.ceil(len(digits.rstrip('0') or '0') / 2.0)) + 1
+
+
+def attribute_value_size(value):
+    (attribute_type, data), = value.items()
+    if attribute_type == 'S':
+        return len(data.encode('utf-8'))
+    if attribute_type == 'N':
+        return number_size(data)
+    if attribute_type == 'B':
+        return len(data)
+    if attribute_type in ('BOOL', 'NULL'):
+        return 1
+    if attribute_type == 'SS':
+        return sum(len(element.encode('utf-8')) for element in data)
+    if attribute_type == 'NS':
+        return sum(number_size(element) for element in data)
+    if attribute_type == 'BS':
+        return sum(len(element) for element in data)
+    if attribute_type == 'L':
+        return 3 + sum(1 + attribute_value_size(element) for element in data)
+    if attribute_type == 'M':
+        return 3 + sum(1 + len(name.encode('utf-8')) + attribute_value_size(element)
+                       for name, element in data.items())
+    raise Exception('Unknown attribute type "%s"' % attribute_type)
+
+
+def item_size(item):
+    return sum(len(name.encode('utf-8')) + attribute_value_size(value) for name, value in item.items())
+
+
+def capacity_units(size):
+    # One WCU per started KB
+    return max(1, int(math.ceil(size / 1024.0)))
+
+
+def index_entry_size(item, key_names, index):
+    projection = index.get('Projection', {})
+    projection_type = projection.get('ProjectionType', 'KEYS_ONLY')
+    if projection_type == 'ALL':
+        return item_size(item)
+    names = set(key_names) | set(key['AttributeName'] for key in index['KeySchema'])
+    if projection_type == 'INCLUDE':
+        names |= set(projection.get('NonKeyAttributes', []))
+    return sum(len(name.encode('utf-8')) + attribute_value_size(item[name]) for name in names if name in item)
+
+
+def write_capacity_units(item, key_names=(), local_indexes=()):
+    # Local index entries are written with the item and are paid for out
+    # of the table's own write capacity; items without the index key
+    # attribute are not indexed
+    units = capacity_units(item_size(item))
+    for index in local_indexes:
+        if all(key['AttributeName'] in item for key in index['KeySchema']):
+            units += capacity_units(index_entry_size(item, key_names, index))
+    return units
+
+
+def write_request_capacity_units(write_request, key_names=(), local_indexes=()):
+    if 'PutRequest' in write_request:
+        return write_capacity_units(write_request['PutRequest']['Item'], key_names, local_indexes)
+    # Deleting an item also deletes its local index entries
+    return 1 + len(local_indexes)
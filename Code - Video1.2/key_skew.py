@@ -0,0 +1,207 @@
+import heapq
+from collections import OrderedDict, deque
+
+from item_size import item_size, write_capacity_units
+from seed_sources import read_items, resolve_sources
+from table_schema import TABLES_BY_NAME, index_request, key_attributes
+
+# Hash key skew of the loader input. Every table's items are counted per
+# hash key with a weighted Space-Saving sketch (bounded memory, totals off
+# by at most 1/capacity of the table's write units), which shows the keys a
+# load would push into one partition faster than it accepts writes.
+#
+# The loaders also interleave their input by hash key: within a window of
+# items the keys take turns, so consecutive batches spread over partitions
+# instead of draining one forum's threads at a time.
+
+# Write units per second a single partition accepts
+PARTITION_WRITE_UNITS = 1000
+# Largest item collection (items sharing a hash key) of a table with local indexes
+ITEM_COLLECTION_BYTES = 10 * 1024 ** 3
+# Default write throughput limit of an on-demand table
+ON_DEMAND_WRITE_UNITS = 40000
+
+DEFAULT_CAPACITY = 1000
+
+# Items reordered at a time; resumed loads restart at a window boundary
+INTERLEAVE_WINDOW = 5000
+
+# Heavy hitters listed per table
+MAX_REPORTED = 5
+
+
+def hash_key_value(item, key_name):
+    (_, value), = item[key_name].items()
+    return value if isinstance(value, (bytes, bytearray)) else str(value)
+
+
+class SpaceSaving(object):
+    # Weighted Space-Saving: at most `capacity` keys are tracked. A new key
+    # replaces the lightest one and inherits its totals as its error, so
+    # every tracked total is an upper bound on the key's real one.
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        # key -> [weight, items, bytes, error]
+        self.counters = {}
+        # (weight, key) entries, stale ones are skipped when popped
+        self.heap = []
+        self.evictions = 0
+
+    def add(self, key, weight, size):
+        counter = self.counters.get(key)
+        if counter is None:
+            if len(self.counters) < self.capacity:
+                counter = self.counters[key] = [0, 0, 0, 0]
+            else:
+                evicted = self.pop_lightest()
+                self.evictions += 1
+                counter = self.counters[key] = [evicted[0], evicted[1], evicted[2], evicted[0]]
+        counter[0] += weight
+        counter[1] += 1
+        counter[2] += size
+        heapq.heappush(self.heap, (counter[0], key))
+        if len(self.heap) > 4 * self.capacity:
+            self.heap = [(counter[0], key) for key, counter in self.counters.items()]
+            heapq.heapify(self.heap)
+
+    def pop_lightest(self):
+        while True:
+            weight, key = heapq.heappop(self.heap)
+            counter = self.counters.get(key)
+            if counter is not None and counter[0] == weight:
+                del self.counters[key]
+                return counter
+
+    def top(self, count):
+        # [(key, weight, items, bytes, error)], heaviest first
+        ranked = sorted(self.counters.items(), key=lambda entry: -entry[1][0])[:count]
+        return [(key,) + tuple(counter) for key, counter in ranked]
+
+
+class TableSkew(object):
+
+    def __init__(self, table_name, capacity=DEFAULT_CAPACITY):
+        spec = TABLES_BY_NAME[table_name]
+        self.table_name = table_name
+        self.hash_name = spec.hash_key.name
+        self.key_names = key_attributes(spec)
+        self.local_indexes = [index_request(index, False) for index in spec.local_indexes]
+        self.items = 0
+        self.bytes = 0
+        self.units = 0
+        self.sketch = SpaceSaving(capacity)
+
+    def add(self, item):
+        size = item_size(item)
+        units = write_capacity_units(item, self.key_names, self.local_indexes)
+        self.items += 1
+        self.bytes += size
+        self.units += units
+        self.sketch.add(hash_key_value(item, self.hash_name), units, size)
+
+    def observe(self, items):
+        # Counts items on their way to the loader
+        for item in items:
+            self.add(item)
+            yield item
+
+    def hot_keys(self, write_rate):
+        # Keys that would get more than a partition's write units per second
+        # when the table is written at `write_rate` in an even mix, for longer
+        # than a second (shorter bursts are lost in request latency)
+        if not self.units:
+            return []
+        return [entry for entry in self.sketch.top(len(self.sketch.counters))
+                if entry[1] * write_rate / float(self.units) > PARTITION_WRITE_UNITS
+                and entry[1] > PARTITION_WRITE_UNITS]
+
+    def oversized_collections(self):
+        if not self.local_indexes:
+            return []
+        return [entry for entry in self.sketch.top(len(self.sketch.counters)) if entry[3] > ITEM_COLLECTION_BYTES]
+
+    def summary(self, write_rate=None):
+        lines = ['%s: %d items, %.1f MB, %d WCU over %s%d hash keys'
+                 % (self.table_name, self.items, self.bytes / 1048576.0, self.units,
+                    'more than ' if self.sketch.evictions else '', len(self.sketch.counters))]
+        top = self.sketch.top(MAX_REPORTED)
+        if top:
+            # However the load is paced, the hottest key's partition sets a floor
+            lines.append('  hottest key needs at least %.1f s at %d WCU/s per partition'
+                         % (top[0][1] / float(PARTITION_WRITE_UNITS), PARTITION_WRITE_UNITS))
+        for key, units, items, size, error in top:
+            lines.append('  %r: %d items, %.1f MB, %d WCU (%.1f%%)%s'
+                         % (key, items, size / 1048576.0, units, 100.0 * units / self.units,
+                            ' (at most %d WCU overcounted)' % error if error else ''))
+        hot_keys = self.hot_keys(write_rate) if write_rate else []
+        for key, units, _, _, _ in hot_keys[:MAX_REPORTED]:
+            lines.append('  HOT %r: %.0f WCU/s of %.0f WCU/s, over the %d WCU/s partition limit'
+                         % (key, units * write_rate / float(self.units), write_rate, PARTITION_WRITE_UNITS))
+        if len(hot_keys) > MAX_REPORTED:
+            lines.append('  ... and %d more hot keys' % (len(hot_keys) - MAX_REPORTED))
+        for key, _, _, size, _ in self.oversized_collections():
+            lines.append('  HOT %r: item collection of %.1f GB, over the 10 GB limit of tables with local indexes'
+                         % (key, size / 1024.0 ** 3))
+        return '\n'.join(lines)
+
+
+def interleave(items, key_name, window=None):
+    # Reorders each window of items so hash keys take turns; a window's
+    # output is a permutation of its input, so resuming at a window boundary
+    # resumes at the same input item
+    window = window or INTERLEAVE_WINDOW
+    items = iter(items)
+    while True:
+        queues = OrderedDict()
+        taken = 0
+        for item in items:
+            queues.setdefault(hash_key_value(item, key_name), deque()).append(item)
+            taken += 1
+            if taken == window:
+                break
+        if not taken:
+            return
+        while queues:
+            for key in list(queues):
+                queue = queues[key]
+                yield queue.popleft()
+                if not queue:
+                    del queues[key]
+
+
+def interleave_table(table_name, items, window=None):
+    spec = TABLES_BY_NAME.get(table_name)
+    return interleave(items, spec.hash_key.name, window) if spec else items
+
+
+def window_start(offset, window=None):
+    window = window or INTERLEAVE_WINDOW
+    return offset - offset % window
+
+
+def analyze(sources=None, capacity=DEFAULT_CAPACITY):
+    skews = {}
+    for table_name, path in resolve_sources(sources):
+        if table_name not in TABLES_BY_NAME:
+            continue
+        skew = skews.get(table_name)
+        if skew is None:
+            skew = skews[table_name] = TableSkew(table_name, capacity)
+        for item in read_items(path):
+            skew.add(item)
+    return [skews[table_name] for table_name in sorted(skews)]
+
+
+def write_rates(table_names, bulk_mode='none', bulk_write_capacity=1000, write_utilization=1.0):
+    # Write units per second each table would be loaded at; on-demand
+    # tables are not paced
+    rates = {}
+    for table_name in table_names:
+        if bulk_mode == 'on-demand':
+            rates[table_name] = ON_DEMAND_WRITE_UNITS
+        elif bulk_mode == 'provisioned':
+            rates[table_name] = bulk_write_capacity * write_utilization
+        else:
+            rates[table_name] = TABLES_BY_NAME[table_name].write_capacity * write_utilization
+    return rates
@@ -0,0 +1,82 @@
+import json
+
+from bulk_loader import MAX_ITEM_BYTES, chunk_write_requests, encode_binary
+from item_size import item_size, write_capacity_units
+from seed_sources import read_items, resolve_sources
+from table_schema import TABLES_BY_NAME, index_request, key_attributes
+
+# Sizes a load before it starts: items, DynamoDB bytes, the write capacity
+# units it will consume (local index entries included), the BatchWriteItem
+# requests it will take and every item over the 400 KB limit.
+
+# Oversized items listed per table
+MAX_REPORTED = 10
+
+
+class TablePlan(object):
+
+    def __init__(self, table_name):
+        self.table_name = table_name
+        spec = TABLES_BY_NAME.get(table_name)
+        self.key_names = key_attributes(spec) if spec else []
+        self.local_indexes = [index_request(index, False) for index in spec.local_indexes] if spec else []
+        self.write_capacity = spec.write_capacity if spec else 0
+        self.items = 0
+        self.bytes = 0
+        self.capacity_units = 0
+        self.requests = 0
+        self.largest = 0
+        self.oversized = 0
+        self.oversized_keys = []
+
+    def write_requests(self, items):
+        # Sizes every item on its way to the batch packer
+        for item in items:
+            size = item_size(item)
+            self.items += 1
+            self.bytes += size
+            self.largest = max(self.largest, size)
+            if size > MAX_ITEM_BYTES:
+                self.oversized += 1
+                if len(self.oversized_keys) < MAX_REPORTED:
+                    key = dict((name, item[name]) for name in self.key_names if name in item)
+                    self.oversized_keys.append((json.dumps(key, default=encode_binary), size))
+                continue
+            self.capacity_units += write_capacity_units(item, self.key_names, self.local_indexes)
+            yield {'PutRequest': {'Item': item}}
+
+    def add(self, items):
+        for _ in chunk_write_requests(self.write_requests(items)):
+            self.requests += 1
+
+    def minutes_at(self, write_utilization=1.0):
+        rate = self.write_capacity * write_utilization
+        return self.capacity_units / rate / 60.0 if rate > 0 else None
+
+
+def plan_load(sources=None):
+    plans = {}
+    for table_name, path in resolve_sources(sources):
+        plan = plans.get(table_name)
+        if plan is None:
+            plan = plans[table_name] = TablePlan(table_name)
+        plan.add(read_items(path))
+    return [plans[table_name] for table_name in sorted(plans)]
+
+
+def format_plan(plans, write_utilization=1.0):
+    lines = ['Projected load: %d items, %.1f MB, %d WCU (write request units on demand) in %d BatchWriteItem calls'
+             % (sum(plan.items for plan in plans), sum(plan.bytes for plan in plans) / 1048576.0,
+                sum(plan.capacity_units for plan in plans), sum(plan.requests for plan in plans))]
+    for plan in plans:
+        minutes = plan.minutes_at(write_utilization)
+        pace = ('%.1f min at %.1f WCU' % (minutes, plan.write_capacity * write_utilization)
+                if minutes is not None else 'unpaced')
+        lines.append('  %s: %d items, %.1f MB, %d WCU, %d requests, largest item %d bytes, %s'
+                     % (plan.table_name, plan.items, plan.bytes / 1048576.0, plan.capacity_units,
+                        plan.requests, plan.largest, pace))
+        for key, size in plan.oversized_keys:
+            lines.append('    item %s is %d bytes, over the 400 KB item size limit' % (key, size))
+        if plan.oversized > len(plan.oversized_keys):
+            lines.append('    ... and %d more oversized items' % (plan.oversized - len(plan.oversized_keys)))
+    return '\n'.join(lines)
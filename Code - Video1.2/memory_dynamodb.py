@@ -0,0 +1,779 @@
+import bisect
+import datetime
+import decimal
+import math
+import random
+import re
+import threading
+import time
+import zlib
+
+from client_factory import MEMORY_SCHEME
+from item_size import item_size, write_capacity_units, write_request_capacity_units
+
+# In-process DynamoDB stand-in for fast local runs and tests, selected with
+# an endpoint URL of the form memory://[name][?option=value&...]. It keeps
+# every table in memory with a sorted index per hash key (and per local
+# index), so key-range queries are logarithmic, and implements the calls
+# this project makes: CreateTable, DescribeTable, UpdateTable, DeleteTable,
+# ListTables, BatchWriteItem, BatchGetItem, PutItem, GetItem, DeleteItem,
+# TransactWriteItems, Query and Scan (with segments).
+#
+# Throttling can be injected for tests:
+#   unprocessed_rate   fraction of batch requests returned unprocessed
+#   throttle_calls     number of upcoming item calls that fail with
+#                      ProvisionedThroughputExceededException
+#   enforce_capacity   throttle writes beyond the provisioned WCU per second
+#   seed               seed of the unprocessed_rate random stream
+#
+# Databases live as long as the process; every client for the same
+# endpoint URL shares one.
+
+MAX_BATCH_WRITE_ITEMS = 25
+MAX_BATCH_GET_KEYS = 100
+MAX_TRANSACTION_ITEMS = 100
+MAX_ITEM_BYTES = 400 * 1024
+MAX_PAGE_BYTES = 1024 * 1024
+
+# Calls that throttle_calls leaves alone
+TABLE_OPERATIONS = ('create_table', 'describe_table', 'update_table', 'delete_table', 'list_tables')
+
+OPTION_TYPES = {'unprocessed_rate': float, 'throttle_calls': int, 'enforce_capacity': int, 'seed': int}
+
+NAME = r'#?[A-Za-z_][\w.-]*'
+VALUE = r':\w+'
+COMPARISON = re.compile(r'\s*(%s)\s*(=|<>|<=|<|>=|>)\s*(%s)\s*' % (NAME, VALUE))
+BETWEEN = re.compile(r'\s*(%s)\s+BETWEEN\s+(%s)\s+AND\s+(%s)\s*' % (NAME, VALUE, VALUE), re.I)
+FUNCTION = re.compile(r'\s*(begins_with|attribute_exists|attribute_not_exists)\s*\(\s*(%s)\s*(?:,\s*(%s)\s*)?\)\s*'
+                      % (NAME, VALUE), re.I)
+AND = re.compile(r'\s+AND\s+', re.I)
+OR = re.compile(r'\s+OR\s+', re.I)
+
+
+class StandInError(Exception):
+    # Looks like a botocore ClientError to error_code() and friends
+
+    def __init__(self, code, message, **response):
+        Exception.__init__(self, '%s: %s' % (code, message))
+        self.response = dict(response, Error={'Code': code, 'Message': message})
+
+
+def validation_error(message):
+    return StandInError('ValidationException', message)
+
+
+def sort_value(value):
+    (attribute_type, data), = value.items()
+    if attribute_type == 'N':
+        return decimal.Decimal(str(data))
+    return data
+
+
+def substitute(token, names):
+    if token.startswith('#'):
+        if token not in (names or {}):
+            raise validation_error('Expression attribute name %s is not defined' % token)
+        return names[token]
+    return token
+
+
+def attribute_value(token, values):
+    if token not in (values or {}):
+        raise validation_error('Expression attribute value %s is not defined' % token)
+    return values[token]
+
+
+def compare(operator, left, right):
+    if left is None:
+        return False
+    if operator in ('=', '<>'):
+        equal = (sort_value(left) == sort_value(right) if len(left) == 1 and list(left)[0] in ('S', 'N', 'B')
+                 else left == right)
+        return equal if operator == '=' else not equal
+    if list(left) != list(right):
+        return False
+    left, right = sort_value(left), sort_value(right)
+    return {'<': left < right, '<=': left <= right, '>': left > right, '>=': left >= right}[operator]
+
+
+def parse_term(text, names, values):
+    # One comparison, BETWEEN or function call; returns a predicate on an item
+    match = FUNCTION.fullmatch(text)
+    if match:
+        function, name, value = match.group(1).lower(), substitute(match.group(2), names), match.group(3)
+        if function == 'attribute_exists':
+            return lambda item: name in item
+        if function == 'attribute_not_exists':
+            return lambda item: name not in item
+        prefix = sort_value(attribute_value(value, values))
+        return lambda item: name in item and str(sort_value(item[name])).startswith(prefix) \
+            if isinstance(prefix, str) else name in item and sort_value(item[name]).startswith(prefix)
+    match = BETWEEN.fullmatch(text)
+    if match:
+        name = substitute(match.group(1), names)
+        low, high = attribute_value(match.group(2), values), attribute_value(match.group(3), values)
+        return lambda item: compare('>=', item.get(name), low) and compare('<=', item.get(name), high)
+    match = COMPARISON.fullmatch(text)
+    if match:
+        name, operator = substitute(match.group(1), names), match.group(2)
+        value = attribute_value(match.group(3), values)
+        return lambda item: compare(operator, item.get(name), value)
+    raise validation_error('Expression "%s" is not supported by the in-memory stand-in' % text.strip())
+
+
+def split_terms(text):
+    # Splits on AND, keeping BETWEEN ... AND ... together
+    parts = AND.split(text)
+    terms = []
+    for part in parts:
+        if terms and BETWEEN.fullmatch(terms[-1] + ' AND ' + part) and not BETWEEN.fullmatch(terms[-1]):
+            terms[-1] = terms[-1] + ' AND ' + part
+        else:
+            terms.append(part)
+    return terms
+
+
+def parse_condition(text, names, values):
+    # OR of ANDs of terms, no parentheses or NOT
+    alternatives = [[parse_term(term, names, values) for term in split_terms(alternative)]
+                    for alternative in OR.split(text.strip())]
+    return lambda item: any(all(term(item) for term in terms) for terms in alternatives)
+
+
+def parse_key_condition(text, names, values, hash_name, range_name):
+    # Returns the hash value and (operator, operands) for the range key
+    hash_value = None
+    range_condition = None
+    for term in split_terms(text.strip()):
+        match = COMPARISON.fullmatch(term)
+        if match and match.group(2) == '=' and substitute(match.group(1), names) == hash_name:
+            hash_value = attribute_value(match.group(3), values)
+            continue
+        if range_name is None:
+            raise validation_error('Query key condition not supported: %s' % term)
+        match = FUNCTION.fullmatch(term)
+        if match and match.group(1).lower() == 'begins_with' and substitute(match.group(2), names) == range_name:
+            range_condition = ('begins_with', sort_value(attribute_value(match.group(3), values)))
+            continue
+        match = BETWEEN.fullmatch(term)
+        if match and substitute(match.group(1), names) == range_name:
+            range_condition = ('between', sort_value(attribute_value(match.group(2), values)),
+                               sort_value(attribute_value(match.group(3), values)))
+            continue
+        match = COMPARISON.fullmatch(term)
+        if match and substitute(match.group(1), names) == range_name and match.group(2) != '<>':
+            range_condition = (match.group(2), sort_value(attribute_value(match.group(3), values)))
+            continue
+        raise validation_error('Query key condition not supported: %s' % term)
+    if hash_value is None:
+        raise validation_error('Query condition missed key schema element: %s' % hash_name)
+    return hash_value, range_condition
+
+
+def range_bounds(sorted_values, condition):
+    # Slice of `sorted_values` matching a range key condition
+    if condition is None:
+        return 0, len(sorted_values)
+    operator = condition[0]
+    if operator == '=':
+        return bisect.bisect_left(sorted_values, condition[1]), bisect.bisect_right(sorted_values, condition[1])
+    if operator == '<':
+        return 0, bisect.bisect_left(sorted_values, condition[1])
+    if operator == '<=':
+        return 0, bisect.bisect_right(sorted_values, condition[1])
+    if operator == '>':
+        return bisect.bisect_right(sorted_values, condition[1]), len(sorted_values)
+    if operator == '>=':
+        return bisect.bisect_left(sorted_values, condition[1]), len(sorted_values)
+    if operator == 'between':
+        return bisect.bisect_left(sorted_values, condition[1]), bisect.bisect_right(sorted_values, condition[2])
+    prefix = condition[1]
+    start = bisect.bisect_left(sorted_values, prefix)
+    end = start
+    while end < len(sorted_values) and sorted_values[end].startswith(prefix):
+        end += 1
+    return start, end
+
+
+def read_units_for(size, consistent=False):
+    # One unit per started 4 KB read consistently, half of it otherwise
+    units = max(1, int(math.ceil(size / 4096.0)))
+    return float(units) if consistent else units / 2.0
+
+
+def read_units(item, consistent=False):
+    return read_units_for(item_size(item) if item else 0, consistent)
+
+
+def projection(item, expression, names):
+    if not expression:
+        return dict(item)
+    wanted = [substitute(name.strip(), names) for name in expression.split(',')]
+    return dict((name, item[name]) for name in wanted if name in item)
+
+
+class Partition(object):
+    # Items of one hash key, sorted by range key; local indexes keep sorted
+    # (index value, range value) pairs next to a list of the index values
+    __slots__ = ('range_values', 'items', 'index_entries', 'index_values')
+
+    def __init__(self, index_names):
+        self.range_values = []
+        self.items = {}
+        self.index_entries = dict((name, []) for name in index_names)
+        self.index_values = dict((name, []) for name in index_names)
+
+
+class MemoryTable(object):
+
+    def __init__(self, request):
+        self.name = request['TableName']
+        self.key_schema = request['KeySchema']
+        self.hash_name = self.key_schema[0]['AttributeName']
+        self.range_name = self.key_schema[1]['AttributeName'] if len(self.key_schema) > 1 else None
+        self.key_names = [key['AttributeName'] for key in self.key_schema]
+        self.attribute_types = dict((definition['AttributeName'], definition['AttributeType'])
+                                    for definition in request['AttributeDefinitions'])
+        self.local_indexes = []
+        for index in request.get('LocalSecondaryIndexes', []):
+            if index['KeySchema'][0]['AttributeName'] != self.hash_name:
+                raise validation_error('Local index %s must use the table\'s hash key' % index['IndexName'])
+            self.local_indexes.append({'IndexName': index['IndexName'], 'KeySchema': index['KeySchema'],
+                                       'Projection': index.get('Projection', {'ProjectionType': 'ALL'})})
+        self.local_index_ranges = dict((index['IndexName'], index['KeySchema'][1]['AttributeName'])
+                                       for index in self.local_indexes)
+        self.global_indexes = [dict(index, IndexStatus='ACTIVE') for index in request.get('GlobalSecondaryIndexes', [])]
+        self.on_demand = request.get('BillingMode') == 'PAY_PER_REQUEST'
+        throughput = request.get('ProvisionedThroughput') or {}
+        self.read_capacity = 0 if self.on_demand else throughput.get('ReadCapacityUnits', 0)
+        self.write_capacity = 0 if self.on_demand else throughput.get('WriteCapacityUnits', 0)
+        self.decreases_today = 0
+        self.decrease_day = None
+        self.last_decrease = None
+        self.last_increase = None
+        self.created = datetime.datetime.now(datetime.timezone.utc)
+        self.partitions = {}
+        self.hash_values = []
+        self.item_count = 0
+        self.write_tokens = float(self.write_capacity)
+        self.tokens_updated = time.time()
+
+    def describe(self):
+        provisioned = {'ReadCapacityUnits': self.read_capacity, 'WriteCapacityUnits': self.write_capacity,
+                       'NumberOfDecreasesToday': self.decreases_today}
+        if self.last_decrease:
+            provisioned['LastDecreaseDateTime'] = self.last_decrease
+        if self.last_increase:
+            provisioned['LastIncreaseDateTime'] = self.last_increase
+        description = {
+            'TableName': self.name,
+            'TableStatus': 'ACTIVE',
+            'KeySchema': self.key_schema,
+            'AttributeDefinitions': [{'AttributeName': name, 'AttributeType': attribute_type}
+                                     for name, attribute_type in sorted(self.attribute_types.items())],
+            'ProvisionedThroughput': provisioned,
+            'CreationDateTime': self.created,
+            'ItemCount': self.item_count,
+            'TableSizeBytes': sum(item_size(item) for partition in self.partitions.values()
+                                  for item in partition.items.values()),
+        }
+        if self.on_demand:
+            description['BillingModeSummary'] = {'BillingMode': 'PAY_PER_REQUEST'}
+        if self.local_indexes:
+            description['LocalSecondaryIndexes'] = [dict(index) for index in self.local_indexes]
+        if self.global_indexes:
+            description['GlobalSecondaryIndexes'] = [dict(index) for index in self.global_indexes]
+        return description
+
+    def key_values(self, key):
+        # (hash value, range value) of an item or key, validated; hash-only
+        # tables keep every item under the range value ''
+        for name in (self.hash_name, self.range_name):
+            if name is None:
+                continue
+            if name not in key:
+                raise validation_error('One of the required keys was not given a value: %s' % name)
+            (attribute_type, _), = key[name].items()
+            if attribute_type != self.attribute_types[name]:
+                raise validation_error('Type mismatch for key %s, expected %s' % (name, self.attribute_types[name]))
+        return (sort_value(key[self.hash_name]),
+                sort_value(key[self.range_name]) if self.range_name else '')
+
+    def key_of(self, item):
+        return dict((name, item[name]) for name in (self.hash_name, self.range_name) if name)
+
+    def get(self, key):
+        hash_value, range_value = self.key_values(key)
+        partition = self.partitions.get(hash_value)
+        return partition.items.get(range_value) if partition else None
+
+    def put(self, item):
+        for name, attribute_type in self.attribute_types.items():
+            if name in item and list(item[name]) != [attribute_type]:
+                raise validation_error('Type mismatch for attribute %s, expected %s' % (name, attribute_type))
+        if item_size(item) > MAX_ITEM_BYTES:
+            raise validation_error('Item size has exceeded the maximum allowed size')
+        hash_value, range_value = self.key_values(item)
+        partition = self.partitions.get(hash_value)
+        if partition is None:
+            partition = self.partitions[hash_value] = Partition(self.local_index_ranges)
+            bisect.insort(self.hash_values, hash_value)
+        old = partition.items.get(range_value)
+        if old is None:
+            bisect.insort(partition.range_values, range_value)
+            self.item_count += 1
+        else:
+            self.unindex(partition, range_value, old)
+        partition.items[range_value] = dict(item)
+        for index_name, index_range in self.local_index_ranges.items():
+            if index_range in item:
+                entry = (sort_value(item[index_range]), range_value)
+                position = bisect.bisect_left(partition.index_entries[index_name], entry)
+                partition.index_entries[index_name].insert(position, entry)
+                partition.index_values[index_name].insert(position, entry[0])
+        return old
+
+    def unindex(self, partition, range_value, item):
+        for index_name, index_range in self.local_index_ranges.items():
+            if index_range in item:
+                position = bisect.bisect_left(partition.index_entries[index_name],
+                                              (sort_value(item[index_range]), range_value))
+                del partition.index_entries[index_name][position]
+                del partition.index_values[index_name][position]
+
+    def delete(self, key):
+        hash_value, range_value = self.key_values(key)
+        partition = self.partitions.get(hash_value)
+        old = partition.items.pop(range_value, None) if partition else None
+        if old is None:
+            return None
+        self.unindex(partition, range_value, old)
+        del partition.range_values[bisect.bisect_left(partition.range_values, range_value)]
+        self.item_count -= 1
+        if not partition.items:
+            del self.partitions[hash_value]
+            del self.hash_values[bisect.bisect_left(self.hash_values, hash_value)]
+        return old
+
+    def index_projection(self, index_name, item):
+        index = [index for index in self.local_indexes if index['IndexName'] == index_name][0]
+        projected = index['Projection']
+        if projected.get('ProjectionType') == 'ALL':
+            return dict(item)
+        names = set(self.key_of(item)) | set([self.local_index_ranges[index_name]])
+        names |= set(projected.get('NonKeyAttributes', []))
+        return dict((name, item[name]) for name in names if name in item)
+
+    def query_items(self, hash_value, range_condition, index_name, forward, start_key):
+        # Yields items of one partition in key order, after `start_key`
+        partition = self.partitions.get(hash_value)
+        if partition is None:
+            return
+        if index_name:
+            values = partition.index_values[index_name]
+            entries = partition.index_entries[index_name]
+            start, end = range_bounds(values, range_condition)
+            if start_key is not None:
+                after = (sort_value(start_key[self.local_index_ranges[index_name]]),
+                         sort_value(start_key[self.range_name]))
+                if forward:
+                    start = max(start, bisect.bisect_right(entries, after))
+                else:
+                    end = min(end, bisect.bisect_left(entries, after))
+            positions = range(start, end) if forward else range(end - 1, start - 1, -1)
+            for position in positions:
+                yield self.index_projection(index_name, partition.items[entries[position][1]])
+            return
+        start, end = range_bounds(partition.range_values, range_condition)
+        if start_key is not None and self.range_name:
+            after = sort_value(start_key[self.range_name])
+            if forward:
+                start = max(start, bisect.bisect_right(partition.range_values, after))
+            else:
+                end = min(end, bisect.bisect_left(partition.range_values, after))
+        elif start_key is not None:
+            return
+        positions = range(start, end) if forward else range(end - 1, start - 1, -1)
+        for position in positions:
+            yield dict(partition.items[partition.range_values[position]])
+
+    def scan_items(self, segment, total_segments, start_key):
+        # Yields the items of one segment; segments split the hash keys
+        start = 0
+        start_range = None
+        if start_key is not None:
+            start_hash, start_range = self.key_values(start_key)
+            start = bisect.bisect_left(self.hash_values, start_hash)
+        for position in range(start, len(self.hash_values)):
+            hash_value = self.hash_values[position]
+            if zlib.crc32(str(hash_value).encode('utf-8')) % total_segments != segment:
+                continue
+            partition = self.partitions[hash_value]
+            first = 0
+            if start_key is not None and position == start and hash_value == start_hash:
+                if not self.range_name:
+                    continue
+                first = bisect.bisect_right(partition.range_values, start_range)
+            for range_value in partition.range_values[first:]:
+                yield dict(partition.items[range_value])
+
+    def take_write_capacity(self, units):
+        # With enforce_capacity: False when the second's capacity is used up
+        if self.on_demand or not self.write_capacity:
+            return True
+        now = time.time()
+        self.write_tokens = min(float(self.write_capacity),
+                                self.write_tokens + (now - self.tokens_updated) * self.write_capacity)
+        self.tokens_updated = now
+        if self.write_tokens < units:
+            return False
+        self.write_tokens -= units
+        return True
+
+
+class MemoryDynamoDB(object):
+    # A client and its database in one; methods mirror the boto3 client's
+
+    def __init__(self, unprocessed_rate=0.0, throttle_calls=0, enforce_capacity=False, seed=0):
+        self.tables = {}
+        self.lock = threading.RLock()
+        self.unprocessed_rate = unprocessed_rate
+        self.throttle_calls = throttle_calls
+        self.enforce_capacity = bool(enforce_capacity)
+        self.random = random.Random(seed)
+        self.calls = {}
+
+    # Bookkeeping shared by every call
+
+    def begin(self, operation):
+        self.calls[operation] = self.calls.get(operation, 0) + 1
+        if self.throttle_calls and operation not in TABLE_OPERATIONS:
+            self.throttle_calls -= 1
+            raise StandInError('ProvisionedThroughputExceededException',
+                               'The level of configured provisioned throughput for the table was exceeded')
+
+    def table(self, table_name):
+        table = self.tables.get(table_name)
+        if table is None:
+            raise StandInError('ResourceNotFoundException', 'Requested resource not found: Table: %s not found'
+                               % table_name)
+        return table
+
+    def write_units(self, table, item):
+        return write_capacity_units(item, table.key_names, table.local_indexes)
+
+    def unprocessed(self):
+        return self.unprocessed_rate and self.random.random() < self.unprocessed_rate
+
+    def respond(self, request, response, units, many=False):
+        # Batch and transaction calls report a list, the others one entry
+        if request.get('ReturnConsumedCapacity') in ('TOTAL', 'INDEXES'):
+            consumed = [{'TableName': table_name, 'CapacityUnits': float(total)}
+                        for table_name, total in sorted(units.items())]
+            response['ConsumedCapacity'] = consumed if many else consumed[0]
+        return response
+
+    def check_condition(self, request, table, old):
+        expression = request.get('ConditionExpression')
+        if not expression:
+            return
+        condition = parse_condition(expression, request.get('ExpressionAttributeNames'),
+                                    request.get('ExpressionAttributeValues'))
+        if not condition(old or {}):
+            response = {}
+            if old is not None and request.get('ReturnValuesOnConditionCheckFailure') == 'ALL_OLD':
+                response['Item'] = dict(old)
+            raise StandInError('ConditionalCheckFailedException', 'The conditional request failed', **response)
+
+    # Tables
+
+    def create_table(self, **request):
+        with self.lock:
+            self.begin('create_table')
+            if request['TableName'] in self.tables:
+                raise StandInError('ResourceInUseException', 'Table already exists: %s' % request['TableName'])
+            table = self.tables[request['TableName']] = MemoryTable(request)
+            return {'TableDescription': table.describe()}
+
+    def describe_table(self, TableName):
+        with self.lock:
+            self.begin('describe_table')
+            return {'Table': self.table(TableName).describe()}
+
+    def list_tables(self, **request):
+        with self.lock:
+            self.begin('list_tables')
+            return {'TableNames': sorted(self.tables)}
+
+    def delete_table(self, TableName):
+        with self.lock:
+            self.begin('delete_table')
+            description = self.table(TableName).describe()
+            del self.tables[TableName]
+            return {'TableDescription': dict(description, TableStatus='DELETING')}
+
+    def update_table(self, **request):
+        with self.lock:
+            self.begin('update_table')
+            table = self.table(request['TableName'])
+            now = datetime.datetime.now(datetime.timezone.utc)
+            if request.get('BillingMode') == 'PAY_PER_REQUEST':
+                table.on_demand = True
+                table.read_capacity = table.write_capacity = 0
+            elif request.get('BillingMode') == 'PROVISIONED':
+                table.on_demand = False
+            throughput = request.get('ProvisionedThroughput')
+            if throughput:
+                if table.on_demand:
+                    raise validation_error('One or more parameter values were invalid: on-demand tables have no '
+                                           'provisioned throughput')
+                lowering = (throughput['ReadCapacityUnits'] < table.read_capacity
+                            or throughput['WriteCapacityUnits'] < table.write_capacity)
+                if lowering:
+                    if table.decrease_day != now.date():
+                        table.decrease_day, table.decreases_today = now.date(), 0
+                    if table.decreases_today >= 4 and now - table.last_decrease < datetime.timedelta(hours=1):
+                        raise StandInError('LimitExceededException', 'Subscriber limit exceeded: Provisioned '
+                                           'throughput decreases are limited within a given UTC day')
+                    table.decreases_today += 1
+                    table.last_decrease = now
+                elif not lowering:
+                    table.last_increase = now
+                table.read_capacity = throughput['ReadCapacityUnits']
+                table.write_capacity = throughput['WriteCapacityUnits']
+                table.write_tokens = float(table.write_capacity)
+            for definition in request.get('AttributeDefinitions', []):
+                table.attribute_types[definition['AttributeName']] = definition['AttributeType']
+            for update in request.get('GlobalSecondaryIndexUpdates', []):
+                if 'Create' in update:
+                    table.global_indexes.append(dict(update['Create'], IndexStatus='ACTIVE'))
+                elif 'Update' in update:
+                    for index in table.global_indexes:
+                        if index['IndexName'] == update['Update']['IndexName']:
+                            index['ProvisionedThroughput'] = update['Update']['ProvisionedThroughput']
+            return {'TableDescription': table.describe()}
+
+    # Items
+
+    def batch_write_item(self, RequestItems, **request):
+        with self.lock:
+            self.begin('batch_write_item')
+            if sum(len(write_requests) for write_requests in RequestItems.values()) > MAX_BATCH_WRITE_ITEMS:
+                raise validation_error('Too many items requested for the BatchWriteItem call')
+            unprocessed = {}
+            units = {}
+            for table_name, write_requests in RequestItems.items():
+                table = self.table(table_name)
+                keys = set()
+                for write_request in write_requests:
+                    body = write_request.get('PutRequest', {}).get('Item') or \
+                        write_request.get('DeleteRequest', {}).get('Key')
+                    key = table.key_values(body)
+                    if key in keys:
+                        raise validation_error('Provided list of item keys contains duplicates')
+                    keys.add(key)
+                for write_request in write_requests:
+                    cost = write_request_capacity_units(write_request, table.key_names, table.local_indexes)
+                    if self.unprocessed() or (self.enforce_capacity and not table.take_write_capacity(cost)):
+                        unprocessed.setdefault(table_name, []).append(write_request)
+                        continue
+                    if 'PutRequest' in write_request:
+                        table.put(write_request['PutRequest']['Item'])
+                    else:
+                        table.delete(write_request['DeleteRequest']['Key'])
+                    units[table_name] = units.get(table_name, 0) + cost
+            return self.respond(request, {'UnprocessedItems': unprocessed}, units, True)
+
+    def batch_get_item(self, RequestItems, **request):
+        with self.lock:
+            self.begin('batch_get_item')
+            if sum(len(entry['Keys']) for entry in RequestItems.values()) > MAX_BATCH_GET_KEYS:
+                raise validation_error('Too many items requested for the BatchGetItem call')
+            responses = {}
+            unprocessed = {}
+            units = {}
+            for table_name, entry in RequestItems.items():
+                table = self.table(table_name)
+                responses[table_name] = []
+                for key in entry['Keys']:
+                    if self.unprocessed():
+                        unprocessed.setdefault(table_name, dict(entry, Keys=[]))['Keys'].append(key)
+                        continue
+                    item = table.get(key)
+                    units[table_name] = units.get(table_name, 0) + read_units(item, entry.get('ConsistentRead'))
+                    if item is not None:
+                        responses[table_name].append(projection(item, entry.get('ProjectionExpression'),
+                                                                entry.get('ExpressionAttributeNames')))
+            return self.respond(request, {'Responses': responses, 'UnprocessedKeys': unprocessed}, units, True)
+
+    def put_item(self, TableName, Item, **request):
+        with self.lock:
+            self.begin('put_item')
+            table = self.table(TableName)
+            old = table.get(Item)
+            self.check_condition(request, table, old)
+            cost = self.write_units(table, Item)
+            if self.enforce_capacity and not table.take_write_capacity(cost):
+                raise StandInError('ProvisionedThroughputExceededException',
+                                   'The level of configured provisioned throughput for the table was exceeded')
+            table.put(Item)
+            response = {}
+            if old is not None and request.get('ReturnValues') == 'ALL_OLD':
+                response['Attributes'] = dict(old)
+            return self.respond(request, response, {TableName: cost})
+
+    def get_item(self, TableName, Key, **request):
+        with self.lock:
+            self.begin('get_item')
+            item = self.table(TableName).get(Key)
+            response = {}
+            if item is not None:
+                response['Item'] = projection(item, request.get('ProjectionExpression'),
+                                              request.get('ExpressionAttributeNames'))
+            return self.respond(request, response, {TableName: read_units(item, request.get('ConsistentRead'))})
+
+    def delete_item(self, TableName, Key, **request):
+        with self.lock:
+            self.begin('delete_item')
+            table = self.table(TableName)
+            old = table.get(Key)
+            self.check_condition(request, table, old)
+            table.delete(Key)
+            response = {}
+            if old is not None and request.get('ReturnValues') == 'ALL_OLD':
+                response['Attributes'] = dict(old)
+            return self.respond(request, response, {TableName: 1 + len(table.local_indexes)})
+
+    def transact_write_items(self, TransactItems, **request):
+        with self.lock:
+            self.begin('transact_write_items')
+            if len(TransactItems) > MAX_TRANSACTION_ITEMS:
+                raise validation_error('Member must have length less than or equal to %d' % MAX_TRANSACTION_ITEMS)
+            reasons = []
+            failed = False
+            for action in TransactItems:
+                (kind, body), = action.items()
+                table = self.table(body['TableName'])
+                old = table.get(body.get('Item') or body.get('Key'))
+                try:
+                    self.check_condition(body, table, old)
+                    reasons.append({'Code': 'None'})
+                except StandInError as e:
+                    reason = {'Code': 'ConditionalCheckFailed', 'Message': 'The conditional request failed'}
+                    if 'Item' in e.response:
+                        reason['Item'] = e.response['Item']
+                    reasons.append(reason)
+                    failed = True
+            if failed:
+                raise StandInError('TransactionCanceledException', 'Transaction cancelled',
+                                   CancellationReasons=reasons)
+            units = {}
+            for action in TransactItems:
+                (kind, body), = action.items()
+                table = self.table(body['TableName'])
+                if kind == 'Put':
+                    table.put(body['Item'])
+                    cost = 2 * self.write_units(table, body['Item'])
+                elif kind == 'Delete':
+                    table.delete(body['Key'])
+                    cost = 2 * (1 + len(table.local_indexes))
+                else:
+                    cost = 0
+                units[body['TableName']] = units.get(body['TableName'], 0) + cost
+            return self.respond(request, {}, units, True)
+
+    # Reads of many items
+
+    def page(self, request, items):
+        # Applies Limit, the 1 MB page size, FilterExpression and the
+        # projection to an iterator of items
+        limit = request.get('Limit')
+        names = request.get('ExpressionAttributeNames')
+        values = request.get('ExpressionAttributeValues')
+        keep = parse_condition(request['FilterExpression'], names, values) \
+            if request.get('FilterExpression') else None
+        found = []
+        scanned = 0
+        size = 0
+        last_item = None
+        for item in items:
+            scanned += 1
+            size += item_size(item)
+            last_item = item
+            if keep is None or keep(item):
+                found.append(projection(item, request.get('ProjectionExpression'), names))
+            if (limit and scanned >= limit) or size >= MAX_PAGE_BYTES:
+                break
+        else:
+            last_item = None
+        response = {'Count': len(found), 'ScannedCount': scanned}
+        if request.get('Select') != 'COUNT':
+            response['Items'] = found
+        if last_item is not None:
+            response['LastEvaluatedKey'] = last_item
+        return response, size
+
+    def query(self, TableName, **request):
+        with self.lock:
+            self.begin('query')
+            table = self.table(TableName)
+            index_name = request.get('IndexName')
+            range_name = table.range_name
+            if index_name:
+                if index_name not in table.local_index_ranges:
+                    raise validation_error('The table does not have the specified index: %s' % index_name)
+                range_name = table.local_index_ranges[index_name]
+            hash_value, range_condition = parse_key_condition(
+                request['KeyConditionExpression'], request.get('ExpressionAttributeNames'),
+                request.get('ExpressionAttributeValues'), table.hash_name, range_name)
+            items = table.query_items(sort_value(hash_value), range_condition, index_name,
+                                      request.get('ScanIndexForward', True), request.get('ExclusiveStartKey'))
+            response, size = self.page(request, items)
+            if 'LastEvaluatedKey' in response:
+                last = response['LastEvaluatedKey']
+                names = list(table.key_of(last)) + ([range_name] if index_name else [])
+                response['LastEvaluatedKey'] = dict((name, last[name]) for name in names)
+            return self.respond(request, response, {TableName: read_units_for(size, request.get('ConsistentRead'))})
+
+    def scan(self, TableName, **request):
+        with self.lock:
+            self.begin('scan')
+            table = self.table(TableName)
+            total_segments = request.get('TotalSegments', 1)
+            segment = request.get('Segment', 0)
+            if not 0 <= segment < total_segments:
+                raise validation_error('Segment must be less than TotalSegments')
+            items = table.scan_items(segment, total_segments, request.get('ExclusiveStartKey'))
+            response, size = self.page(request, items)
+            if 'LastEvaluatedKey' in response:
+                response['LastEvaluatedKey'] = table.key_of(response['LastEvaluatedKey'])
+            return self.respond(request, response, {TableName: read_units_for(size, request.get('ConsistentRead'))})
+
+
+databases = {}
+databases_lock = threading.Lock()
+
+
+def parse_endpoint(endpoint_url):
+    _, _, query = endpoint_url[len(MEMORY_SCHEME):].partition('?')
+    options = {}
+    for pair in filter(None, query.split('&')):
+        name, _, value = pair.partition('=')
+        if name not in OPTION_TYPES:
+            raise Exception('Unknown memory:// option "%s", expected %s' % (name, ', '.join(sorted(OPTION_TYPES))))
+        options[name] = OPTION_TYPES[name](value)
+    return options
+
+
+def connect(endpoint_url):
+    with databases_lock:
+        database = databases.get(endpoint_url)
+        if database is None:
+            database = databases[endpoint_url] = MemoryDynamoDB(**parse_endpoint(endpoint_url))
+        return database
+
+
+def reset():
+    # Forgets every database; for tests
+    with databases_lock:
+        databases.clear()
@@ -0,0 +1,81 @@
+import threading
+import time
+
+from item_size import write_request_capacity_units
+
+
+class TokenBucket(object):
+    # Paces writes to a target rate of capacity units per second. Callers
+    # may take more tokens than are available; the debt is paid off by
+    # sleeping, so a large batch simply waits longer. The rate backs off
+    # when DynamoDB throttles and creeps back up to the target afterwards.
+
+    def __init__(self, rate, min_rate=1.0, decrease_factor=0.7, increase_step=0.05):
+        self.target_rate = float(rate)
+        self.rate = float(rate)
+        self.min_rate = min(float(min_rate), self.target_rate)
+        self.decrease_factor = decrease_factor
+        self.increase_step = increase_step
+        self.tokens = float(rate)
+        self.updated = time.time()
+        self.lock = threading.Lock()
+
+    def refill(self, now):
+        self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, tokens):
+        # Takes the tokens and returns how long the caller has to wait
+        with self.lock:
+            self.refill(time.time())
+            self.tokens -= tokens
+            return -self.tokens / self.rate if self.tokens < 0 else 0
+
+    def acquire(self, tokens):
+        wait = self.reserve(tokens)
+        if wait:
+            time.sleep(wait)
+
+    def on_throttle(self):
+        with self.lock:
+            self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+
+    def on_success(self):
+        with self.lock:
+            self.rate = min(self.target_rate, self.rate + self.target_rate * self.increase_step)
+
+
+class WriteCapacityBucket(TokenBucket):
+    # Token bucket priced in the write capacity units a request consumes,
+    # including the entries it adds to the table's local indexes
+
+    def __init__(self, rate, key_names=(), local_indexes=(), **kwargs):
+        TokenBucket.__init__(self, rate, **kwargs)
+        self.key_names = tuple(key_names)
+        self.local_indexes = tuple(local_indexes)
+
+    def write_cost(self, write_requests):
+        return sum(write_request_capacity_units(write_request, self.key_names, self.local_indexes)
+                   for write_request in write_requests)
+
+
+def write_limiter(description, utilization=1.0):
+    # On-demand tables report no write capacity and are not paced
+    capacity = description.get('ProvisionedThroughput', {}).get('WriteCapacityUnits') or 0
+    if capacity and utilization > 0:
+        return WriteCapacityBucket(capacity * utilization,
+                                   [key['AttributeName'] for key in description['KeySchema']],
+                                   description.get('LocalSecondaryIndexes', []))
+    return None
+
+
+def provisioned_write_limiters(dynamodb_conn, table_names, utilization=1.0):
+    limiters = {}
+    if utilization <= 0:
+        return limiters
+    for table_name in table_names:
+        description = dynamodb_conn.describe_table(TableName=table_name)['Table']
+        limiter = write_limiter(description, utilization)
+        if limiter:
+            limiters[table_name] = limiter
+    return limiters
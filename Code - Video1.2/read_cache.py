@@ -0,0 +1,152 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from table_queries import batch_get_items
+from table_schema import TABLES_BY_NAME, key_attributes
+
+# Small, read-heavy reference tables that are worth caching client side
+REFERENCE_TABLES = ('ProductCatalog', 'Forum')
+
+
+def cache_key(key):
+    return tuple(sorted((name, attribute_type, value)
+                        for name, typed_value in key.items()
+                        for attribute_type, value in typed_value.items()))
+
+
+class ReadThroughCache(object):
+    # LRU + TTL cache in front of one table. Concurrent misses are collected
+    # for batch_window seconds and fetched with a single BatchGetItem; items
+    # that do not exist are cached too, so repeated misses cost nothing.
+    # The caller leading a fetch only fetches the keys waiting when it takes
+    # them, and the next caller to miss leads the fetch after that.
+
+    def __init__(self, dynamodb_conn, table_name, key_names=None, max_entries=10000, ttl=300.0,
+                 batch_window=0.002, max_retries=8):
+        self.dynamodb_conn = dynamodb_conn
+        self.table_name = table_name
+        self.key_names = tuple(key_names or key_attributes(TABLES_BY_NAME[table_name]))
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.batch_window = batch_window
+        self.max_retries = max_retries
+        self.entries = OrderedDict()
+        self.waiting = OrderedDict()
+        # Keys taken by a fetch that has not returned yet
+        self.in_flight = {}
+        self.fetching = False
+        # Bumped by invalidate() so a fetch that raced with our own write
+        # does not cache the old item
+        self.invalidations = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def key_of(self, item):
+        return dict((name, item[name]) for name in self.key_names)
+
+    def lookup(self, key_id, now):
+        entry = self.entries.get(key_id)
+        if entry is None:
+            return False, None
+        expires, item = entry
+        if expires < now:
+            del self.entries[key_id]
+            return False, None
+        self.entries.move_to_end(key_id)
+        return True, item
+
+    def store(self, key_id, item, now):
+        self.entries[key_id] = (now + self.ttl, item)
+        self.entries.move_to_end(key_id)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def get(self, key):
+        return self.get_many([key])[0]
+
+    def get_many(self, keys):
+        # Returns the items (or None) in the order of `keys`
+        now = time.time()
+        results = [None] * len(keys)
+        futures = []
+        queued = lead = False
+        with self.lock:
+            for position, key in enumerate(keys):
+                key_id = cache_key(key)
+                found, item = self.lookup(key_id, now)
+                if found:
+                    self.hits += 1
+                    results[position] = item
+                    continue
+                self.misses += 1
+                waiting = self.waiting.get(key_id) or self.in_flight.get(key_id)
+                if waiting is None:
+                    future = Future()
+                    self.waiting[key_id] = (key, future)
+                    queued = True
+                else:
+                    future = waiting[1]
+                futures.append((position, future))
+            if queued and not self.fetching:
+                self.fetching = lead = True
+        if lead:
+            self.fetch_waiting()
+        for position, future in futures:
+            results[position] = future.result()
+        return results
+
+    def fetch_waiting(self):
+        # The caller that found no fetch running takes the keys waiting after
+        # the batch window and hands over before fetching them, so keys that
+        # miss from now on are fetched by their own caller
+        time.sleep(self.batch_window)
+        with self.lock:
+            batch = list(self.waiting.items())
+            self.waiting = OrderedDict()
+            self.in_flight.update(batch)
+            self.fetching = False
+            invalidations = self.invalidations
+        try:
+            found = self.batch_get([key for _, (key, _) in batch])
+        except Exception as e:
+            with self.lock:
+                for key_id, (_, future) in batch:
+                    del self.in_flight[key_id]
+                    future.set_exception(e)
+            return
+        now = time.time()
+        with self.lock:
+            for key_id, (_, future) in batch:
+                del self.in_flight[key_id]
+                item = found.get(key_id)
+                if invalidations == self.invalidations:
+                    self.store(key_id, item, now)
+                future.set_result(item)
+
+    def batch_get(self, keys):
+        return dict((cache_key(self.key_of(item)), item)
+                    for item in batch_get_items(self.dynamodb_conn, self.table_name, keys, self.max_retries))
+
+    def invalidate(self, key):
+        with self.lock:
+            self.entries.pop(cache_key(key), None)
+            self.invalidations += 1
+
+    def put_item(self, item, **kwargs):
+        # Writes through the cache keep it consistent with our own changes
+        response = self.dynamodb_conn.put_item(TableName=self.table_name, Item=item, **kwargs)
+        self.invalidate(self.key_of(item))
+        return response
+
+    def delete_item(self, key, **kwargs):
+        response = self.dynamodb_conn.delete_item(TableName=self.table_name, Key=key, **kwargs)
+        self.invalidate(key)
+        return response
+
+
+def reference_table_caches(dynamodb_conn, **options):
+    return dict((table_name, ReadThroughCache(dynamodb_conn, table_name, **options))
+                for table_name in REFERENCE_TABLES)
@@ -0,0 +1,99 @@
+import json
+import os
+import time
+
+IMDS_TOKEN_URL = 'http://169.254.169.254/latest/api/token'
+IMDS_IDENTITY_URL = 'http://169.254.169.254/latest/dynamic/instance-identity/document'
+
+DEFAULT_CACHE_PATH = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'),
+                                  'initialize_dynamodb', 'region.json')
+DEFAULT_CACHE_TTL = 24 * 60 * 60
+
+resolved_region = None
+
+
+def region_from_env():
+    return os.environ.get('AWS_REGION') or os.environ.get('AWS_DEFAULT_REGION')
+
+
+def region_from_profile():
+    config_path = os.environ.get('AWS_CONFIG_FILE') or os.path.expanduser('~/.aws/config')
+    if not os.path.exists(config_path):
+        return None
+    profile = os.environ.get('AWS_PROFILE') or os.environ.get('AWS_DEFAULT_PROFILE') or 'default'
+    section = profile if profile == 'default' else 'profile %s' % profile
+    from configparser import ConfigParser
+    parser = ConfigParser()
+    try:
+        parser.read(config_path)
+    except Exception:
+        return None
+    if parser.has_option(section, 'region'):
+        return parser.get(section, 'region')
+    return None
+
+
+def region_from_cache(cache_path):
+    try:
+        with open(cache_path) as f:
+            cached = json.load(f)
+    except (IOError, OSError, ValueError):
+        return None
+    if cached.get('expires', 0) < time.time():
+        return None
+    return cached.get('region')
+
+
+def write_cache(cache_path, region, ttl):
+    try:
+        directory = os.path.dirname(cache_path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        temporary_path = '%s.%d' % (cache_path, os.getpid())
+        with open(temporary_path, 'w') as f:
+            json.dump({'region': region, 'expires': time.time() + ttl}, f)
+        os.rename(temporary_path, cache_path)
+    except (IOError, OSError):
+        # The cache only saves a round trip next time
+        pass
+
+
+def urlopen(request, timeout):
+    # urllib.request costs more to import than everything else the CLI
+    # needs at startup, and only a region lookup on EC2 uses it
+    from urllib.request import urlopen as open_url
+    return open_url(request, timeout=timeout)
+
+
+def region_from_imds(timeout):
+    # IMDSv2: fetch a session token first, then the identity document
+    from urllib.request import Request
+    try:
+        token_request = Request(IMDS_TOKEN_URL, method='PUT',
+                                headers={'X-aws-ec2-metadata-token-ttl-seconds': '60'})
+        token = urlopen(token_request, timeout=timeout).read().decode('utf-8')
+        identity_request = Request(IMDS_IDENTITY_URL, headers={'X-aws-ec2-metadata-token': token})
+        document = json.loads(urlopen(identity_request, timeout=timeout).read().decode('utf-8'))
+    except Exception:
+        return None
+    return document.get('region')
+
+
+def resolve_region(cli_region=None, cache_path=DEFAULT_CACHE_PATH, cache_ttl=DEFAULT_CACHE_TTL,
+                   imds_timeout=1.0):
+    # CLI, environment, AWS config profile, local cache, then the instance
+    # metadata service; the result is remembered for the rest of the process
+    global resolved_region
+    if cli_region:
+        return cli_region
+    if resolved_region:
+        return resolved_region
+    region = region_from_env() or region_from_profile() or region_from_cache(cache_path)
+    if not region:
+        region = region_from_imds(imds_timeout)
+        if region:
+            write_cache(cache_path, region, cache_ttl)
+    if not region:
+        raise Exception('Could not determine the AWS region, please pass -region or set AWS_REGION')
+    resolved_region = region
+    return region
@@ -0,0 +1,170 @@
+import bisect
+import datetime
+import random
+
+from item_model import Forum, Product, Reply, Thread
+
+# Deterministic synthetic datasets for the forum schema. Everything is
+# derived from the seed: each thread has its own random stream, so any
+# table can be regenerated on its own and in the same order every time.
+#
+# Sources are written as "synthetic:<option>=<value>,...", for example
+# synthetic:seed=7,products=100000,forums=50,threads=200000,replies=8,skew=1.1
+
+DEFAULT_OPTIONS = {
+    'seed': 1,
+    'products': 1000,
+    'forums': 20,
+    'threads': 2000,
+    # Mean replies per thread; lengths follow a Pareto tail
+    'replies': 5.0,
+    # Zipf exponent of threads per forum; 0 spreads them evenly
+    'skew': 1.1,
+    # Shape of the reply-chain length tail, lower means longer chains
+    'chain_alpha': 1.5,
+    # Longest Authors / Color / Tags lists
+    'max_list': 8,
+}
+
+WORDS = ('amazon', 'dynamodb', 'table', 'index', 'query', 'scan', 'throughput', 'capacity', 'partition',
+         'stream', 'backup', 'item', 'attribute', 'batch', 'write', 'read', 'latency', 'bucket', 'lambda',
+         'region', 'replica', 'global', 'local', 'key', 'range', 'hash', 'sort', 'filter', 'limit', 'page')
+COLORS = ('Red', 'Black', 'Blue', 'Green', 'White', 'Silver', 'Yellow', 'Orange', 'Purple', 'Pink')
+BICYCLE_TYPES = ('Road', 'Mountain', 'Hybrid', 'Touring', 'BMX')
+START = datetime.datetime(2015, 1, 1)
+
+
+def parse_options(text):
+    options = dict(DEFAULT_OPTIONS)
+    for pair in filter(None, text.split(',')):
+        name, _, value = pair.partition('=')
+        if name not in DEFAULT_OPTIONS:
+            raise Exception('Unknown synthetic option "%s", expected %s' % (name, ', '.join(sorted(DEFAULT_OPTIONS))))
+        options[name] = type(DEFAULT_OPTIONS[name])(value)
+    return options
+
+
+def words(rng, count):
+    return ' '.join(rng.choice(WORDS) for _ in range(count))
+
+
+def timestamp(moment):
+    return moment.strftime('%Y-%m-%dT%H:%M:%S.') + '%03dZ' % (moment.microsecond // 1000)
+
+
+class SyntheticDataset(object):
+
+    def __init__(self, **options):
+        self.options = dict(DEFAULT_OPTIONS, **options)
+        self.seed = self.options['seed']
+        forums = self.options['forums']
+        # Cumulative Zipf weights: forum 0 is the hottest
+        weights = [1.0 / (rank ** self.options['skew']) for rank in range(1, forums + 1)]
+        total = sum(weights)
+        self.cumulative = []
+        running = 0.0
+        for weight in weights:
+            running += weight / total
+            self.cumulative.append(running)
+
+    def rng(self, *parts):
+        return random.Random(':'.join(str(part) for part in (self.seed,) + parts))
+
+    def forum_name(self, forum_index):
+        return 'Forum %d' % forum_index
+
+    def thread_plan(self, thread_index):
+        # Forum and reply count of a thread, reproducible on their own
+        rng = self.rng('thread', thread_index)
+        forum_index = min(bisect.bisect_left(self.cumulative, rng.random()), len(self.cumulative) - 1)
+        alpha = self.options['chain_alpha']
+        scale = self.options['replies'] * (alpha - 1) / alpha if alpha > 1 else self.options['replies']
+        reply_count = int(min(scale * rng.paretovariate(alpha), 100000)) if self.options['replies'] else 0
+        return forum_index, reply_count, rng
+
+    def products(self):
+        max_list = self.options['max_list']
+        for product_index in range(self.options['products']):
+            rng = self.rng('product', product_index)
+            product_id = 100 + product_index
+            if rng.random() < 0.7:
+                yield Product(Id=product_id,
+                              Title='Book %d Title' % product_id,
+                              ISBN='%03d-%010d' % (product_index % 1000, product_index),
+                              Authors=['Author%d' % rng.randint(1, 5000)
+                                       for _ in range(rng.randint(1, max_list))],
+                              Price=rng.randint(1, 500),
+                              Dimensions='8.5 x 11.0 x %.1f' % rng.uniform(0.2, 3.0),
+                              PageCount=rng.randint(50, 1500),
+                              InPublication=rng.random() < 0.8,
+                              ProductCategory='Book')
+            else:
+                bicycle_type = rng.choice(BICYCLE_TYPES)
+                yield Product(Id=product_id,
+                              Title='%d-Bike-%d' % (product_id, rng.randint(1, 300)),
+                              Description='%d Description' % product_id,
+                              BicycleType=bicycle_type,
+                              Brand='Brand-Company %s' % chr(65 + rng.randint(0, 25)),
+                              Price=rng.randint(100, 5000),
+                              Color=rng.sample(COLORS, rng.randint(1, min(max_list, len(COLORS)))),
+                              ProductCategory='Bicycle')
+
+    def forums(self):
+        # Forum counters have to agree with the threads and replies
+        thread_counts = [0] * self.options['forums']
+        message_counts = [0] * self.options['forums']
+        for thread_index in range(self.options['threads']):
+            forum_index, reply_count, _ = self.thread_plan(thread_index)
+            thread_counts[forum_index] += 1
+            message_counts[forum_index] += 1 + reply_count
+        for forum_index in range(self.options['forums']):
+            rng = self.rng('forum', forum_index)
+            yield Forum(Name=self.forum_name(forum_index),
+                        Category=rng.choice(('Amazon Web Services', 'Databases', 'Storage', 'Compute')),
+                        Threads=thread_counts[forum_index],
+                        Messages=message_counts[forum_index],
+                        Views=message_counts[forum_index] * rng.randint(5, 50))
+
+    def thread_subject(self, thread_index):
+        return 'Thread %d' % thread_index
+
+    def threads(self):
+        max_list = self.options['max_list']
+        for thread_index in range(self.options['threads']):
+            forum_index, reply_count, rng = self.thread_plan(thread_index)
+            last_posted = START + datetime.timedelta(seconds=rng.randint(0, 3 * 365 * 86400))
+            yield Thread(ForumName=self.forum_name(forum_index),
+                         Subject=self.thread_subject(thread_index),
+                         Message=words(rng, rng.randint(5, 60)),
+                         LastPostedBy='User %d' % rng.randint(1, 10000),
+                         LastPostedDateTime=timestamp(last_posted),
+                         Views=rng.randint(reply_count, reply_count * 20 + 10),
+                         Replies=reply_count,
+                         Answered=int(reply_count > 0 and rng.random() < 0.5),
+                         Tags=[rng.choice(WORDS) for _ in range(rng.randint(0, max_list))] or None)
+
+    def replies(self):
+        for thread_index in range(self.options['threads']):
+            forum_index, reply_count, _ = self.thread_plan(thread_index)
+            rng = self.rng('replies', thread_index)
+            reply_id = '%s#%s' % (self.forum_name(forum_index), self.thread_subject(thread_index))
+            moment = START + datetime.timedelta(seconds=rng.randint(0, 365 * 86400))
+            for _ in range(reply_count):
+                # Strictly increasing, so the range key never collides
+                moment += datetime.timedelta(milliseconds=rng.randint(1, 86400000))
+                yield Reply(Id=reply_id,
+                            ReplyDateTime=timestamp(moment),
+                            Message=words(rng, rng.randint(3, 80)),
+                            PostedBy='User %d' % rng.randint(1, 10000))
+
+    def records(self, table_name):
+        return {'ProductCatalog': self.products, 'Forum': self.forums,
+                'Thread': self.threads, 'Reply': self.replies}[table_name]()
+
+    def items(self, table_name):
+        for record in self.records(table_name):
+            yield record.to_item()
+
+
+def synthetic_items(table_name, options_text):
+    return SyntheticDataset(**parse_options(options_text)).items(table_name)
@@ -0,0 +1,149 @@
+import base64
+import csv
+import gzip
+import io
+import json
+import os
+
+DEFAULT_SEED_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'seed_data')
+
+SOURCE_EXTENSIONS = ('.ndjson', '.jsonl', '.csv')
+
+SYNTHETIC_PREFIX = 'synthetic:'
+SYNTHETIC_TABLES = ('ProductCatalog', 'Forum', 'Thread', 'Reply')
+
+
+def open_text(path):
+    if path.endswith('.gz'):
+        return io.TextIOWrapper(gzip.open(path, 'rb'), encoding='utf-8', newline='')
+    return open(path, 'r', encoding='utf-8', newline='')
+
+
+def source_format(path):
+    name = path[:-3] if path.endswith('.gz') else path
+    for extension in SOURCE_EXTENSIONS:
+        if name.endswith(extension):
+            return 'csv' if extension == '.csv' else 'ndjson'
+    raise Exception('Unsupported source file "%s", expected one of %s (optionally .gz)'
+                    % (path, ', '.join(SOURCE_EXTENSIONS)))
+
+
+def table_name_for(path):
+    name = os.path.basename(path)
+    if name.endswith('.gz'):
+        name = name[:-3]
+    return os.path.splitext(name)[0]
+
+
+def decode_binary(value):
+    (attribute_type, data), = value.items()
+    if attribute_type == 'B':
+        return {'B': base64.b64decode(data)}
+    if attribute_type == 'BS':
+        return {'BS': [base64.b64decode(element) for element in data]}
+    if attribute_type == 'L':
+        return {'L': [decode_binary(element) for element in data]}
+    if attribute_type == 'M':
+        return {'M': dict((name, decode_binary(element)) for name, element in data.items())}
+    return value
+
+
+def read_ndjson(path):
+    # One DynamoDB-JSON item per line, e.g. {"Name": {"S": "Amazon S3"}};
+    # binary values are base64 as in exports
+    with open_text(path) as lines:
+        for line_number, line in enumerate(lines, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError as e:
+                raise Exception('%s:%d: invalid JSON (%s)' % (path, line_number, e))
+            if '"B"' in line or '"BS"' in line:
+                item = dict((name, decode_binary(value)) for name, value in item.items())
+            yield item
+
+
+def csv_value(attribute_type, value):
+    if attribute_type in ('S', 'N'):
+        return {attribute_type: value}
+    if attribute_type == 'BOOL':
+        return {'BOOL': value.strip().lower() in ('true', '1', 'yes')}
+    if attribute_type == 'NULL':
+        return {'NULL': True}
+    # Binary cells are base64, as in DynamoDB-JSON exports
+    if attribute_type == 'B':
+        return {'B': base64.b64decode(value)}
+    if attribute_type == 'BS':
+        return {'BS': [base64.b64decode(element) for element in json.loads(value)]}
+    # L, M, SS and NS columns hold their DynamoDB-JSON value
+    return {attribute_type: json.loads(value)}
+
+
+def read_csv(path):
+    # Header cells are "Attribute:Type" (Type defaults to S); empty cells
+    # leave the attribute out of the item
+    with open_text(path) as rows:
+        reader = csv.reader(rows)
+        header = next(reader, None)
+        if header is None:
+            return
+        columns = []
+        for cell in header:
+            name, _, attribute_type = cell.partition(':')
+            columns.append((name, attribute_type or 'S'))
+        for row in reader:
+            item = {}
+            for (name, attribute_type), value in zip(columns, row):
+                if value != '':
+                    item[name] = csv_value(attribute_type, value)
+            if item:
+                yield item
+
+
+def read_items(path):
+    if path.startswith(SYNTHETIC_PREFIX):
+        from seed_generator import synthetic_items
+        table_name, _, options = path[len(SYNTHETIC_PREFIX):].partition('?')
+        return synthetic_items(table_name, options)
+    if source_format(path) == 'csv':
+        return read_csv(path)
+    return read_ndjson(path)
+
+
+def is_source_file(name):
+    try:
+        source_format(name)
+    except Exception:
+        return False
+    return True
+
+
+def resolve_sources(sources):
+    # Each source is "Table=path", a single file named after its table, a
+    # directory of such files or a synthetic dataset ("synthetic:options",
+    # see seed_generator) for one or all tables
+    resolved = []
+    for source in sources or [DEFAULT_SEED_DIR]:
+        table_name, separator, path = source.partition('=')
+        if not separator or table_name.startswith(SYNTHETIC_PREFIX):
+            table_name, path = None, source
+        if path.startswith(SYNTHETIC_PREFIX):
+            options = path[len(SYNTHETIC_PREFIX):]
+            for synthetic_table in ([table_name] if table_name else SYNTHETIC_TABLES):
+                resolved.append((synthetic_table, '%s%s?%s' % (SYNTHETIC_PREFIX, synthetic_table, options)))
+        elif os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if is_source_file(name):
+                    resolved.append((table_name_for(name), os.path.join(path, name)))
+        elif os.path.exists(path):
+            resolved.append((table_name or table_name_for(path), path))
+        else:
+            raise Exception('Source "%s" does not exist' % path)
+    return resolved
+
+
+def stream_sources(sources):
+    for table_name, path in resolve_sources(sources):
+        yield table_name, read_items(path)
@@ -0,0 +1,145 @@
+import multiprocessing
+import queue
+import time
+import zlib
+
+import client_factory
+import instrumentation
+from bulk_loader import BulkLoader
+from key_skew import interleave_table
+from rate_limiter import provisioned_write_limiters
+from seed_sources import stream_sources
+from table_schema import TABLES_BY_NAME
+
+# Write requests are shipped to the workers in chunks of this many
+CHUNK_SIZE = 500
+
+
+def shard_for(table_name, item, workers):
+    # Items with the same hash key always go to the same worker
+    spec = TABLES_BY_NAME.get(table_name)
+    if spec is None:
+        raise Exception('Unknown table "%s"' % table_name)
+    (_, value), = item[spec.hash_key.name].items()
+    return zlib.crc32(str(value).encode('utf-8')) % workers
+
+
+def worker_main(worker_id, region, work_queue, result_queue, threads, write_utilization,
+                endpoint_url, client_settings):
+    client_factory.configure(**client_settings)
+    # A forked worker inherits the parent's metrics, so it counts its own
+    # calls from zero and sends them back with its results
+    metrics = instrumentation.Metrics()
+    dynamodb_conn = instrumentation.InstrumentedClient(client_factory.get_client(region, endpoint_url), metrics)
+    loader = BulkLoader(dynamodb_conn, max_workers=threads)
+    limiters_ready = set()
+    try:
+        while True:
+            message = work_queue.get()
+            if message is None:
+                break
+            table_name, write_requests = message
+            if table_name not in limiters_ready:
+                # Every worker gets an equal share of the table's capacity
+                loader.rate_limiters.update(
+                    provisioned_write_limiters(dynamodb_conn, [table_name], write_utilization))
+                limiters_ready.add(table_name)
+            loader.submit(table_name, write_requests)
+        loader.executor.shutdown(wait=True)
+        stats = loader.stats
+        result_queue.put((worker_id, dict(stats.items), stats.batches, stats.retries,
+                          [(table_name, count, str(error)) for table_name, count, error in stats.failures],
+                          metrics.snapshot()))
+    except Exception as e:
+        result_queue.put((worker_id, dict(loader.stats.items), loader.stats.batches,
+                          loader.stats.retries, [('*', 0, 'worker crashed: %s' % e)], metrics.snapshot()))
+
+
+def put(work_queue, process, message):
+    while True:
+        try:
+            work_queue.put(message, timeout=1)
+            return
+        except queue.Full:
+            if not process.is_alive():
+                raise Exception('Worker %s exited unexpectedly' % process.name)
+
+
+def upload(region, sources=None, workers=2, threads=8, write_utilization=1.0, endpoint_url=None):
+    started = time.time()
+    result_queue = multiprocessing.Queue()
+    processes = []
+    work_queues = []
+    for worker_id in range(workers):
+        work_queue = multiprocessing.Queue(maxsize=threads * 4)
+        process = multiprocessing.Process(
+            target=worker_main, name='loader-%d' % worker_id,
+            args=(worker_id, region, work_queue, result_queue, threads, write_utilization / workers,
+                  endpoint_url, dict(client_factory.client_settings)))
+        process.start()
+        processes.append(process)
+        work_queues.append(work_queue)
+
+    input_error = None
+    try:
+        for table_name, items in stream_sources(sources):
+            items = interleave_table(table_name, items)
+            chunks = [[] for _ in range(workers)]
+            for item in items:
+                worker_id = shard_for(table_name, item, workers)
+                chunks[worker_id].append({'PutRequest': {'Item': item}})
+                if len(chunks[worker_id]) == CHUNK_SIZE:
+                    put(work_queues[worker_id], processes[worker_id], (table_name, chunks[worker_id]))
+                    chunks[worker_id] = []
+            for worker_id, chunk in enumerate(chunks):
+                if chunk:
+                    put(work_queues[worker_id], processes[worker_id], (table_name, chunk))
+    except Exception as e:
+        # Still let the workers finish and report, so their own errors and
+        # the items they did write end up in the summary
+        input_error = e
+
+    for work_queue, process in zip(work_queues, processes):
+        try:
+            put(work_queue, process, None)
+        except Exception:
+            pass
+
+    results = []
+    while len(results) < workers:
+        try:
+            results.append(result_queue.get(timeout=1))
+        except queue.Empty:
+            if not any(process.is_alive() for process in processes):
+                break
+    for process in processes:
+        process.join()
+
+    elapsed = max(time.time() - started, 1e-9)
+    totals = {}
+    retries = 0
+    failures = []
+    lines = []
+    for worker_id, items, batches, worker_retries, worker_failures, worker_metrics in sorted(results):
+        instrumentation.metrics.merge(worker_metrics)
+        for table_name, count in items.items():
+            totals[table_name] = totals.get(table_name, 0) + count
+        retries += worker_retries
+        failures += worker_failures
+        lines.append('  worker %d: %d items in %d batches, %d retries'
+                     % (worker_id, sum(items.values()), batches, worker_retries))
+    if input_error is not None:
+        failures.append(('*', 0, 'upload aborted: %s' % input_error))
+    if len(results) < workers:
+        failures.append(('*', 0, '%d workers exited without reporting' % (workers - len(results))))
+    total = sum(totals.values())
+    lines.insert(0, 'Loaded %d items with %d workers in %.2fs (%.1f items/sec, %d retries)'
+                 % (total, workers, elapsed, total / elapsed, retries))
+    for table_name in sorted(totals):
+        lines.append('  %s: %d items' % (table_name, totals[table_name]))
+    for table_name, count, error in failures:
+        lines.append('  %s: %d items FAILED (%s)' % (table_name, count, error))
+    summary = '\n'.join(lines)
+    if failures:
+        raise Exception('Bulk load incomplete:\n' + summary)
+    return summary
@@ -0,0 +1,113 @@
+import gzip
+import io
+import json
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from bulk_loader import encode_binary
+
+FINISHED = object()
+
+
+def scan_segment(dynamodb_conn, table_name, segment, total_segments, **scan_kwargs):
+    # Follows LastEvaluatedKey through every page of one segment
+    request = dict(scan_kwargs, TableName=table_name, Segment=segment, TotalSegments=total_segments)
+    while True:
+        response = dynamodb_conn.scan(**request)
+        yield response.get('Items', [])
+        last_key = response.get('LastEvaluatedKey')
+        if not last_key:
+            return
+        request['ExclusiveStartKey'] = last_key
+
+
+def scan_pages(dynamodb_conn, table_name, total_segments=8, **scan_kwargs):
+    # Parallel Scan: one thread per segment, pages are handed to the caller
+    # through a bounded queue as (segment, items) so it never holds more
+    # than a few pages in memory
+    pages = queue.Queue(maxsize=total_segments * 2)
+    stop = threading.Event()
+
+    def hand_over(message):
+        while not stop.is_set():
+            try:
+                pages.put(message, timeout=0.5)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def scan(segment):
+        try:
+            for items in scan_segment(dynamodb_conn, table_name, segment, total_segments, **scan_kwargs):
+                if not hand_over((segment, items)):
+                    return
+            hand_over((segment, FINISHED))
+        except Exception as e:
+            hand_over((segment, e))
+
+    with ThreadPoolExecutor(max_workers=total_segments) as executor:
+        for segment in range(total_segments):
+            executor.submit(scan, segment)
+        try:
+            finished = 0
+            while finished < total_segments:
+                segment, items = pages.get()
+                if items is FINISHED:
+                    finished += 1
+                elif isinstance(items, Exception):
+                    raise items
+                else:
+                    yield segment, items
+        finally:
+            # Scanners still running notice this within half a second
+            stop.set()
+
+
+def open_output(path, compress):
+    if compress:
+        return io.TextIOWrapper(gzip.open(path, 'wb', compresslevel=6), encoding='utf-8')
+    return open(path, 'w', encoding='utf-8')
+
+
+def write_items(path, items):
+    # One DynamoDB-JSON item per line, the format seed_sources reads; the
+    # file only appears under its name once complete
+    count = 0
+    temporary_path = path + '.partial'
+    with open_output(temporary_path, path.endswith('.gz')) as output:
+        for item in items:
+            output.write(json.dumps(item, separators=(',', ':'), default=encode_binary))
+            output.write('\n')
+            count += 1
+    os.rename(temporary_path, path)
+    return count
+
+
+def export_table(dynamodb_conn, table_name, path, total_segments=8):
+    return write_items(path, (item for _, items in scan_pages(dynamodb_conn, table_name, total_segments)
+                              for item in items))
+
+
+def export_tables(dynamodb_conn, table_names, output_dir, total_segments=8, compress=True):
+    # Exports the tables side by side; returns [(table_name, items written)]
+    if not os.path.isdir(output_dir):
+        os.makedirs(output_dir)
+    extension = '.ndjson.gz' if compress else '.ndjson'
+    with ThreadPoolExecutor(max_workers=len(table_names)) as executor:
+        futures = [(table_name, executor.submit(export_table, dynamodb_conn, table_name,
+                                                os.path.join(output_dir, table_name + extension),
+                                                total_segments))
+                   for table_name in table_names]
+        return [(table_name, future.result()) for table_name, future in futures]
+
+
+def export_summary(counts, elapsed):
+    elapsed = max(elapsed, 1e-9)
+    total = sum(count for _, count in counts)
+    lines = ['Exported %d items in %.2fs (%.1f items/sec)' % (total, elapsed, total / elapsed)]
+    for table_name, count in counts:
+        lines.append('  %s: %d items' % (table_name, count))
+    return '\n'.join(lines)
@@ -0,0 +1,155 @@
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bulk_loader import backoff_delay
+
+# BatchGetItem accepts at most this many keys per call
+MAX_BATCH_KEYS = 100
+
+FINISHED = object()
+
+
+def query_items(dynamodb_conn, **request):
+    # Lazily yields every item of a Query, one page at a time
+    while True:
+        response = dynamodb_conn.query(**request)
+        for item in response.get('Items', []):
+            yield item
+        last_key = response.get('LastEvaluatedKey')
+        if not last_key:
+            return
+        request['ExclusiveStartKey'] = last_key
+
+
+def batch_get_items(dynamodb_conn, table_name, keys, max_retries=8, **request_options):
+    # Fetches any number of keys in BatchGetItem calls of up to 100 keys,
+    # retrying UnprocessedKeys; yields the items found in no particular order
+    keys = list(keys)
+    for start in range(0, len(keys), MAX_BATCH_KEYS):
+        request = {table_name: dict(request_options, Keys=keys[start:start + MAX_BATCH_KEYS])}
+        attempt = 0
+        while request:
+            response = dynamodb_conn.batch_get_item(RequestItems=request)
+            for item in response.get('Responses', {}).get(table_name, []):
+                yield item
+            request = response.get('UnprocessedKeys') or {}
+            if request:
+                attempt += 1
+                if attempt > max_retries:
+                    raise Exception('BatchGetItem on %s gave up after %d retries' % (table_name, max_retries))
+                time.sleep(backoff_delay(attempt, 0.05, 2.0))
+
+
+def threads_in_forum(dynamodb_conn, forum_name, subject_prefix=None):
+    request = {
+        'TableName': 'Thread',
+        'KeyConditionExpression': '#forum = :forum',
+        'ExpressionAttributeNames': {'#forum': 'ForumName'},
+        'ExpressionAttributeValues': {':forum': {'S': forum_name}},
+    }
+    if subject_prefix:
+        request['KeyConditionExpression'] += ' AND begins_with(#subject, :prefix)'
+        request['ExpressionAttributeNames']['#subject'] = 'Subject'
+        request['ExpressionAttributeValues'][':prefix'] = {'S': subject_prefix}
+    return query_items(dynamodb_conn, **request)
+
+
+def reply_id(forum_name, subject):
+    # Reply's hash key is "<ForumName>#<Subject>"
+    return '%s#%s' % (forum_name, subject)
+
+
+def replies_to_thread(dynamodb_conn, forum_name, subject, since=None, until=None, newest_first=False):
+    request = {
+        'TableName': 'Reply',
+        'KeyConditionExpression': '#id = :id',
+        'ExpressionAttributeNames': {'#id': 'Id'},
+        'ExpressionAttributeValues': {':id': {'S': reply_id(forum_name, subject)}},
+        'ScanIndexForward': not newest_first,
+    }
+    if since or until:
+        request['ExpressionAttributeNames']['#date'] = 'ReplyDateTime'
+        if since and until:
+            request['KeyConditionExpression'] += ' AND #date BETWEEN :since AND :until'
+        elif since:
+            request['KeyConditionExpression'] += ' AND #date >= :since'
+        else:
+            request['KeyConditionExpression'] += ' AND #date <= :until'
+        if since:
+            request['ExpressionAttributeValues'][':since'] = {'S': since}
+        if until:
+            request['ExpressionAttributeValues'][':until'] = {'S': until}
+    return query_items(dynamodb_conn, **request)
+
+
+def replies_by_user(dynamodb_conn, forum_name, subject, posted_by, fetch_items=True, batch_size=MAX_BATCH_KEYS):
+    # PostedBy-Index only projects keys, so the full replies are fetched
+    # from the base table in BatchGetItem calls rather than one GetItem each
+    keys = query_items(dynamodb_conn,
+                       TableName='Reply',
+                       IndexName='PostedBy-Index',
+                       KeyConditionExpression='#id = :id AND #user = :user',
+                       ExpressionAttributeNames={'#id': 'Id', '#user': 'PostedBy'},
+                       ExpressionAttributeValues={':id': {'S': reply_id(forum_name, subject)},
+                                                  ':user': {'S': posted_by}})
+    keys = ({'Id': key['Id'], 'ReplyDateTime': key['ReplyDateTime']} for key in keys)
+    if not fetch_items:
+        for key in keys:
+            yield key
+        return
+    batch = []
+    for key in keys:
+        batch.append(key)
+        if len(batch) == batch_size:
+            for item in batch_get_items(dynamodb_conn, 'Reply', batch):
+                yield item
+            batch = []
+    if batch:
+        for item in batch_get_items(dynamodb_conn, 'Reply', batch):
+            yield item
+
+
+def fan_out(query, arguments, max_workers=8):
+    # Runs query(*args) for every entry of `arguments` concurrently and
+    # yields (args, item) pairs as they arrive. Results are handed over
+    # through a bounded queue, so a slow consumer slows the queries down
+    # instead of buffering them.
+    arguments = [tuple(args) if isinstance(args, (list, tuple)) else (args,) for args in arguments]
+    results = queue.Queue(maxsize=max_workers * 64)
+    stop = threading.Event()
+
+    def hand_over(message):
+        while not stop.is_set():
+            try:
+                results.put(message, timeout=0.5)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def run(args):
+        try:
+            for item in query(*args):
+                if not hand_over((args, item)):
+                    return
+            hand_over((args, FINISHED))
+        except Exception as e:
+            hand_over((args, e))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for args in arguments:
+            executor.submit(run, args)
+        try:
+            finished = 0
+            while finished < len(arguments):
+                args, item = results.get()
+                if item is FINISHED:
+                    finished += 1
+                elif isinstance(item, Exception):
+                    raise item
+                else:
+                    yield args, item
+        finally:
+            stop.set()
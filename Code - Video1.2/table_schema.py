@@ -0,0 +1,203 @@
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from bulk_loader import error_code
+
+# Compact description of a table; compiled to CreateTable/UpdateTable requests
+Key = namedtuple('Key', 'name type')
+Index = namedtuple('Index', 'name hash_key range_key projection read_capacity write_capacity')
+Index.__new__.__defaults__ = (None, 'KEYS_ONLY', 5, 5)
+TableSpec = namedtuple('TableSpec', 'name hash_key range_key local_indexes global_indexes '
+                                    'read_capacity write_capacity')
+TableSpec.__new__.__defaults__ = (None, (), (), 5, 5)
+
+TABLES = [
+    TableSpec('ProductCatalog', Key('Id', 'N')),
+    TableSpec('Forum', Key('Name', 'S')),
+    TableSpec('Thread', Key('ForumName', 'S'), Key('Subject', 'S')),
+    TableSpec('Reply', Key('Id', 'S'), Key('ReplyDateTime', 'S'),
+              local_indexes=(Index('PostedBy-Index', Key('Id', 'S'), Key('PostedBy', 'S')),)),
+]
+
+TABLES_BY_NAME = dict((spec.name, spec) for spec in TABLES)
+
+
+def key_schema(hash_key, range_key=None):
+    schema = [{'AttributeName': hash_key.name, 'KeyType': 'HASH'}]
+    if range_key:
+        schema.append({'AttributeName': range_key.name, 'KeyType': 'RANGE'})
+    return schema
+
+
+def key_attributes(spec):
+    return [key.name for key in (spec.hash_key, spec.range_key) if key]
+
+
+def throughput(read_capacity, write_capacity):
+    return {'ReadCapacityUnits': read_capacity, 'WriteCapacityUnits': write_capacity}
+
+
+def attribute_definitions(keys):
+    definitions = []
+    seen = set()
+    for key in keys:
+        if key and key.name not in seen:
+            seen.add(key.name)
+            definitions.append({'AttributeName': key.name, 'AttributeType': key.type})
+    return definitions
+
+
+def index_request(index, with_throughput):
+    request = {
+        'IndexName': index.name,
+        'KeySchema': key_schema(index.hash_key, index.range_key),
+        'Projection': {'ProjectionType': index.projection},
+    }
+    if with_throughput:
+        request['ProvisionedThroughput'] = throughput(index.read_capacity, index.write_capacity)
+    return request
+
+
+def create_table_request(spec, on_demand=False):
+    keys = [spec.hash_key, spec.range_key]
+    for index in spec.local_indexes + spec.global_indexes:
+        keys += [index.hash_key, index.range_key]
+    request = {
+        'TableName': spec.name,
+        'AttributeDefinitions': attribute_definitions(keys),
+        'KeySchema': key_schema(spec.hash_key, spec.range_key),
+    }
+    if on_demand:
+        request['BillingMode'] = 'PAY_PER_REQUEST'
+    else:
+        request['ProvisionedThroughput'] = throughput(spec.read_capacity, spec.write_capacity)
+    if spec.local_indexes:
+        request['LocalSecondaryIndexes'] = [index_request(index, False) for index in spec.local_indexes]
+    if spec.global_indexes:
+        request['GlobalSecondaryIndexes'] = [index_request(index, not on_demand) for index in spec.global_indexes]
+    return request
+
+
+def local_index_definitions(indexes):
+    definitions = {}
+    for index in indexes:
+        projection = index['Projection']
+        definitions[index['IndexName']] = (index['KeySchema'], projection.get('ProjectionType'),
+                                           sorted(projection.get('NonKeyAttributes', [])))
+    return definitions
+
+
+def is_on_demand(description):
+    return description.get('BillingModeSummary', {}).get('BillingMode') == 'PAY_PER_REQUEST'
+
+
+def update_table_requests(spec, description):
+    # Changes that UpdateTable can apply in place, one request per step
+    create_request = create_table_request(spec)
+    if description['KeySchema'] != create_request['KeySchema']:
+        raise Exception('Key schema of %s differs from the spec, the table has to be recreated' % spec.name)
+    existing_types = dict((definition['AttributeName'], definition['AttributeType'])
+                          for definition in description.get('AttributeDefinitions', []))
+    for definition in create_request['AttributeDefinitions']:
+        existing_type = existing_types.get(definition['AttributeName'])
+        if existing_type is not None and existing_type != definition['AttributeType']:
+            raise Exception('Attribute %s of %s is %s but the spec says %s, the table has to be recreated'
+                            % (definition['AttributeName'], spec.name, existing_type, definition['AttributeType']))
+    if (local_index_definitions(description.get('LocalSecondaryIndexes', []))
+            != local_index_definitions(create_request.get('LocalSecondaryIndexes', []))):
+        raise Exception('Local indexes of %s differ from the spec, the table has to be recreated' % spec.name)
+
+    requests = []
+    # On-demand tables have no throughput to converge
+    on_demand = is_on_demand(description)
+    current = description.get('ProvisionedThroughput', {})
+    wanted = throughput(spec.read_capacity, spec.write_capacity)
+    if not on_demand and any(current.get(name) != value for name, value in wanted.items()):
+        requests.append({'TableName': spec.name, 'ProvisionedThroughput': wanted})
+
+    existing_gsis = dict((index['IndexName'], index)
+                         for index in description.get('GlobalSecondaryIndexes', []))
+    gsi_updates = []
+    for index in spec.global_indexes:
+        existing = existing_gsis.get(index.name)
+        if existing is None:
+            # DynamoDB only accepts one new global index per UpdateTable call
+            requests.append({
+                'TableName': spec.name,
+                'AttributeDefinitions': attribute_definitions([index.hash_key, index.range_key]),
+                'GlobalSecondaryIndexUpdates': [{'Create': index_request(index, not on_demand)}],
+            })
+            continue
+        if on_demand:
+            continue
+        current = existing.get('ProvisionedThroughput', {})
+        wanted = throughput(index.read_capacity, index.write_capacity)
+        if any(current.get(name) != value for name, value in wanted.items()):
+            gsi_updates.append({'Update': {'IndexName': index.name, 'ProvisionedThroughput': wanted}})
+    if gsi_updates:
+        requests.append({'TableName': spec.name, 'GlobalSecondaryIndexUpdates': gsi_updates})
+    return requests
+
+
+def describe_table(dynamodb_conn, table_name):
+    try:
+        return dynamodb_conn.describe_table(TableName=table_name)['Table']
+    except Exception as e:
+        if error_code(e) == 'ResourceNotFoundException':
+            return None
+        raise
+
+
+def table_is_active(description):
+    if description['TableStatus'] != 'ACTIVE':
+        return False
+    # LSIs are built with the table, global indexes report their own status
+    for index in description.get('GlobalSecondaryIndexes', []):
+        if index.get('IndexStatus') != 'ACTIVE':
+            return False
+    return True
+
+
+def wait_for_table(dynamodb_conn, table_name, deadline, poll_interval=2.0):
+    while True:
+        description = describe_table(dynamodb_conn, table_name)
+        if description and table_is_active(description):
+            return description
+        if time.time() + poll_interval > deadline:
+            raise Exception('Table %s did not become ACTIVE in time' % table_name)
+        time.sleep(poll_interval)
+
+
+def apply_table(dynamodb_conn, spec, deadline, on_demand=False):
+    # New tables can be created on demand for a bulk load (see capacity_profile)
+    description = describe_table(dynamodb_conn, spec.name)
+    if description is None:
+        try:
+            dynamodb_conn.create_table(**create_table_request(spec, on_demand))
+            action = 'created'
+        except Exception as e:
+            # Someone else created it in the meantime
+            if error_code(e) != 'ResourceInUseException':
+                raise
+            action = 'unchanged'
+        wait_for_table(dynamodb_conn, spec.name, deadline)
+        return action
+
+    if not table_is_active(description):
+        description = wait_for_table(dynamodb_conn, spec.name, deadline)
+    requests = update_table_requests(spec, description)
+    for request in requests:
+        dynamodb_conn.update_table(**request)
+        wait_for_table(dynamodb_conn, spec.name, deadline)
+    return 'updated (%d changes)' % len(requests) if requests else 'unchanged'
+
+
+def apply_schema(dynamodb_conn, specs=TABLES, wait_timeout=300, on_demand=False):
+    # Bring every table in line with its spec concurrently; returns the
+    # action taken per table
+    deadline = time.time() + wait_timeout
+    with ThreadPoolExecutor(max_workers=len(specs)) as executor:
+        futures = [(spec.name, executor.submit(apply_table, dynamodb_conn, spec, deadline, on_demand))
+                   for spec in specs]
+        return [(table_name, future.result()) for table_name, future in futures]
@@ -0,0 +1,77 @@
+import time
+
+from bulk_loader import BulkLoader
+from table_export import scan_pages
+from table_schema import TABLES_BY_NAME, key_attributes
+
+# Empties tables in place, which is much faster than deleting and
+# recreating them and keeps their indexes. A parallel Scan reads only the
+# key attributes, and the keys go straight back out as DeleteRequest
+# batches through BulkLoader (concurrent, paced and retried like a load).
+#
+# An optional hash key range limits what is deleted. It is a Scan filter,
+# so the whole table is still read, but only matching items are deleted.
+
+
+def key_range_filter(spec, key_from=None, key_to=None):
+    # Scan arguments selecting the items whose hash key lies in the range
+    if key_from is None and key_to is None:
+        return {}
+    attribute_type = spec.hash_key.type
+    if attribute_type == 'N':
+        for value in (key_from, key_to):
+            if value is not None:
+                try:
+                    float(value)
+                except ValueError:
+                    raise Exception('%s has a numeric hash key, "%s" is not a number' % (spec.name, value))
+    values = {}
+    if key_from is not None:
+        values[':from'] = {attribute_type: key_from}
+    if key_to is not None:
+        values[':to'] = {attribute_type: key_to}
+    if key_from is not None and key_to is not None:
+        expression = '#hash BETWEEN :from AND :to'
+    elif key_from is not None:
+        expression = '#hash >= :from'
+    else:
+        expression = '#hash <= :to'
+    return {'FilterExpression': expression, 'ExpressionAttributeValues': values}
+
+
+def keys_only_scan(spec, key_from=None, key_to=None):
+    key_names = key_attributes(spec)
+    placeholders = ['#key%d' % position for position in range(len(key_names))]
+    request = {
+        'ProjectionExpression': ', '.join(placeholders),
+        'ExpressionAttributeNames': dict(zip(placeholders, key_names)),
+    }
+    key_filter = key_range_filter(spec, key_from, key_to)
+    if key_filter:
+        request['ExpressionAttributeNames']['#hash'] = spec.hash_key.name
+        request.update(key_filter)
+    return request
+
+
+def truncate_table(dynamodb_conn, table_name, loader, total_segments=8, key_from=None, key_to=None):
+    spec = TABLES_BY_NAME.get(table_name)
+    if spec is None:
+        raise Exception('Unknown table "%s"' % table_name)
+    scan_request = keys_only_scan(spec, key_from, key_to)
+    for _, keys in scan_pages(dynamodb_conn, table_name, total_segments, **scan_request):
+        loader.submit(table_name, [{'DeleteRequest': {'Key': key}} for key in keys])
+
+
+def truncate_tables(dynamodb_conn, table_names, total_segments=8, threads=8, rate_limiters=None,
+                    key_from=None, key_to=None):
+    started = time.time()
+    with BulkLoader(dynamodb_conn, max_workers=threads, rate_limiters=rate_limiters) as loader:
+        for table_name in table_names:
+            truncate_table(dynamodb_conn, table_name, loader, total_segments, key_from, key_to)
+    elapsed = max(time.time() - started, 1e-9)
+    stats = loader.stats
+    lines = ['Deleted %d items in %.2fs (%.1f items/sec, %d retries)'
+             % (stats.total_items(), elapsed, stats.total_items() / elapsed, stats.retries)]
+    for table_name in table_names:
+        lines.append('  %s: %d items' % (table_name, stats.items.get(table_name, 0)))
+    return '\n'.join(lines)
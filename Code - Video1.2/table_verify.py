@@ -0,0 +1,147 @@
+import decimal
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from bulk_loader import encode_binary
+from seed_sources import read_items, resolve_sources
+from table_export import scan_pages
+from table_schema import TABLES_BY_NAME, key_attributes
+
+# Post-load verification in a single scan. The source items and a parallel
+# Scan of the table are digested at the same time into buckets (by a hash
+# of the key): a bucket's digest is the sum of its items' digests, so it
+# does not depend on order. Every (bucket, key, digest) is also spilled to
+# disk, and only buckets whose digests differ are read back and compared
+# key by key.
+
+DEFAULT_BUCKETS = 256
+
+# Differences listed per kind in the summary
+MAX_REPORTED = 20
+
+DIGEST_MODULUS = 2 ** 128
+
+
+def canonical_number(value):
+    number = decimal.Decimal(str(value)).normalize()
+    return '0' if number.is_zero() else format(number, 'f')
+
+
+def canonical(value):
+    # DynamoDB-JSON with numbers and set order normalized, so the source
+    # and the scanned item digest the same
+    (attribute_type, data), = value.items()
+    if attribute_type == 'N':
+        return {'N': canonical_number(data)}
+    if attribute_type == 'NS':
+        return {'NS': sorted(canonical_number(element) for element in data)}
+    if attribute_type in ('SS', 'BS'):
+        return {attribute_type: sorted(data)}
+    if attribute_type == 'L':
+        return {'L': [canonical(element) for element in data]}
+    if attribute_type == 'M':
+        return {'M': dict((name, canonical(element)) for name, element in data.items())}
+    return {attribute_type: data}
+
+
+def canonical_json(item):
+    return json.dumps(dict((name, canonical(value)) for name, value in item.items()),
+                      sort_keys=True, separators=(',', ':'), default=encode_binary)
+
+
+class Digest(object):
+    # Bucket digests of one side; (bucket, key, digest) lines go to `path`
+
+    def __init__(self, key_names, buckets, path):
+        self.key_names = key_names
+        self.buckets = buckets
+        self.path = path
+        self.sums = [0] * buckets
+        self.counts = [0] * buckets
+
+    def add_all(self, items):
+        with open(self.path, 'w') as spill:
+            for item in items:
+                key = canonical_json(dict((name, item[name]) for name in self.key_names))
+                bucket = zlib.crc32(key.encode('utf-8')) % self.buckets
+                digest = hashlib.md5(canonical_json(item).encode('utf-8')).hexdigest()
+                self.sums[bucket] = (self.sums[bucket] + int(digest, 16)) % DIGEST_MODULUS
+                self.counts[bucket] += 1
+                spill.write('%d\t%s\t%s\n' % (bucket, digest, key))
+        return self
+
+    def entries(self, buckets):
+        # key -> digest for the given buckets only
+        entries = {}
+        with open(self.path) as spill:
+            for line in spill:
+                bucket, digest, key = line.rstrip('\n').split('\t', 2)
+                if int(bucket) in buckets:
+                    entries[key] = digest
+        return entries
+
+
+class TableDiff(object):
+
+    def __init__(self, table_name, source, table):
+        self.table_name = table_name
+        self.source_items = sum(source.counts)
+        self.table_items = sum(table.counts)
+        self.bucket_count = source.buckets
+        self.buckets = [bucket for bucket in range(source.buckets)
+                        if source.sums[bucket] != table.sums[bucket] or source.counts[bucket] != table.counts[bucket]]
+        wanted = set(self.buckets)
+        expected = source.entries(wanted) if wanted else {}
+        actual = table.entries(wanted) if wanted else {}
+        self.missing = sorted(key for key in expected if key not in actual)
+        self.extra = sorted(key for key in actual if key not in expected)
+        self.mismatched = sorted(key for key, digest in expected.items() if key in actual and actual[key] != digest)
+
+    def matches(self):
+        return not (self.missing or self.extra or self.mismatched)
+
+    def summary(self):
+        lines = ['%s: %d source items, %d table items, %d/%d buckets differ: %d missing, %d extra, %d mismatched'
+                 % (self.table_name, self.source_items, self.table_items, len(self.buckets), self.bucket_count,
+                    len(self.missing), len(self.extra), len(self.mismatched))]
+        for kind, keys in (('missing', self.missing), ('extra', self.extra), ('mismatched', self.mismatched)):
+            for key in keys[:MAX_REPORTED]:
+                lines.append('  %s %s' % (kind, key))
+            if len(keys) > MAX_REPORTED:
+                lines.append('  ... and %d more %s' % (len(keys) - MAX_REPORTED, kind))
+        return '\n'.join(lines)
+
+
+def verify_table(dynamodb_conn, table_name, items, total_segments=8, buckets=DEFAULT_BUCKETS, work_dir=None):
+    key_names = key_attributes(TABLES_BY_NAME[table_name])
+    spill_dir = tempfile.mkdtemp(prefix='verify-%s-' % table_name, dir=work_dir)
+    try:
+        source = Digest(key_names, buckets, os.path.join(spill_dir, 'source'))
+        table = Digest(key_names, buckets, os.path.join(spill_dir, 'table'))
+        scanned = (item for _, page in scan_pages(dynamodb_conn, table_name, total_segments) for item in page)
+        # Read the sources while the table is being scanned
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futures = [executor.submit(source.add_all, items), executor.submit(table.add_all, scanned)]
+            for future in futures:
+                future.result()
+        return TableDiff(table_name, source, table)
+    finally:
+        shutil.rmtree(spill_dir, ignore_errors=True)
+
+
+def verify_tables(dynamodb_conn, sources=None, table_names=None, total_segments=8, buckets=DEFAULT_BUCKETS):
+    by_table = {}
+    for table_name, path in resolve_sources(sources):
+        by_table.setdefault(table_name, []).append(path)
+    diffs = []
+    for table_name in sorted(by_table):
+        if table_names and table_name not in table_names:
+            continue
+        items = (item for path in by_table[table_name] for item in read_items(path))
+        diffs.append(verify_table(dynamodb_conn, table_name, items, total_segments, buckets))
+    return diffs
@@ -0,0 +1,35 @@
+from bench_dynamodb import TimedClient, compare, percentile
+
+
+def entry(operation, rate, p99):
+    return {'operation': operation, 'size': 1000, 'threads': 8, 'items_per_second': rate,
+            'latency_ms': {'p99': p99}}
+
+
+def test_percentile_is_nearest_rank():
+    values = [4, 1, 3, 2]
+    assert percentile(values, 0.5) == 2
+    assert percentile(values, 0.99) == 4
+    assert percentile(values, 0.0) == 1
+    assert percentile([], 0.5) == 0.0
+
+
+def test_timed_client_records_every_call():
+    class Client(object):
+        def scan(self, **kwargs):
+            return {'Items': []}
+
+    client = TimedClient(Client())
+    client.scan(TableName='Forum')
+    client.scan(TableName='Thread')
+    assert len(client.take_latencies()) == 2
+    assert client.take_latencies() == []
+
+
+def test_compare_flags_slower_cases_only():
+    baseline = {'results': [entry('upload', 1000.0, 10.0), entry('export', 500.0, 5.0)]}
+    current = {'results': [entry('upload', 850.0, 10.5), entry('export', 480.0, 9.0),
+                           entry('create', 1.0, 1.0)]}
+    regressions = compare(baseline, current, tolerance=0.1)
+    assert regressions == [(('upload', 1000, 8), 'throughput 1000.0 -> 850.0 items/sec'),
+                           (('export', 1000, 8), 'p99 5.00 -> 9.00 ms')]
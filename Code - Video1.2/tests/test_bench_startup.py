@@ -0,0 +1,12 @@
+from bench_startup import best_import_times, check
+
+
+def test_budget_and_deferred_modules_are_checked():
+    times = {'initialize_dynamodb': (500, 90000), 'argparse': (100, 400), 'boto3': (20000, 80000)}
+    assert check(times, budget_ms=75.0) == ['importing initialize_dynamodb took 90.0 ms, over the 75.0 ms budget',
+                                           'boto3 is imported at startup']
+    assert check({'initialize_dynamodb': (500, 9000)}, budget_ms=75.0) == []
+
+
+def test_cli_starts_within_budget():
+    assert check(best_import_times(runs=3)) == []
@@ -0,0 +1,138 @@
+import threading
+
+import pytest
+
+from bulk_loader import BulkLoader, chunk_write_requests
+
+
+class ClientError(Exception):
+
+    def __init__(self, code):
+        Exception.__init__(self, code)
+        self.response = {'Error': {'Code': code}}
+
+
+class FakeClient(object):
+    # Leaves the first `unprocessed` requests of every call unprocessed
+    # for the first `throttled_calls` calls
+
+    def __init__(self, throttled_calls=0, unprocessed=1, error=None):
+        self.throttled_calls = throttled_calls
+        self.unprocessed = unprocessed
+        self.error = error
+        self.calls = 0
+        self.written = []
+        self.lock = threading.Lock()
+
+    def batch_write_item(self, RequestItems):
+        with self.lock:
+            self.calls += 1
+            if self.error is not None:
+                raise self.error
+            (table_name, write_requests), = RequestItems.items()
+            assert len(write_requests) <= 25
+            if self.throttled_calls:
+                self.throttled_calls -= 1
+                self.written += write_requests[self.unprocessed:]
+                return {'UnprocessedItems': {table_name: write_requests[:self.unprocessed]}}
+            self.written += write_requests
+            return {'UnprocessedItems': {}}
+
+
+def items(count):
+    return [{'Id': {'N': str(i)}} for i in range(count)]
+
+
+def test_chunks_at_25_items():
+    batches = list(chunk_write_requests({'PutRequest': {'Item': item}} for item in items(60)))
+    assert [len(batch) for batch in batches] == [25, 25, 10]
+
+
+def test_chunks_at_byte_limit():
+    batches = list(chunk_write_requests(({'PutRequest': {'Item': item}} for item in items(10)),
+                                        max_bytes=100))
+    assert all(len(batch) < 10 for batch in batches)
+    assert sum(len(batch) for batch in batches) == 10
+
+
+def test_unprocessed_items_are_retried():
+    client = FakeClient(throttled_calls=3)
+    with BulkLoader(client, max_workers=1, base_delay=0) as loader:
+        loader.load('ProductCatalog', items(30))
+    assert len(client.written) == 30
+    assert loader.stats.items == {'ProductCatalog': 30}
+    assert loader.stats.retries == 3
+    assert loader.stats.failures == []
+
+
+def test_throttling_errors_are_retried():
+    client = FakeClient()
+    calls = []
+    original = client.batch_write_item
+
+    def batch_write_item(RequestItems):
+        calls.append(1)
+        if len(calls) == 1:
+            raise ClientError('ProvisionedThroughputExceededException')
+        return original(RequestItems=RequestItems)
+
+    client.batch_write_item = batch_write_item
+    with BulkLoader(client, max_workers=1, base_delay=0) as loader:
+        loader.load('Forum', items(3))
+    assert len(client.written) == 3
+    assert loader.stats.retries == 1
+
+
+def test_gives_up_after_max_retries():
+    client = FakeClient(throttled_calls=100, unprocessed=2)
+    loader = BulkLoader(client, max_workers=1, max_retries=3, base_delay=0)
+    loader.load('Thread', items(5))
+    with pytest.raises(Exception) as error:
+        loader.close()
+    assert 'gave up after 3 retries' in str(error.value)
+    assert client.calls == 4
+    assert loader.stats.items == {'Thread': 3}
+    assert loader.stats.failures == [('Thread', 2, 'gave up after 3 retries')]
+
+
+def test_other_errors_fail_the_batch():
+    client = FakeClient(error=ClientError('ValidationException'))
+    loader = BulkLoader(client, max_workers=1, base_delay=0)
+    loader.load('Reply', items(30))
+    with pytest.raises(Exception):
+        loader.close()
+    assert client.calls == 2
+    assert sorted(count for _, count, _ in loader.stats.failures) == [5, 25]
+
+
+def test_unexpected_exceptions_are_recorded():
+    class Broken(BulkLoader):
+        def write_batch(self, table_name, batch):
+            raise ValueError('boom')
+
+    loader = Broken(FakeClient(), max_workers=2)
+    loader.load('Forum', items(30))
+    with pytest.raises(Exception) as error:
+        loader.close()
+    assert 'boom' in str(error.value)
+    assert sum(count for _, count, _ in loader.stats.failures) == 30
+
+
+def test_sizing_errors_fail_the_batch():
+    from rate_limiter import WriteCapacityBucket
+
+    loader = BulkLoader(FakeClient(), max_workers=1, base_delay=0,
+                        rate_limiters={'Forum': WriteCapacityBucket(1000)})
+    loader.load('Forum', [{'Name': {'XX': 'unknown type'}}] * 30)
+    with pytest.raises(Exception):
+        loader.close()
+    assert sum(count for _, count, _ in loader.stats.failures) == 30
+
+
+def test_json_numbers_are_sized():
+    from rate_limiter import WriteCapacityBucket
+
+    client = FakeClient()
+    with BulkLoader(client, max_workers=1, rate_limiters={'ProductCatalog': WriteCapacityBucket(1000)}) as loader:
+        loader.load('ProductCatalog', [{'Id': {'N': i}} for i in range(30)])
+    assert len(client.written) == 30
@@ -0,0 +1,80 @@
+import datetime
+
+from capacity_profile import BulkLoadProfile, bulk_request, next_decrease_allowed, steady_state_request
+from table_schema import TABLES_BY_NAME, create_table_request
+from test_bulk_loader import ClientError
+
+NOW = datetime.datetime(2024, 5, 1, 12, 0, tzinfo=datetime.timezone.utc)
+
+
+def describe(table_name, write_capacity=5, decreases=0, last_decrease=None, on_demand=False):
+    description = dict(create_table_request(TABLES_BY_NAME[table_name]), TableStatus='ACTIVE')
+    description['ProvisionedThroughput'] = {'ReadCapacityUnits': 5, 'WriteCapacityUnits': write_capacity,
+                                            'NumberOfDecreasesToday': decreases,
+                                            'LastDecreaseDateTime': last_decrease}
+    if on_demand:
+        description['BillingModeSummary'] = {'BillingMode': 'PAY_PER_REQUEST'}
+    return description
+
+
+class Client(object):
+
+    def __init__(self, descriptions):
+        self.descriptions = descriptions
+        self.updates = []
+
+    def describe_table(self, TableName):
+        if TableName not in self.descriptions:
+            raise ClientError('ResourceNotFoundException')
+        return {'Table': self.descriptions[TableName]}
+
+    def update_table(self, **request):
+        self.updates.append(request)
+        description = self.descriptions[request['TableName']]
+        if request.get('BillingMode') == 'PAY_PER_REQUEST':
+            description['BillingModeSummary'] = {'BillingMode': 'PAY_PER_REQUEST'}
+        elif request.get('BillingMode') == 'PROVISIONED':
+            description.pop('BillingModeSummary')
+        if 'ProvisionedThroughput' in request:
+            description['ProvisionedThroughput'] = dict(description['ProvisionedThroughput'],
+                                                        **request['ProvisionedThroughput'])
+
+
+def test_decreases_are_limited_after_four_a_day():
+    assert next_decrease_allowed(describe('Forum', decreases=3), NOW) is None
+    recent = describe('Forum', decreases=4, last_decrease=NOW - datetime.timedelta(minutes=20))
+    assert next_decrease_allowed(recent, NOW) == NOW + datetime.timedelta(minutes=40)
+    earlier = describe('Forum', decreases=4, last_decrease=(NOW - datetime.timedelta(hours=2)).timestamp())
+    assert next_decrease_allowed(earlier, NOW) is None
+
+
+def test_capacity_is_only_raised_when_it_can_be_lowered_again():
+    assert bulk_request(describe('Forum'), 'provisioned', 1000, NOW)['ProvisionedThroughput'] == \
+        {'ReadCapacityUnits': 5, 'WriteCapacityUnits': 1000}
+    blocked = describe('Forum', decreases=5, last_decrease=NOW - datetime.timedelta(minutes=5))
+    assert bulk_request(blocked, 'provisioned', 1000, NOW) is None
+
+
+def test_on_demand_tables_go_back_to_provisioned():
+    request = steady_state_request(TABLES_BY_NAME['Reply'], describe('Reply', on_demand=True))
+    assert request['BillingMode'] == 'PROVISIONED'
+    assert request['ProvisionedThroughput'] == {'ReadCapacityUnits': 5, 'WriteCapacityUnits': 5}
+
+
+def test_profile_switches_and_restores_even_when_the_load_fails():
+    client = Client({'Forum': describe('Forum'), 'Thread': describe('Thread')})
+    try:
+        with BulkLoadProfile(client, ['Forum', 'Thread'], 'on-demand', log=lambda message: None):
+            raise ValueError('load failed')
+    except ValueError:
+        pass
+    assert [update.get('BillingMode') for update in client.updates] == \
+        ['PAY_PER_REQUEST', 'PAY_PER_REQUEST', 'PROVISIONED', 'PROVISIONED']
+
+
+def test_provisioned_profile_leaves_on_demand_tables_alone():
+    client = Client({'Forum': describe('Forum', on_demand=True), 'Thread': describe('Thread')})
+    with BulkLoadProfile(client, ['Forum', 'Thread'], 'provisioned', 500, log=lambda message: None):
+        pass
+    assert [(update['TableName'], update['ProvisionedThroughput']['WriteCapacityUnits'])
+            for update in client.updates] == [('Thread', 500), ('Thread', 5)]
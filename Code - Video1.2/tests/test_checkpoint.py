@@ -0,0 +1,76 @@
+import itertools
+import json
+
+import pytest
+
+from bulk_loader import BulkLoader
+from checkpoint import Checkpoint
+from test_bulk_loader import ClientError, FakeClient, items
+
+
+class RejectingClient(FakeClient):
+    # Fails every batch containing one of the rejected ids
+
+    def __init__(self, rejected):
+        FakeClient.__init__(self)
+        self.rejected = set(rejected)
+
+    def batch_write_item(self, RequestItems):
+        (_, write_requests), = RequestItems.items()
+        if any(int(request['PutRequest']['Item']['Id']['N']) in self.rejected for request in write_requests):
+            raise ClientError('ValidationException')
+        return FakeClient.batch_write_item(self, RequestItems)
+
+
+def written_ids(client):
+    return sorted(int(request['PutRequest']['Item']['Id']['N']) for request in client.written)
+
+
+def test_interrupted_load_resumes_after_the_last_finished_batch(tmp_path):
+    path = str(tmp_path / 'checkpoint.json')
+
+    def crashing_items():
+        for item in items(60):
+            if item['Id']['N'] == '55':
+                raise KeyboardInterrupt()
+            yield item
+
+    client = FakeClient()
+    with pytest.raises(KeyboardInterrupt):
+        with BulkLoader(client, max_workers=1, checkpoint=Checkpoint(path)) as loader:
+            loader.load('ProductCatalog', crashing_items(), 'source')
+    assert written_ids(client) == list(range(50))
+    assert json.load(open(path))['sources']['source'] == {'offset': 50, 'pending': []}
+
+    checkpoint = Checkpoint.load(path)
+    with BulkLoader(client, max_workers=1, checkpoint=checkpoint) as loader:
+        loader.submit('ProductCatalog', checkpoint.take_pending('source'), 'source', replay=True)
+        loader.load('ProductCatalog', itertools.islice(items(60), checkpoint.offset('source'), None), 'source')
+    assert written_ids(client) == list(range(60))
+
+
+def test_failed_batches_are_kept_as_pending_and_replayed(tmp_path):
+    path = str(tmp_path / 'checkpoint.json')
+    client = RejectingClient([30])
+    loader = BulkLoader(client, max_workers=2, base_delay=0, checkpoint=Checkpoint(path))
+    loader.load('ProductCatalog', items(60), 'source')
+    with pytest.raises(Exception):
+        loader.close()
+    state = json.load(open(path))['sources']['source']
+    assert state['offset'] == 60
+    assert sorted(int(request['PutRequest']['Item']['Id']['N']) for request in state['pending']) == list(range(25, 50))
+
+    client.rejected.clear()
+    checkpoint = Checkpoint.load(path)
+    with BulkLoader(client, max_workers=2, checkpoint=checkpoint) as loader:
+        loader.submit('ProductCatalog', checkpoint.take_pending('source'), 'source', replay=True)
+        loader.load('ProductCatalog', itertools.islice(items(60), checkpoint.offset('source'), None), 'source')
+    assert written_ids(client) == list(range(60))
+
+
+def test_clean_run_removes_the_checkpoint(tmp_path):
+    path = tmp_path / 'checkpoint.json'
+    checkpoint = Checkpoint(str(path), interval=0)
+    with BulkLoader(FakeClient(), max_workers=2, checkpoint=checkpoint) as loader:
+        loader.load('Forum', items(100))
+    assert not path.exists()
@@ -0,0 +1,121 @@
+import threading
+
+import pytest
+
+from conditional_writer import ConditionalWriter, conditional_put, forum_transactions
+from test_bulk_loader import ClientError
+
+
+class ConditionFailed(ClientError):
+
+    def __init__(self, code, **response):
+        ClientError.__init__(self, code)
+        self.response.update(response)
+
+
+class Client(object):
+    # Stores items by their hash key and enforces attribute_not_exists
+
+    def __init__(self, stored=None, throttle_transactions=0):
+        self.items = dict(stored or {})
+        self.throttle_transactions = throttle_transactions
+        self.transactions = 0
+        self.lock = threading.Lock()
+
+    def key(self, request):
+        return request['TableName'], request['Item'][request['ExpressionAttributeNames']['#hash']]['S']
+
+    def put_item(self, **request):
+        with self.lock:
+            stored = self.items.get(self.key(request))
+            if stored is not None:
+                raise ConditionFailed('ConditionalCheckFailedException', Item=stored)
+            self.items[self.key(request)] = request['Item']
+
+    def transact_write_items(self, TransactItems):
+        with self.lock:
+            self.transactions += 1
+            if self.throttle_transactions:
+                self.throttle_transactions -= 1
+                raise ConditionFailed('TransactionCanceledException', CancellationReasons=[
+                    {'Code': 'ThrottlingError'} for _ in TransactItems])
+            requests = [action['Put'] for action in TransactItems]
+            reasons = [{'Code': 'ConditionalCheckFailed', 'Item': self.items[self.key(request)]}
+                       if self.key(request) in self.items else {'Code': 'None'} for request in requests]
+            if any(reason['Code'] != 'None' for reason in reasons):
+                raise ConditionFailed('TransactionCanceledException', CancellationReasons=reasons)
+            for request in requests:
+                self.items[self.key(request)] = request['Item']
+
+
+def forum(name, threads=0):
+    return {'Name': {'S': name}, 'Threads': {'N': str(threads)}}
+
+
+def thread(forum_name, subject):
+    return {'ForumName': {'S': forum_name}, 'Subject': {'S': subject}}
+
+
+def test_version_attribute_extends_the_condition():
+    request = conditional_put('Forum', dict(forum('A'), Version={'N': '3'}), 'Version')
+    assert request['ConditionExpression'] == 'attribute_not_exists(#hash) OR #version < :version'
+    assert request['ExpressionAttributeValues'] == {':version': {'N': '3'}}
+
+
+def test_forums_are_grouped_with_their_threads():
+    threads = [thread('A', 'T%d' % i) for i in range(150)] + [thread('B', 'X')]
+    transactions = list(forum_transactions([forum('A'), forum('B')], threads))
+    assert [len(actions) for actions in transactions] == [100, 51, 2]
+    assert transactions[0][0] == ('Forum', forum('A'))
+    assert transactions[2] == [('Forum', forum('B')), ('Thread', thread('B', 'X'))]
+
+
+def test_full_forum_groups_are_written_while_threads_stream():
+    read = []
+
+    def threads():
+        for i in range(1000):
+            read.append(i)
+            yield thread('AB'[i % 2], 'T%d' % i)
+
+    transactions = forum_transactions([forum('A'), forum('B')], threads())
+    first = next(transactions)
+    assert len(first) == 100 and first[0] == ('Forum', forum('A'))
+    # A's first transaction fills up with its 99th thread
+    assert len(read) == 197
+    rest = list(transactions)
+    # Each forum's 501 actions make five full transactions and a last one
+    assert [len(actions) for actions in rest] == [100] * 9 + [1, 1]
+    assert rest[-2:] == [[('Thread', thread('A', 'T998'))], [('Thread', thread('B', 'T999'))]]
+
+
+def test_existing_items_are_conflicts_or_unchanged():
+    client = Client({('Forum', 'A'): forum('A'), ('Forum', 'B'): forum('B', 7)})
+    with ConditionalWriter(client, max_workers=2) as writer:
+        writer.put_items('Forum', [forum('A'), forum('B'), forum('C')])
+    assert writer.unchanged == 1
+    assert writer.conflicts == [('Forum', {'Name': {'S': 'B'}})]
+    assert writer.stats.items == {'Forum': 1}
+
+
+def test_transactions_drop_conflicts_and_retry_throttles():
+    client = Client({('Thread', 'A'): dict(thread('A', 'edited'))}, throttle_transactions=1)
+    with ConditionalWriter(client, max_workers=1, base_delay=0) as writer:
+        writer.transact([[('Forum', forum('A', 1)), ('Thread', thread('A', 'seed'))]])
+    assert client.items[('Forum', 'A')] == forum('A', 1)
+    assert client.items[('Thread', 'A')] == thread('A', 'edited')
+    assert writer.conflicts == [('Thread', {'ForumName': {'S': 'A'}, 'Subject': {'S': 'seed'}})]
+    assert writer.stats.retries == 1
+    assert writer.stats.items == {'Forum': 1}
+
+
+def test_other_errors_fail_the_run():
+    class Broken(Client):
+        def put_item(self, **request):
+            raise ClientError('ValidationException')
+
+    writer = ConditionalWriter(Broken(), max_workers=1)
+    writer.put_items('Forum', [forum('A')])
+    with pytest.raises(Exception) as error:
+        writer.close()
+    assert 'Conditional load incomplete' in str(error.value)
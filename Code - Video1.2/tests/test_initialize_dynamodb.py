@@ -0,0 +1,106 @@
+import json
+
+import pytest
+
+import capacity_profile
+import client_factory
+import conditional_writer
+import initialize_dynamodb
+import key_skew
+import memory_dynamodb
+import seed_sources
+from table_schema import TABLES_BY_NAME, create_table_request
+
+SYNTHETIC = 'synthetic:seed=5,products=40,forums=3,threads=20,replies=2'
+
+
+def run(*arguments):
+    initialize_dynamodb.main(initialize_dynamodb.create_parser().parse_args(list(arguments)))
+
+
+def test_parser_choices_match_the_modules():
+    assert initialize_dynamodb.BULK_MODES == capacity_profile.BULK_MODES
+    assert initialize_dynamodb.WRITE_MODES == conditional_writer.WRITE_MODES
+
+
+def test_create_upload_and_verify_against_the_stand_in(capsys):
+    memory_dynamodb.reset()
+    try:
+        common = ['-region', 'us-east-1', '-endpoint-url', 'memory://cli', '-source', SYNTHETIC,
+                  '-progress-interval', '0']
+        run('-operation', 'create-and-upload', '-write-utilization', '0', '-checkpoint', '', *common)
+        run('-operation', 'verify', *common)
+        run('-operation', 'truncate', '-table', 'Reply', '-write-utilization', '0', *common)
+    finally:
+        memory_dynamodb.reset()
+    output = capsys.readouterr().out
+    assert 'Reply: created' in output
+    assert 'ProductCatalog: 40 source items, 40 table items, 0/256 buckets differ' in output
+    assert 'Deleted 15 items' in output
+
+
+def test_resumed_interleaved_load_survives_a_second_interruption(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(key_skew, 'INTERLEAVE_WINDOW', 100)
+    source = tmp_path / 'Thread.ndjson'
+    with open(str(source), 'w') as f:
+        for i in range(1000):
+            f.write(json.dumps({'ForumName': {'S': 'Forum %d' % (i // 40)}, 'Subject': {'S': 'Subject %d' % i}}))
+            f.write('\n')
+    read_items = seed_sources.read_items
+    crash_at = [350, 750]
+
+    def crashing_read_items(path):
+        for position, item in enumerate(read_items(path)):
+            if crash_at and position == crash_at[0]:
+                crash_at.pop(0)
+                raise KeyboardInterrupt()
+            yield item
+
+    monkeypatch.setattr(seed_sources, 'read_items', crashing_read_items)
+    memory_dynamodb.reset()
+    try:
+        dynamodb_conn = client_factory.get_client('us-east-1', 'memory://resume')
+        dynamodb_conn.create_table(**create_table_request(TABLES_BY_NAME['Thread']))
+        options = dict(threads=1, sources=[str(source)], write_utilization=0, engine='sync', max_in_flight=1,
+                       workers=1, endpoint_url='memory://resume', checkpoint_path=str(tmp_path / 'checkpoint.json'),
+                       checkpoint_interval=0, write_mode='overwrite', version_attribute=None)
+        with pytest.raises(KeyboardInterrupt):
+            initialize_dynamodb.load_sources('us-east-1', resume=False, **options)
+        with pytest.raises(KeyboardInterrupt):
+            initialize_dynamodb.load_sources('us-east-1', resume=True, **options)
+        initialize_dynamodb.load_sources('us-east-1', resume=True, **options)
+        assert dynamodb_conn.describe_table(TableName='Thread')['Table']['ItemCount'] == 1000
+    finally:
+        memory_dynamodb.reset()
+
+
+def test_offline_operations_need_no_region(tmp_path, monkeypatch, capsys):
+    import region_resolver
+
+    def no_region(cli_region=None, *args, **kwargs):
+        raise AssertionError('resolve_region called')
+
+    monkeypatch.setattr(region_resolver, 'resolve_region', no_region)
+    run('-operation', 'plan', '-source', SYNTHETIC)
+    run('-operation', 'analyze', '-source', SYNTHETIC)
+    run('-operation', 'generate', '-source', SYNTHETIC, '-output', str(tmp_path))
+    assert sorted(path.name for path in tmp_path.iterdir())
+    assert 'ProductCatalog' in capsys.readouterr().out
+
+
+def test_memory_endpoint_needs_no_region(monkeypatch, capsys):
+    import region_resolver
+
+    def no_region(cli_region=None, *args, **kwargs):
+        raise Exception('Could not determine the AWS region, please pass -region or set AWS_REGION')
+
+    monkeypatch.setattr(region_resolver, 'resolve_region', no_region)
+    monkeypatch.delenv('AWS_REGION', raising=False)
+    monkeypatch.delenv('AWS_DEFAULT_REGION', raising=False)
+    memory_dynamodb.reset()
+    try:
+        run('-operation', 'create-and-upload', '-endpoint-url', 'memory://', '-source', SYNTHETIC,
+            '-write-utilization', '0', '-checkpoint', '', '-progress-interval', '0')
+    finally:
+        memory_dynamodb.reset()
+    assert 'Reply: created' in capsys.readouterr().out
@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+
+from instrumentation import AsyncInstrumentedClient, InstrumentedClient, Metrics
+from test_bulk_loader import ClientError
+
+
+class Client(object):
+
+    def __init__(self):
+        self.requests = []
+
+    def batch_write_item(self, **kwargs):
+        self.requests.append(kwargs)
+        return {'UnprocessedItems': {'Reply': [{'PutRequest': {'Item': {}}}]},
+                'ConsumedCapacity': [{'TableName': 'Reply', 'CapacityUnits': 24.0}]}
+
+    def describe_table(self, **kwargs):
+        self.requests.append(kwargs)
+        raise ClientError('ThrottlingException')
+
+
+def test_calls_request_and_record_consumed_capacity():
+    metrics = Metrics()
+    client = Client()
+    InstrumentedClient(client, metrics).batch_write_item(RequestItems={'Reply': []})
+    assert client.requests[0]['ReturnConsumedCapacity'] == 'TOTAL'
+    recorded = metrics.as_dict()['operations']['batch_write_item']
+    assert recorded['calls'] == 1
+    assert recorded['unprocessed'] == 1
+    assert recorded['consumed_capacity'] == {'Reply': 24.0}
+    assert recorded['request_bytes'] > 0
+
+
+def test_throttles_are_counted_and_reraised():
+    metrics = Metrics()
+    client = Client()
+    with pytest.raises(ClientError):
+        InstrumentedClient(client, metrics).describe_table(TableName='Reply')
+    assert 'ReturnConsumedCapacity' not in client.requests[0]
+    assert metrics.totals()['throttles'] == 1
+    assert metrics.totals()['errors'] == 1
+
+
+def test_prometheus_histogram_is_cumulative():
+    metrics = Metrics()
+    for elapsed in (0.001, 0.02, 20.0):
+        metrics.record('scan', elapsed, 10, {})
+    text = metrics.prometheus()
+    assert 'dynamodb_call_duration_seconds_bucket{operation="scan",le="0.005"} 1\n' in text
+    assert 'dynamodb_call_duration_seconds_bucket{operation="scan",le="10.0"} 2\n' in text
+    assert 'dynamodb_call_duration_seconds_bucket{operation="scan",le="+Inf"} 3\n' in text
+    assert 'dynamodb_request_bytes_total{operation="scan"} 30\n' in text
+
+
+class AsyncClient(object):
+
+    async def batch_write_item(self, **kwargs):
+        await asyncio.sleep(0)
+        return {'ConsumedCapacity': [{'TableName': 'Reply', 'CapacityUnits': 2.0}]}
+
+
+def test_async_calls_are_awaited_and_recorded():
+    metrics = Metrics()
+    client = AsyncInstrumentedClient(AsyncClient(), metrics)
+    response = asyncio.run(client.batch_write_item(RequestItems={'Reply': []}))
+    assert response['ConsumedCapacity'][0]['CapacityUnits'] == 2.0
+    assert metrics.as_dict()['operations']['batch_write_item']['consumed_capacity'] == {'Reply': 2.0}
+
+
+def test_worker_snapshots_merge_into_the_totals():
+    metrics = Metrics()
+    metrics.record('scan', 0.001, 10, {})
+    worker = Metrics()
+    worker.record('scan', 20.0, 5, {'ConsumedCapacity': {'TableName': 'Reply', 'CapacityUnits': 1.5}})
+    worker.record('batch_write_item', 0.02, 7, error=ClientError('ThrottlingException'))
+    metrics.merge(worker.snapshot())
+    recorded = metrics.as_dict()['operations']
+    assert recorded['scan']['calls'] == 2
+    assert recorded['scan']['latency_buckets']['0.005'] == 1
+    assert recorded['scan']['latency_buckets']['+Inf'] == 1
+    assert recorded['scan']['consumed_capacity'] == {'Reply': 1.5}
+    assert metrics.totals()['throttles'] == 1
+    assert metrics.totals()['request_bytes'] == 22
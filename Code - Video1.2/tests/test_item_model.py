@@ -0,0 +1,30 @@
+import pytest
+
+from item_model import RECORD_TYPES, Product, Reply
+from seed_sources import stream_sources
+
+
+def test_seed_items_round_trip():
+    for table_name, items in stream_sources(None):
+        record_class = RECORD_TYPES[table_name]
+        for item in items:
+            assert record_class.from_item(item).to_item() == item
+
+
+def test_serializer_skips_missing_fields():
+    product = Product(Id=101, Title='Book', Authors=['A', 'B'], Price=2.5, InPublication=1)
+    assert product.to_item() == {
+        'Id': {'N': '101'},
+        'Title': {'S': 'Book'},
+        'Authors': {'L': [{'S': 'A'}, {'S': 'B'}]},
+        'Price': {'N': '2.5'},
+        'InPublication': {'BOOL': True},
+    }
+
+
+def test_records_are_slotted():
+    reply = Reply('Forum#Thread', '2015-09-15T19:58:22.947Z')
+    with pytest.raises(AttributeError):
+        reply.Extra = 1
+    with pytest.raises(TypeError):
+        Reply(Unknown=1)
@@ -0,0 +1,70 @@
+import random
+
+from bulk_loader import chunk_write_requests
+from key_skew import SpaceSaving, TableSkew, analyze, interleave, window_start
+
+
+def thread(forum, i):
+    return {'ForumName': {'S': forum}, 'Subject': {'S': 'Subject %d' % i}}
+
+
+def test_counts_are_exact_below_capacity():
+    sketch = SpaceSaving(capacity=10)
+    for key, weight in [('a', 1), ('b', 2), ('a', 3)]:
+        sketch.add(key, weight, 100)
+    assert sketch.top(5) == [('a', 4, 2, 200, 0), ('b', 2, 1, 100, 0)]
+
+
+def test_heavy_hitters_survive_a_long_tail():
+    stream = [('hot', 1)] * 3000 + [('warm', 1)] * 1000 + [('key %d' % i, 1) for i in range(6000)]
+    random.Random(3).shuffle(stream)
+    sketch = SpaceSaving(capacity=50)
+    for key, weight in stream:
+        sketch.add(key, weight, 10)
+    (hot, hot_weight, _, _, hot_error), (warm, warm_weight, _, _, _) = sketch.top(2)
+    assert (hot, warm) == ('hot', 'warm')
+    # Upper bounds, off by at most the total weight / capacity
+    assert 3000 <= hot_weight <= 3000 + len(stream) / 50
+    assert hot_weight - hot_error <= 3000
+    assert len(sketch.counters) == 50
+
+
+def test_interleave_takes_turns_within_each_window():
+    items = [thread('Amazon DynamoDB', i) for i in range(6)] + [thread('Amazon S3', i) for i in range(2)]
+    order = [(item['ForumName']['S'][7:], item['Subject']['S'][-1]) for item in interleave(items, 'ForumName', 4)]
+    # The first window only holds DynamoDB threads
+    assert order == [('DynamoDB', '0'), ('DynamoDB', '1'), ('DynamoDB', '2'), ('DynamoDB', '3'),
+                     ('DynamoDB', '4'), ('S3', '0'), ('DynamoDB', '5'), ('S3', '1')]
+    assert window_start(6, 4) == 4 and window_start(8, 4) == 8
+
+
+def test_batches_spread_over_hash_keys():
+    items = [thread('Forum %d' % forum, i) for forum in range(10) for i in range(50)]
+    batch = next(chunk_write_requests({'PutRequest': {'Item': item}} for item in interleave(items, 'ForumName')))
+    assert len(set(request['PutRequest']['Item']['ForumName']['S'] for request in batch)) == 10
+
+
+def test_hot_keys_are_reported_at_the_load_rate():
+    skew = TableSkew('Thread')
+    for item in [thread('Hot', i) for i in range(1800)] + [thread('Cold %d' % i, i) for i in range(200)]:
+        skew.add(item)
+    assert [entry[0] for entry in skew.hot_keys(1000)] == []
+    assert [entry[0] for entry in skew.hot_keys(2000)] == ['Hot']
+    summary = skew.summary(2000)
+    assert "'Hot': 1800 items" in summary
+    assert "HOT 'Hot': 1800 WCU/s of 2000 WCU/s" in summary
+    # A hot key that is written in under a second is not worth reporting
+    small = TableSkew('Thread')
+    for item in [thread('Hot', i) for i in range(90)] + [thread('Cold %d' % i, i) for i in range(10)]:
+        small.add(item)
+    assert small.hot_keys(40000) == []
+
+
+def test_analyze_reads_every_table():
+    skews = analyze(['synthetic:seed=2,products=20,forums=3,threads=40,replies=2,skew=2'])
+    assert [skew.table_name for skew in skews] == ['Forum', 'ProductCatalog', 'Reply', 'Thread']
+    threads = skews[-1]
+    assert threads.items == 40
+    assert sum(entry[2] for entry in threads.sketch.top(10)) == 40
+    # Zipf-skewed forums: the first one holds most threads
+    assert threads.sketch.top(1)[0][2] > 40 / 3
@@ -0,0 +1,39 @@
+import pytest
+
+from bulk_loader import BulkLoader
+from load_plan import TablePlan, format_plan
+from test_bulk_loader import FakeClient
+
+
+def reply(i, message_size=10):
+    return {'Id': {'S': 'Forum#Thread'}, 'ReplyDateTime': {'S': '2015-01-%02d' % (i + 1)},
+            'PostedBy': {'S': 'User A'}, 'Message': {'S': 'x' * message_size}}
+
+
+def test_plan_counts_requests_and_index_capacity():
+    plan = TablePlan('Reply')
+    plan.add([reply(i) for i in range(30)])
+    assert plan.items == 30
+    assert plan.requests == 2
+    # One unit for the item and one for its PostedBy-Index entry
+    assert plan.capacity_units == 60
+    assert plan.minutes_at(1.0) == 60 / 5.0 / 60.0
+
+
+def test_plan_reports_oversized_items():
+    plan = TablePlan('Reply')
+    plan.add([reply(0), reply(1, 500 * 1024)])
+    assert plan.oversized == 1
+    assert plan.requests == 1
+    assert '"ReplyDateTime": {"S": "2015-01-02"}' in format_plan([plan])
+
+
+def test_loader_fails_oversized_items_without_sending_them():
+    client = FakeClient()
+    loader = BulkLoader(client, max_workers=1)
+    loader.load('Reply', [reply(0), reply(1, 500 * 1024), reply(2)])
+    with pytest.raises(Exception) as error:
+        loader.close()
+    assert 'over the 400 KB item size limit' in str(error.value)
+    assert len(client.written) == 2
+    assert loader.stats.items == {'Reply': 2}
@@ -0,0 +1,237 @@
+import queue
+import threading
+import time
+
+import pytest
+
+import client_factory
+import memory_dynamodb
+from bulk_loader import BulkLoader, error_code
+from rate_limiter import provisioned_write_limiters
+from seed_sources import read_items, resolve_sources
+from sharded_loader import shard_for, worker_main
+from table_schema import TABLES, TABLES_BY_NAME, apply_schema, create_table_request
+from table_verify import verify_tables
+
+SYNTHETIC = 'synthetic:seed=3,products=60,forums=4,threads=30,replies=3'
+
+
+@pytest.fixture(autouse=True)
+def fresh_databases():
+    memory_dynamodb.reset()
+    yield
+    memory_dynamodb.reset()
+
+
+def connect(options=''):
+    dynamodb_conn = client_factory.get_client('us-east-1', 'memory://test' + options)
+    for spec in TABLES:
+        dynamodb_conn.create_table(**create_table_request(spec))
+    return dynamodb_conn
+
+
+def reply(thread, when, posted_by):
+    return {'Id': {'S': thread}, 'ReplyDateTime': {'S': when}, 'PostedBy': {'S': posted_by},
+            'Message': {'S': 'reply at %s' % when}}
+
+
+def product(i):
+    return {'Id': {'N': str(i)}, 'Title': {'S': 'Book %d' % i}}
+
+
+def test_create_upload_and_verify_cycle():
+    dynamodb_conn = client_factory.get_client('us-east-1', 'memory://cycle')
+    assert [action for _, action in apply_schema(dynamodb_conn, TABLES)] == ['created'] * len(TABLES)
+    assert [action for _, action in apply_schema(dynamodb_conn, TABLES)] == ['unchanged'] * len(TABLES)
+    with BulkLoader(dynamodb_conn, max_workers=4) as loader:
+        for table_name, path in resolve_sources([SYNTHETIC]):
+            loader.load(table_name, read_items(path))
+    diffs = verify_tables(dynamodb_conn, [SYNTHETIC], total_segments=4)
+    assert [diff.table_name for diff in diffs] == sorted(TABLES_BY_NAME)
+    assert all(diff.matches() for diff in diffs)
+
+    dynamodb_conn.delete_item(TableName='ProductCatalog', Key={'Id': {'N': '101'}})
+    diff, = verify_tables(dynamodb_conn, ['ProductCatalog=' + SYNTHETIC], total_segments=4)
+    assert diff.missing == ['{"Id":{"N":"101"}}']
+
+
+def test_range_queries_are_sorted_and_paginated():
+    dynamodb_conn = connect()
+    items = [reply('t1', '2015-09-%02d' % day, 'User %d' % (day % 3)) for day in (5, 1, 9, 3, 7)]
+    items.append(reply('t2', '2015-09-04', 'User 0'))
+    dynamodb_conn.batch_write_item(RequestItems={'Reply': [{'PutRequest': {'Item': item}} for item in items]})
+
+    request = {'TableName': 'Reply', 'KeyConditionExpression': 'Id = :id AND ReplyDateTime BETWEEN :from AND :to',
+               'ExpressionAttributeValues': {':id': {'S': 't1'}, ':from': {'S': '2015-09-02'},
+                                             ':to': {'S': '2015-09-08'}}}
+    found = dynamodb_conn.query(**request)['Items']
+    assert [item['ReplyDateTime']['S'] for item in found] == ['2015-09-03', '2015-09-05', '2015-09-07']
+
+    pages = []
+    start_key = None
+    while True:
+        page = dynamodb_conn.query(Limit=2, ScanIndexForward=False,
+                                   **dict(request, **({'ExclusiveStartKey': start_key} if start_key else {})))
+        pages.append([item['ReplyDateTime']['S'] for item in page['Items']])
+        start_key = page.get('LastEvaluatedKey')
+        if not start_key:
+            break
+    assert pages == [['2015-09-07', '2015-09-05'], ['2015-09-03']]
+
+
+def test_local_index_query_and_projection():
+    dynamodb_conn = connect()
+    items = [reply('t1', '2015-09-0%d' % day, posted_by) for day, posted_by in
+             ((1, 'User B'), (2, 'User A'), (3, 'User B'), (4, 'User C'))]
+    dynamodb_conn.batch_write_item(RequestItems={'Reply': [{'PutRequest': {'Item': item}} for item in items]})
+    # Rewriting an item moves its index entry
+    dynamodb_conn.put_item(TableName='Reply', Item=reply('t1', '2015-09-04', 'User B'))
+
+    found = dynamodb_conn.query(TableName='Reply', IndexName='PostedBy-Index',
+                                KeyConditionExpression='Id = :id AND begins_with(PostedBy, :user)',
+                                ExpressionAttributeValues={':id': {'S': 't1'}, ':user': {'S': 'User B'}})['Items']
+    # KEYS_ONLY index: table and index keys, sorted by the index key
+    assert found == [dict((name, item[name]) for name in ('Id', 'ReplyDateTime', 'PostedBy'))
+                     for item in [items[0], items[2], reply('t1', '2015-09-04', 'User B')]]
+    counted = dynamodb_conn.query(TableName='Reply', IndexName='PostedBy-Index', Select='COUNT',
+                                  KeyConditionExpression='Id = :id AND PostedBy < :user',
+                                  ExpressionAttributeValues={':id': {'S': 't1'}, ':user': {'S': 'User B'}})
+    assert counted['Count'] == 1 and 'Items' not in counted
+
+
+def test_segments_partition_the_table():
+    dynamodb_conn = connect()
+    for start in range(0, 100, 25):
+        dynamodb_conn.batch_write_item(RequestItems={'ProductCatalog': [
+            {'PutRequest': {'Item': product(i)}} for i in range(start, start + 25)]})
+    seen = []
+    for segment in range(3):
+        start_key = None
+        while True:
+            page = dynamodb_conn.scan(TableName='ProductCatalog', Segment=segment, TotalSegments=3, Limit=7,
+                                      ProjectionExpression='Id',
+                                      **({'ExclusiveStartKey': start_key} if start_key else {}))
+            seen += [int(item['Id']['N']) for item in page['Items']]
+            assert all(list(item) == ['Id'] for item in page['Items'])
+            start_key = page.get('LastEvaluatedKey')
+            if not start_key:
+                break
+    assert sorted(seen) == list(range(100))
+
+
+def test_conditions_and_transactions():
+    dynamodb_conn = connect()
+    dynamodb_conn.put_item(TableName='ProductCatalog', Item=dict(product(1), Version={'N': '2'}))
+    condition = {'ConditionExpression': 'attribute_not_exists(Id) OR #version < :version',
+                 'ExpressionAttributeNames': {'#version': 'Version'},
+                 'ReturnValuesOnConditionCheckFailure': 'ALL_OLD'}
+    with pytest.raises(Exception) as failed:
+        dynamodb_conn.put_item(TableName='ProductCatalog', Item=dict(product(1), Version={'N': '1'}),
+                               ExpressionAttributeValues={':version': {'N': '1'}}, **condition)
+    assert error_code(failed.value) == 'ConditionalCheckFailedException'
+    assert failed.value.response['Item']['Version'] == {'N': '2'}
+    dynamodb_conn.put_item(TableName='ProductCatalog', Item=dict(product(1), Version={'N': '3'}),
+                           ExpressionAttributeValues={':version': {'N': '3'}}, **condition)
+
+    with pytest.raises(Exception) as failed:
+        dynamodb_conn.transact_write_items(TransactItems=[
+            {'Put': {'TableName': 'ProductCatalog', 'Item': product(2),
+                     'ConditionExpression': 'attribute_not_exists(Id)'}},
+            {'Put': {'TableName': 'ProductCatalog', 'Item': product(1),
+                     'ConditionExpression': 'attribute_not_exists(Id)'}}])
+    assert [reason['Code'] for reason in failed.value.response['CancellationReasons']] == \
+        ['None', 'ConditionalCheckFailed']
+    assert 'Item' not in dynamodb_conn.get_item(TableName='ProductCatalog', Key={'Id': {'N': '2'}})
+
+
+def test_unprocessed_items_are_retried_deterministically():
+    dynamodb_conn = connect('?unprocessed_rate=0.5&seed=4')
+    with BulkLoader(dynamodb_conn, max_workers=1, base_delay=0) as loader:
+        loader.load('ProductCatalog', (product(i) for i in range(100)))
+    retries = loader.stats.retries
+    assert retries > 0
+    assert dynamodb_conn.describe_table(TableName='ProductCatalog')['Table']['ItemCount'] == 100
+
+    # Same seed, same sequence of unprocessed items
+    memory_dynamodb.reset()
+    dynamodb_conn = connect('?unprocessed_rate=0.5&seed=4')
+    with BulkLoader(dynamodb_conn, max_workers=1, base_delay=0) as loader:
+        loader.load('ProductCatalog', (product(i) for i in range(100)))
+    assert loader.stats.retries == retries
+
+
+def test_throttled_calls_are_retried_then_given_up():
+    dynamodb_conn = connect('?throttle_calls=2')
+    with BulkLoader(dynamodb_conn, max_workers=1, base_delay=0) as loader:
+        loader.load('ProductCatalog', (product(i) for i in range(10)))
+    assert loader.stats.retries == 2
+
+    dynamodb_conn.throttle_calls = 5
+    loader = BulkLoader(dynamodb_conn, max_workers=1, max_retries=3, base_delay=0)
+    loader.load('ProductCatalog', [product(11)])
+    with pytest.raises(Exception, match='gave up after 3 retries'):
+        loader.close()
+
+
+def test_capacity_is_enforced_per_second():
+    dynamodb_conn = connect('?enforce_capacity=1')
+    # ProductCatalog has 5 WCU, so one second's worth of writes fits
+    response = dynamodb_conn.batch_write_item(RequestItems={'ProductCatalog': [
+        {'PutRequest': {'Item': product(i)}} for i in range(8)]}, ReturnConsumedCapacity='TOTAL')
+    assert len(response['UnprocessedItems']['ProductCatalog']) == 3
+    assert response['ConsumedCapacity'] == [{'TableName': 'ProductCatalog', 'CapacityUnits': 5.0}]
+
+
+def test_write_limiter_keeps_to_provisioned_capacity():
+    dynamodb_conn = connect('?enforce_capacity=1')
+    dynamodb_conn.update_table(TableName='ProductCatalog',
+                               ProvisionedThroughput={'ReadCapacityUnits': 5, 'WriteCapacityUnits': 200})
+    limiters = provisioned_write_limiters(dynamodb_conn, ['ProductCatalog'], 0.9)
+    started = time.time()
+    with BulkLoader(dynamodb_conn, max_workers=2, base_delay=0.01, rate_limiters=limiters) as loader:
+        loader.load('ProductCatalog', (product(i) for i in range(300)))
+    # 180 units of burst, then 120 more at 180 per second
+    assert time.time() - started >= 0.6
+    assert loader.stats.total_items() == 300
+    assert loader.stats.retries == 0
+
+
+def test_sharded_workers_write_disjoint_hash_keys():
+    connect()
+    endpoint_url = 'memory://test'
+    workers = 3
+    work_queues = [queue.Queue() for _ in range(workers)]
+    result_queue = queue.Queue()
+    threads = [threading.Thread(target=worker_main, args=(worker_id, 'us-east-1', work_queues[worker_id],
+                                                          result_queue, 2, 0, endpoint_url, {}))
+               for worker_id in range(workers)]
+    for thread in threads:
+        thread.start()
+    items = [reply('t%d' % (i % 7), '2015-09-%02d' % (i + 1), 'User %d' % i) for i in range(28)]
+    for item in items:
+        worker_id = shard_for('Reply', item, workers)
+        assert worker_id == shard_for('Reply', dict(item, ReplyDateTime={'S': 'other'}), workers)
+        work_queues[worker_id].put(('Reply', [{'PutRequest': {'Item': item}}]))
+    for work_queue in work_queues:
+        work_queue.put(None)
+    for thread in threads:
+        thread.join()
+    results = sorted(result_queue.get() for _ in range(workers))
+    assert sum(result[1].get('Reply', 0) for result in results) == 28
+    assert all(result[4] == [] for result in results)
+    # Each worker counts its own calls for the parent to merge
+    assert sum(result[5]['batch_write_item'].calls for result in results if result[1]) >= 2
+
+    dynamodb_conn = client_factory.get_client('us-east-1', endpoint_url)
+    stored = dynamodb_conn.scan(TableName='Reply')['Items']
+    assert sorted(stored, key=lambda item: item['ReplyDateTime']['S']) == items
+
+
+def test_unsupported_expressions_are_rejected():
+    dynamodb_conn = connect()
+    with pytest.raises(Exception) as failed:
+        dynamodb_conn.scan(TableName='ProductCatalog', FilterExpression='size(Title) > :n',
+                           ExpressionAttributeValues={':n': {'N': '3'}})
+    assert error_code(failed.value) == 'ValidationException'
+    with pytest.raises(Exception, match='Unknown memory:// option'):
+        client_factory.get_client('us-east-1', 'memory://other?latency=5')
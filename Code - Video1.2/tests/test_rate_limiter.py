@@ -0,0 +1,31 @@
+from rate_limiter import write_limiter
+
+REPLY = {
+    'KeySchema': [{'AttributeName': 'Id', 'KeyType': 'HASH'},
+                  {'AttributeName': 'ReplyDateTime', 'KeyType': 'RANGE'}],
+    'LocalSecondaryIndexes': [{
+        'IndexName': 'PostedBy-Index',
+        'KeySchema': [{'AttributeName': 'Id', 'KeyType': 'HASH'},
+                      {'AttributeName': 'PostedBy', 'KeyType': 'RANGE'}],
+        'Projection': {'ProjectionType': 'KEYS_ONLY'},
+    }],
+    'ProvisionedThroughput': {'ReadCapacityUnits': 5, 'WriteCapacityUnits': 5},
+}
+
+
+def put(item):
+    return {'PutRequest': {'Item': item}}
+
+
+def test_on_demand_tables_are_not_paced():
+    assert write_limiter({'KeySchema': [], 'ProvisionedThroughput': {'WriteCapacityUnits': 0}}) is None
+
+
+def test_local_index_writes_are_charged():
+    limiter = write_limiter(REPLY)
+    reply = {'Id': {'S': 'Forum#Thread'}, 'ReplyDateTime': {'S': '2015-09-15'}, 'Message': {'S': 'x' * 1500}}
+    assert limiter.write_cost([put(reply)]) == 2
+    reply['PostedBy'] = {'S': 'User A'}
+    # 2 WCU item plus a small keys-only index entry
+    assert limiter.write_cost([put(reply)]) == 3
+    assert limiter.write_cost([{'DeleteRequest': {'Key': {}}}]) == 2
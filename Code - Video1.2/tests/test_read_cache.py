@@ -0,0 +1,134 @@
+import threading
+import time
+
+from read_cache import ReadThroughCache
+
+
+class GetClient(object):
+
+    def __init__(self, items, unprocessed_calls=0):
+        self.items = dict((item['Id']['N'], item) for item in items)
+        self.unprocessed_calls = unprocessed_calls
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def batch_get_item(self, RequestItems):
+        (table_name, request), = RequestItems.items()
+        keys = request['Keys']
+        with self.lock:
+            self.calls.append(len(keys))
+            if self.unprocessed_calls:
+                self.unprocessed_calls -= 1
+                keys, unprocessed = keys[:1], keys[1:]
+            else:
+                unprocessed = []
+        found = [self.items[key['Id']['N']] for key in keys if key['Id']['N'] in self.items]
+        response = {'Responses': {table_name: found}}
+        if unprocessed:
+            response['UnprocessedKeys'] = {table_name: {'Keys': unprocessed}}
+        return response
+
+    def put_item(self, TableName, Item):
+        self.items[Item['Id']['N']] = Item
+
+
+def product(i, title='Book'):
+    return {'Id': {'N': str(i)}, 'Title': {'S': title}}
+
+
+def key(i):
+    return {'Id': {'N': str(i)}}
+
+
+def test_hits_and_cached_misses_cost_no_reads():
+    client = GetClient([product(1)])
+    cache = ReadThroughCache(client, 'ProductCatalog', batch_window=0)
+    assert cache.get(key(1)) == product(1)
+    assert cache.get(key(2)) is None
+    assert cache.get(key(1)) == product(1)
+    assert cache.get(key(2)) is None
+    assert client.calls == [1, 1]
+
+
+def test_concurrent_misses_share_one_batch_get():
+    client = GetClient([product(i) for i in range(50)])
+    cache = ReadThroughCache(client, 'ProductCatalog', batch_window=0.05)
+    results = {}
+
+    def read(i):
+        results[i] = cache.get(key(i))
+
+    threads = [threading.Thread(target=read, args=(i,)) for i in range(50)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == dict((i, product(i)) for i in range(50))
+    assert sum(client.calls) == 50
+    assert len(client.calls) < 5
+
+
+def test_unprocessed_keys_are_retried():
+    client = GetClient([product(i) for i in range(5)], unprocessed_calls=2)
+    cache = ReadThroughCache(client, 'ProductCatalog', batch_window=0)
+    assert cache.get_many([key(i) for i in range(5)]) == [product(i) for i in range(5)]
+
+
+def test_lru_and_ttl_eviction():
+    client = GetClient([product(i) for i in range(3)])
+    cache = ReadThroughCache(client, 'ProductCatalog', max_entries=2, ttl=0.05, batch_window=0)
+    cache.get_many([key(0), key(1), key(2)])
+    assert len(cache.entries) == 2
+    time.sleep(0.06)
+    cache.get(key(2))
+    assert client.calls == [3, 1]
+
+
+def test_writes_through_the_cache_invalidate():
+    client = GetClient([product(1)])
+    cache = ReadThroughCache(client, 'ProductCatalog', batch_window=0)
+    cache.get(key(1))
+    cache.put_item(product(1, title='New title'))
+    assert cache.get(key(1)) == product(1, title='New title')
+
+
+class BlockingClient(GetClient):
+    # The first BatchGetItem waits until `release` is set
+
+    def __init__(self, items):
+        GetClient.__init__(self, items)
+        self.first_call = threading.Event()
+        self.release = threading.Event()
+
+    def batch_get_item(self, RequestItems):
+        if not self.first_call.is_set():
+            self.first_call.set()
+            self.release.wait(5)
+        return GetClient.batch_get_item(self, RequestItems)
+
+
+def test_leader_hands_over_after_taking_its_batch():
+    client = BlockingClient([product(i) for i in range(4)])
+    cache = ReadThroughCache(client, 'ProductCatalog', batch_window=0)
+    results = {}
+
+    def read(*ids):
+        results[ids] = cache.get_many([key(i) for i in ids])
+
+    leader = threading.Thread(target=read, args=(0, 1))
+    leader.start()
+    assert client.first_call.wait(5)
+    # Keys that miss while the first fetch is stuck do not wait for it,
+    # and a key already being fetched is not fetched twice
+    followers = [threading.Thread(target=read, args=ids) for ids in ((2,), (3, 1))]
+    for thread in followers:
+        thread.start()
+        thread.join(0.5)
+    assert results[(2,)] == [product(2)]
+    assert (0, 1) not in results and (3, 1) not in results
+    client.release.set()
+    for thread in [leader] + followers:
+        thread.join(5)
+    assert results[(0, 1)] == [product(0), product(1)]
+    assert results[(3, 1)] == [product(3), product(1)]
+    assert sorted(client.calls) == [1, 1, 2]
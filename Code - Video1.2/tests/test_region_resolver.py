@@ -0,0 +1,68 @@
+import io
+import json
+import time
+
+import pytest
+
+import region_resolver
+
+
+@pytest.fixture(autouse=True)
+def clean_environment(monkeypatch, tmp_path):
+    for name in ('AWS_REGION', 'AWS_DEFAULT_REGION', 'AWS_PROFILE', 'AWS_DEFAULT_PROFILE'):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv('AWS_CONFIG_FILE', str(tmp_path / 'config'))
+    monkeypatch.setattr(region_resolver, 'resolved_region', None)
+    monkeypatch.setattr(region_resolver, 'urlopen', fail_urlopen)
+
+
+def fail_urlopen(request, timeout):
+    raise AssertionError('IMDS must not be called')
+
+
+def test_cli_wins():
+    assert region_resolver.resolve_region('eu-west-1') == 'eu-west-1'
+
+
+def test_environment(monkeypatch, tmp_path):
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-west-2')
+    assert region_resolver.resolve_region(cache_path=str(tmp_path / 'cache')) == 'us-west-2'
+
+
+def test_named_profile(monkeypatch, tmp_path):
+    (tmp_path / 'config').write_text('[default]\nregion = us-east-1\n[profile ci]\nregion = ap-south-1\n')
+    monkeypatch.setenv('AWS_PROFILE', 'ci')
+    assert region_resolver.resolve_region(cache_path=str(tmp_path / 'cache')) == 'ap-south-1'
+
+
+def test_expired_cache_falls_back_to_imds(monkeypatch, tmp_path):
+    cache_path = tmp_path / 'cache' / 'region.json'
+    cache_path.parent.mkdir()
+    cache_path.write_text(json.dumps({'region': 'old-region', 'expires': time.time() - 1}))
+    requests = []
+
+    def urlopen(request, timeout):
+        requests.append((request.get_method(), request.full_url, timeout))
+        if request.full_url == region_resolver.IMDS_TOKEN_URL:
+            return io.BytesIO(b'token')
+        assert request.get_header('X-aws-ec2-metadata-token') == 'token'
+        return io.BytesIO(json.dumps({'region': 'sa-east-1'}).encode('utf-8'))
+
+    monkeypatch.setattr(region_resolver, 'urlopen', urlopen)
+    assert region_resolver.resolve_region(cache_path=str(cache_path), imds_timeout=0.5) == 'sa-east-1'
+    assert [method for method, _, _ in requests] == ['PUT', 'GET']
+    assert all(timeout == 0.5 for _, _, timeout in requests)
+
+    # The next process reads the fresh cache instead of calling IMDS
+    monkeypatch.setattr(region_resolver, 'resolved_region', None)
+    monkeypatch.setattr(region_resolver, 'urlopen', fail_urlopen)
+    assert region_resolver.resolve_region(cache_path=str(cache_path)) == 'sa-east-1'
+
+
+def test_no_region_anywhere(monkeypatch, tmp_path):
+    def unreachable(request, timeout):
+        raise IOError('timed out')
+
+    monkeypatch.setattr(region_resolver, 'urlopen', unreachable)
+    with pytest.raises(Exception):
+        region_resolver.resolve_region(cache_path=str(tmp_path / 'cache'))
@@ -0,0 +1,48 @@
+import gzip
+import json
+
+from seed_generator import SyntheticDataset, parse_options
+from seed_sources import read_items, resolve_sources
+
+OPTIONS = 'seed=3,products=50,forums=5,threads=200,replies=4'
+
+
+def test_same_seed_gives_the_same_items():
+    for table_name, path in resolve_sources(['synthetic:' + OPTIONS]):
+        assert list(read_items(path)) == list(read_items(path))
+
+
+def test_sources_cover_every_table_or_the_named_one():
+    assert [table for table, _ in resolve_sources(['synthetic:' + OPTIONS])] == \
+        ['ProductCatalog', 'Forum', 'Thread', 'Reply']
+    assert [table for table, _ in resolve_sources(['Reply=synthetic:' + OPTIONS])] == ['Reply']
+
+
+def test_forum_counters_match_threads_and_replies():
+    dataset = SyntheticDataset(**parse_options(OPTIONS))
+    threads = list(dataset.threads())
+    replies = list(dataset.replies())
+    for forum in dataset.forums():
+        forum_threads = [thread for thread in threads if thread.ForumName == forum.Name]
+        assert forum.Threads == len(forum_threads)
+        assert forum.Messages == len(forum_threads) + sum(thread.Replies for thread in forum_threads)
+    assert len(replies) == sum(thread.Replies for thread in threads)
+
+
+def test_reply_keys_are_unique_and_forum_zero_is_hottest():
+    dataset = SyntheticDataset(**parse_options(OPTIONS))
+    keys = [(reply.Id, reply.ReplyDateTime) for reply in dataset.replies()]
+    assert len(keys) == len(set(keys))
+    forums = list(dataset.forums())
+    assert forums[0].Threads == max(forum.Threads for forum in forums)
+
+
+def test_generate_writes_loadable_files(tmp_path):
+    from table_export import write_items
+
+    for table_name, path in resolve_sources(['Forum=synthetic:' + OPTIONS]):
+        write_items(str(tmp_path / (table_name + '.ndjson.gz')), read_items(path))
+    with gzip.open(str(tmp_path / 'Forum.ndjson.gz'), 'rt') as f:
+        items = [json.loads(line) for line in f]
+    assert items == list(read_items(str(tmp_path / 'Forum.ndjson.gz')))
+    assert items == list(read_items('synthetic:Forum?' + OPTIONS))
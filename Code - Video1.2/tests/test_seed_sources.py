@@ -0,0 +1,30 @@
+import gzip
+
+from seed_sources import read_items, resolve_sources
+
+
+def test_csv_columns_are_typed(tmp_path):
+    path = tmp_path / 'Forum.csv.gz'
+    with gzip.open(str(path), 'wt') as f:
+        f.write('Name:S,Category,Threads:N,Tags:SS,Active:BOOL,Logo:B\n')
+        f.write('X,Cat,3,"[""a"",""b""]",true,aGVsbG8=\n')
+        f.write('Y,,,,,\n')
+    assert list(read_items(str(path))) == [
+        {'Name': {'S': 'X'}, 'Category': {'S': 'Cat'}, 'Threads': {'N': '3'},
+         'Tags': {'SS': ['a', 'b']}, 'Active': {'BOOL': True}, 'Logo': {'B': b'hello'}},
+        {'Name': {'S': 'Y'}},
+    ]
+
+
+def test_default_sources_are_the_bundled_seed_data():
+    tables = [table_name for table_name, _ in resolve_sources(None)]
+    assert tables == ['Forum', 'ProductCatalog', 'Reply', 'Thread']
+
+
+def test_binary_items_can_be_batched(tmp_path):
+    from bulk_loader import chunk_write_requests
+
+    path = tmp_path / 'Forum.csv'
+    path.write_text('Name,Logo:B\nX,aGVsbG8=\n')
+    batches = list(chunk_write_requests({'PutRequest': {'Item': item}} for item in read_items(str(path))))
+    assert len(batches) == 1
@@ -0,0 +1,59 @@
+import gzip
+import json
+
+from seed_sources import read_items
+from table_export import export_summary, export_table, export_tables, scan_pages
+
+
+class ScanClient(object):
+    # Serves `items` split across segments, two items per page
+
+    def __init__(self, items, fail_segment=None):
+        self.items = items
+        self.fail_segment = fail_segment
+
+    def scan(self, TableName, Segment, TotalSegments, ExclusiveStartKey=None):
+        if Segment == self.fail_segment:
+            raise ValueError('segment %d failed' % Segment)
+        mine = self.items[Segment::TotalSegments]
+        start = ExclusiveStartKey['Offset'] if ExclusiveStartKey else 0
+        response = {'Items': mine[start:start + 2]}
+        if start + 2 < len(mine):
+            response['LastEvaluatedKey'] = {'Offset': start + 2}
+        return response
+
+
+def items(count):
+    return [{'Id': {'N': str(i)}, 'Logo': {'B': b'\x00\x01'}} for i in range(count)]
+
+
+def test_every_page_of_every_segment_is_returned():
+    seen = [item for _, page in scan_pages(ScanClient(items(25)), 'ProductCatalog', total_segments=4)
+            for item in page]
+    assert sorted(int(item['Id']['N']) for item in seen) == list(range(25))
+
+
+def test_segment_errors_are_raised():
+    try:
+        list(scan_pages(ScanClient(items(25), fail_segment=2), 'ProductCatalog', total_segments=4))
+    except ValueError as e:
+        assert 'segment 2' in str(e)
+    else:
+        assert False, 'expected the segment error'
+
+
+def test_export_round_trips_through_seed_sources(tmp_path):
+    path = str(tmp_path / 'ProductCatalog.ndjson.gz')
+    assert export_table(ScanClient(items(7)), 'ProductCatalog', path, total_segments=3) == 7
+    with gzip.open(path, 'rt') as f:
+        assert all(json.loads(line) for line in f)
+    assert sorted(read_items(path), key=lambda item: int(item['Id']['N'])) == items(7)
+
+
+def test_export_tables_returns_the_counts_written(tmp_path):
+    counts = export_tables(ScanClient(items(9)), ['ProductCatalog', 'Forum'], str(tmp_path), total_segments=2,
+                           compress=False)
+    assert counts == [('ProductCatalog', 9), ('Forum', 9)]
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['Forum.ndjson', 'ProductCatalog.ndjson']
+    assert export_summary(counts, 2.0).splitlines() == [
+        'Exported 18 items in 2.00s (9.0 items/sec)', '  ProductCatalog: 9 items', '  Forum: 9 items']
@@ -0,0 +1,81 @@
+import threading
+
+from table_queries import fan_out, replies_by_user, replies_to_thread, threads_in_forum
+
+
+class QueryClient(object):
+    # Answers the handful of key conditions the query helpers use, one
+    # item per page so pagination is exercised
+
+    def __init__(self, threads, replies):
+        self.threads = threads
+        self.replies = replies
+        self.batch_gets = []
+        self.lock = threading.Lock()
+
+    def query(self, TableName, KeyConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues,
+              ExclusiveStartKey=None, IndexName=None, ScanIndexForward=True):
+        values = dict((name, value['S']) for name, value in ExpressionAttributeValues.items())
+        if TableName == 'Thread':
+            matches = [item for item in self.threads if item['ForumName']['S'] == values[':forum']]
+        elif IndexName == 'PostedBy-Index':
+            matches = [dict((name, item[name]) for name in ('Id', 'ReplyDateTime', 'PostedBy'))
+                       for item in self.replies
+                       if item['Id']['S'] == values[':id'] and item['PostedBy']['S'] == values[':user']]
+        else:
+            matches = sorted((item for item in self.replies if item['Id']['S'] == values[':id']
+                              and item['ReplyDateTime']['S'] >= values.get(':since', '')),
+                             key=lambda item: item['ReplyDateTime']['S'], reverse=not ScanIndexForward)
+        start = ExclusiveStartKey['Position'] if ExclusiveStartKey else 0
+        response = {'Items': matches[start:start + 1]}
+        if start + 1 < len(matches):
+            response['LastEvaluatedKey'] = {'Position': start + 1}
+        return response
+
+    def batch_get_item(self, RequestItems):
+        keys = RequestItems['Reply']['Keys']
+        with self.lock:
+            self.batch_gets.append(len(keys))
+        wanted = set((key['Id']['S'], key['ReplyDateTime']['S']) for key in keys)
+        return {'Responses': {'Reply': [item for item in self.replies
+                                        if (item['Id']['S'], item['ReplyDateTime']['S']) in wanted]}}
+
+
+def thread(forum, subject):
+    return {'ForumName': {'S': forum}, 'Subject': {'S': subject}}
+
+
+def reply(forum, subject, date, user):
+    return {'Id': {'S': '%s#%s' % (forum, subject)}, 'ReplyDateTime': {'S': date},
+            'PostedBy': {'S': user}, 'Message': {'S': 'text'}}
+
+
+REPLIES = [reply('DynamoDB', 'T1', '2015-09-%02d' % day, 'User A' if day % 3 else 'User B') for day in range(1, 31)]
+CLIENT_THREADS = [thread('DynamoDB', 'T1'), thread('DynamoDB', 'T2'), thread('S3', 'T1')]
+
+
+def test_threads_in_forum_follows_pages():
+    client = QueryClient(CLIENT_THREADS, REPLIES)
+    assert [item['Subject']['S'] for item in threads_in_forum(client, 'DynamoDB')] == ['T1', 'T2']
+
+
+def test_replies_by_date():
+    client = QueryClient(CLIENT_THREADS, REPLIES)
+    dates = [item['ReplyDateTime']['S'] for item in
+             replies_to_thread(client, 'DynamoDB', 'T1', since='2015-09-28', newest_first=True)]
+    assert dates == ['2015-09-30', '2015-09-29', '2015-09-28']
+
+
+def test_replies_by_user_are_fetched_in_batches():
+    client = QueryClient(CLIENT_THREADS, REPLIES)
+    items = list(replies_by_user(client, 'DynamoDB', 'T1', 'User A', batch_size=8))
+    assert len(items) == 20
+    assert all(item['Message']['S'] == 'text' for item in items)
+    assert client.batch_gets == [8, 8, 4]
+
+
+def test_fan_out_runs_every_query():
+    client = QueryClient(CLIENT_THREADS, REPLIES)
+    results = sorted((args[0], item['Subject']['S'])
+                     for args, item in fan_out(lambda forum: threads_in_forum(client, forum), ['DynamoDB', 'S3']))
+    assert results == [('DynamoDB', 'T1'), ('DynamoDB', 'T2'), ('S3', 'T1')]
@@ -0,0 +1,56 @@
+import pytest
+
+from table_schema import TABLES_BY_NAME, Index, Key, create_table_request, update_table_requests
+
+
+def describe(spec, **changes):
+    description = dict(create_table_request(spec), TableStatus='ACTIVE')
+    description.update(changes)
+    return description
+
+
+def test_matching_table_needs_no_updates():
+    spec = TABLES_BY_NAME['Reply']
+    assert update_table_requests(spec, describe(spec)) == []
+
+
+def test_throughput_change_is_one_update():
+    spec = TABLES_BY_NAME['Forum']
+    requests = update_table_requests(spec._replace(write_capacity=50), describe(spec))
+    assert requests == [{'TableName': 'Forum',
+                         'ProvisionedThroughput': {'ReadCapacityUnits': 5, 'WriteCapacityUnits': 50}}]
+
+
+def test_on_demand_tables_skip_throughput():
+    spec = TABLES_BY_NAME['Forum']
+    description = describe(spec, ProvisionedThroughput={'ReadCapacityUnits': 0, 'WriteCapacityUnits': 0},
+                           BillingModeSummary={'BillingMode': 'PAY_PER_REQUEST'})
+    assert update_table_requests(spec, description) == []
+
+
+def test_attribute_type_change_is_rejected():
+    spec = TABLES_BY_NAME['ProductCatalog']
+    with pytest.raises(Exception):
+        update_table_requests(spec._replace(hash_key=Key('Id', 'S')), describe(spec))
+
+
+def test_local_index_change_is_rejected():
+    spec = TABLES_BY_NAME['Reply']
+    changed = spec._replace(local_indexes=(
+        Index('PostedBy-Index', Key('Id', 'S'), Key('PostedBy', 'S'), projection='ALL'),))
+    with pytest.raises(Exception):
+        update_table_requests(changed, describe(spec))
+
+
+def test_new_global_index_is_created():
+    spec = TABLES_BY_NAME['Thread']
+    changed = spec._replace(global_indexes=(Index('Views-Index', Key('ForumName', 'S'), Key('Views', 'N')),))
+    request, = update_table_requests(changed, describe(spec))
+    assert request['GlobalSecondaryIndexUpdates'][0]['Create']['IndexName'] == 'Views-Index'
+
+
+def test_on_demand_tables_are_created_without_throughput():
+    request = create_table_request(TABLES_BY_NAME['Reply'], on_demand=True)
+    assert request['BillingMode'] == 'PAY_PER_REQUEST'
+    assert 'ProvisionedThroughput' not in request
+    assert request['LocalSecondaryIndexes'][0]['IndexName'] == 'PostedBy-Index'
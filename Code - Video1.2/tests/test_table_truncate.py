@@ -0,0 +1,72 @@
+import pytest
+
+import client_factory
+import memory_dynamodb
+from bulk_loader import BulkLoader
+from table_schema import TABLES, TABLES_BY_NAME, create_table_request
+from table_truncate import keys_only_scan, truncate_tables
+
+
+@pytest.fixture
+def dynamodb_conn():
+    memory_dynamodb.reset()
+    dynamodb_conn = client_factory.get_client('us-east-1', 'memory://truncate')
+    for spec in TABLES:
+        dynamodb_conn.create_table(**create_table_request(spec))
+    yield dynamodb_conn
+    memory_dynamodb.reset()
+
+
+def thread(forum, i):
+    return {'ForumName': {'S': forum}, 'Subject': {'S': 'Subject %d' % i}, 'Message': {'S': 'x' * 100}}
+
+
+def reply(i):
+    return {'Id': {'S': 'Forum#Thread %d' % (i % 5)}, 'ReplyDateTime': {'S': '2015-09-%02d' % (i % 28 + 1)},
+            'PostedBy': {'S': 'User %d' % i}}
+
+
+def load(dynamodb_conn, table_name, items):
+    with BulkLoader(dynamodb_conn, max_workers=2) as loader:
+        loader.load(table_name, items)
+
+
+def item_count(dynamodb_conn, table_name):
+    return dynamodb_conn.describe_table(TableName=table_name)['Table']['ItemCount']
+
+
+def test_scan_reads_keys_only():
+    request = keys_only_scan(TABLES_BY_NAME['Reply'], key_from='A')
+    assert request['ProjectionExpression'] == '#key0, #key1'
+    assert request['ExpressionAttributeNames'] == {'#key0': 'Id', '#key1': 'ReplyDateTime', '#hash': 'Id'}
+    assert request['FilterExpression'] == '#hash >= :from'
+    with pytest.raises(Exception, match='numeric hash key'):
+        keys_only_scan(TABLES_BY_NAME['ProductCatalog'], key_to='abc')
+
+
+def test_truncate_keeps_tables_and_indexes(dynamodb_conn):
+    load(dynamodb_conn, 'Thread', (thread('Forum %d' % (i % 4), i) for i in range(120)))
+    load(dynamodb_conn, 'Reply', (reply(i) for i in range(60)))
+    summary = truncate_tables(dynamodb_conn, ['Thread', 'Reply'], total_segments=3, threads=4)
+    assert '  Thread: 120 items' in summary and '  Reply: 60 items' in summary
+    assert (item_count(dynamodb_conn, 'Thread'), item_count(dynamodb_conn, 'Reply')) == (0, 0)
+    description = dynamodb_conn.describe_table(TableName='Reply')['Table']
+    assert [index['IndexName'] for index in description['LocalSecondaryIndexes']] == ['PostedBy-Index']
+    # The index is emptied with the table
+    assert dynamodb_conn.query(TableName='Reply', IndexName='PostedBy-Index', KeyConditionExpression='Id = :id',
+                               ExpressionAttributeValues={':id': {'S': 'Forum#Thread 1'}})['Items'] == []
+
+
+def test_key_range_limits_deletes(dynamodb_conn):
+    load(dynamodb_conn, 'Thread', (thread('Forum %d' % (i % 4), i) for i in range(40)))
+    truncate_tables(dynamodb_conn, ['Thread'], total_segments=2, key_from='Forum 1', key_to='Forum 2')
+    remaining = dynamodb_conn.scan(TableName='Thread')['Items']
+    assert sorted(set(item['ForumName']['S'] for item in remaining)) == ['Forum 0', 'Forum 3']
+    assert len(remaining) == 20
+
+
+def test_throttled_deletes_are_retried(dynamodb_conn):
+    load(dynamodb_conn, 'Thread', (thread('Forum 0', i) for i in range(50)))
+    dynamodb_conn.unprocessed_rate = 0.3
+    truncate_tables(dynamodb_conn, ['Thread'], total_segments=2, threads=1)
+    assert item_count(dynamodb_conn, 'Thread') == 0
@@ -0,0 +1,32 @@
+from table_verify import canonical_json, verify_table
+from test_table_export import ScanClient
+
+
+def product(i, price=10):
+    return {'Id': {'N': str(i)}, 'Price': {'N': str(price)}, 'Color': {'SS': ['Red', 'Black']}}
+
+
+def test_numbers_and_sets_are_normalized():
+    assert canonical_json({'Id': {'N': 5}, 'Tags': {'SS': ['b', 'a']}}) == \
+        canonical_json({'Id': {'N': '5.0'}, 'Tags': {'SS': ['a', 'b']}})
+
+
+def test_identical_tables_compare_no_keys(tmp_path):
+    stored = [dict(product(i), Color={'SS': ['Black', 'Red']}) for i in range(40)]
+    diff = verify_table(ScanClient(stored), 'ProductCatalog', (product(i) for i in range(40)),
+                        total_segments=4, buckets=8, work_dir=str(tmp_path))
+    assert diff.matches()
+    assert diff.buckets == []
+    assert (diff.source_items, diff.table_items) == (40, 40)
+
+
+def test_missing_extra_and_mismatched_keys_are_reported(tmp_path):
+    stored = [product(i) for i in range(1, 40)] + [product(99)]
+    stored[4] = product(5, price=11)
+    diff = verify_table(ScanClient(stored), 'ProductCatalog', (product(i) for i in range(40)),
+                        total_segments=3, buckets=16, work_dir=str(tmp_path))
+    assert diff.missing == ['{"Id":{"N":"0"}}']
+    assert diff.extra == ['{"Id":{"N":"99"}}']
+    assert diff.mismatched == ['{"Id":{"N":"5"}}']
+    assert 0 < len(diff.buckets) <= 3
+    assert list(tmp_path.iterdir()) == []